@@ -0,0 +1,404 @@
+"""
+Author: Ralph Dawson G. Pineda
+Section: STALGCM S13
+Description: This file makes a machine smaller before it runs, without changing the verdict of any word. It works on
+             the compiled transition table in three passes:
+                1. the states that cannot be reached from the start state are removed
+                2. the states that can never halt, because no path from them reaches the accept state, the reject state
+                   or a transition with no next state, are collapsed into one state that loops forever
+                3. the states that are equivalent are merged: two states are equivalent if they are the same kind of
+                   state and for every symbol they move in the same direction into equivalent states, so a run from
+                   either one takes exactly the same steps. The equivalent states are found with Hopcroft's partition
+                   refinement, in O(|sigma| |Q| log |Q|).
+             Accepted and rejected words take the same number of steps on the reduced machine. A word that loops may
+             be found to loop after a different number of steps, since the reduced machine repeats a configuration
+             sooner.
+             It also finds the transitions after which the verdict is decided whatever the rest of the word is, such as
+             entering an accept state that only moves right until it reaches the right end marker, so the engines can
+             stop there instead of walking the rest of the tape (see earlyTable()).
+"""
+import copy
+
+from model import Machine_2DFA
+
+# where the head can be when the machine is in a state: on a symbol of the word or on one of the end markers
+INSIDE, AT_LEFT_END, AT_RIGHT_END = range(3)
+ACCEPTS, REJECTS, LOOPS = 1, 2, 4
+
+"""
+@definition: This class describes how much a machine was reduced
+@attributes: states - the number of states before the reduction
+             reduced_states - the number of states after the reduction
+             transitions, reduced_transitions - the number of transition functions before and after the reduction
+             unreachable - the names of the states that were removed because they cannot be reached
+             dead - the names of the states that can never halt, collapsed into the state named sink
+             sink - the state every dead state was collapsed into, None if there is no dead state
+             merged - dictionary from a state name to the names of the equivalent states merged into it
+             representative - dictionary from every state that was kept or merged to the state that stands for it
+"""
+class Reduction:
+    def __init__(self, states, transitions):
+        self.states = states
+        self.reduced_states = states
+        self.transitions = transitions
+        self.reduced_transitions = transitions
+        self.unreachable = []
+        self.dead = []
+        self.sink = None
+        self.merged = {}
+        self.representative = {}
+
+    """
+    @definition: This tells whether the machine got smaller
+    """
+    def isReduced(self):
+        return self.reduced_states < self.states
+
+    """
+    @definition: This describes the reduction in lines of text, at most a few state names are listed in every line
+    """
+    def describe(self):
+        lines = [f'{self.states} states -> {self.reduced_states} states, '
+                 f'{self.transitions} transitions -> {self.reduced_transitions} transitions']
+        if self.unreachable:
+            lines.append(f'removed {len(self.unreachable)} unreachable states: ' + listNames(self.unreachable))
+        if len(self.dead) > 1:
+            lines.append(f'collapsed {len(self.dead)} states that never halt into {self.sink}: ' + listNames(self.dead))
+        merged = sum(len(states) for states in self.merged.values())
+        if merged:
+            lines.append(f'merged {merged} equivalent states into {len(self.merged)} states: ' +
+                         ', '.join(f'{" ".join(states[:3])}{" ..." if len(states) > 3 else ""} into {state}'
+                                   for state, states in list(self.merged.items())[:5]) +
+                         (', ...' if len(self.merged) > 5 else ''))
+        return lines
+
+"""
+@definition: This lists the first names of a list of states
+"""
+def listNames(names, limit=10):
+    return ' '.join(names[:limit]) + (f' ... ({len(names) - limit} more)' if len(names) > limit else '')
+
+"""
+@definition: This finds the states that can be reached from the start state. The accept and reject states are always
+             kept, the machine definition needs them even if no word reaches them.
+@params: table - the compiled transition table of the machine
+@returns: reachable - bytearray with 1 for every reachable state
+"""
+def reachableStates(table):
+    width = table.width
+    next_state = table.next_state
+    reachable = bytearray(len(table.states))
+    stack = [table.start]
+    reachable[table.start] = 1
+    while stack:
+        state = stack.pop()
+        for target in next_state[state * width:(state + 1) * width]:
+            if target >= 0 and not reachable[target]:
+                reachable[target] = 1
+                stack.append(target)
+    reachable[table.accept] = 1
+    reachable[table.reject] = 1
+    return reachable
+
+"""
+@definition: This finds the states that can halt: the accept and reject states, the states with a transition with no
+             next state, and every state with a path to one of them
+@params: table - the compiled transition table of the machine
+         reachable - the states to look at, see reachableStates()
+@returns: live - bytearray with 1 for every state that can halt
+"""
+def liveStates(table, reachable):
+    width = table.width
+    next_state = table.next_state
+    predecessors = [[] for _ in table.states]
+    live = bytearray(len(table.states))
+    stack = []
+    for state, kept in enumerate(reachable):
+        if not kept:
+            continue
+        for target in next_state[state * width:(state + 1) * width]:
+            if target >= 0:
+                predecessors[target].append(state)
+            elif not live[state]:
+                live[state] = 1
+                stack.append(state)
+    for state in (table.accept, table.reject):
+        if not live[state]:
+            live[state] = 1
+            stack.append(state)
+    while stack:
+        state = stack.pop()
+        for source in predecessors[state]:
+            if not live[source]:
+                live[source] = 1
+                stack.append(source)
+    return live
+
+"""
+@definition: This splits the kept states into blocks of equivalent states with Hopcroft's partition refinement. The
+             states start in blocks by kind (accept, reject, never halts, or the directions of every transition, which
+             also tells the transitions with no next state apart) and a block is split for as long as some of its
+             states move into a block on a symbol and others do not.
+@params: table - the compiled transition table of the machine
+         kept - the states to partition
+         dead - the states that can never halt, they are all in one block
+@returns: block_of - dictionary from every kept state to the index of its block
+          blocks - list of the blocks, every block is a set of states
+"""
+def equivalentStates(table, kept, dead):
+    width = table.width
+    next_state = table.next_state
+    direction = table.direction
+    initial = {}
+    for state in kept:
+        if state == table.accept:
+            key = 'accept'
+        elif state == table.reject:
+            key = 'reject'
+        elif dead[state]:
+            key = 'dead'
+        else:
+            key = tuple(direction[state * width:(state + 1) * width])
+        initial.setdefault(key, set()).add(state)
+    blocks = list(initial.values())
+    block_of = {}
+    for index, block in enumerate(blocks):
+        for state in block:
+            block_of[state] = index
+
+    # inverse[symbol][target] is the list of states that move into target on symbol
+    inverse = [{} for _ in range(width)]
+    for state in kept:
+        for symbol in range(width):
+            target = next_state[state * width + symbol]
+            if target >= 0:
+                inverse[symbol].setdefault(target, []).append(state)
+
+    pending = {(block, symbol) for block in range(len(blocks)) for symbol in range(width)}
+    while pending:
+        splitter, symbol = pending.pop()
+        sources = inverse[symbol]
+        touched = {}
+        for target in blocks[splitter]:
+            for state in sources.get(target, ()):
+                touched.setdefault(block_of[state], set()).add(state)
+        for block, inside in touched.items():
+            if len(inside) == len(blocks[block]):
+                continue
+            blocks[block] -= inside
+            new = len(blocks)
+            blocks.append(inside)
+            for state in inside:
+                block_of[state] = new
+            for other in range(width):
+                if (block, other) in pending or len(inside) <= len(blocks[block]):
+                    pending.add((new, other))
+                else:
+                    pending.add((block, other))
+    return block_of, blocks
+
+"""
+@definition: This reduces the compiled transition table of a machine, see the description of this file
+@params: table - the compiled transition table of a valid machine
+@returns: Q - the states of the reduced machine, in the order of the original definition
+          delta - the transition functions of the reduced machine
+          reduction - the Reduction that describes what was removed and merged
+"""
+def reduceTable(table):
+    width = table.width
+    names = table.states
+    reduction = Reduction(len(names), len(table.delta))
+
+    reachable = reachableStates(table)
+    live = liveStates(table, reachable)
+    kept = [state for state in range(len(names)) if reachable[state]]
+    dead = bytearray(reachable[state] and not live[state] for state in range(len(names)))
+    reduction.unreachable = [names[state] for state in range(len(names)) if not reachable[state]]
+    reduction.dead = [names[state] for state in kept if dead[state]]
+
+    block_of, blocks = equivalentStates(table, kept, dead)
+    # every block is named after its first state, or the start state if it is in the block
+    representative = [min(block) if table.start not in block else table.start for block in blocks]
+    for state in kept:
+        reduction.representative[names[state]] = names[representative[block_of[state]]]
+    for block, state in zip(blocks, representative):
+        if len(block) > 1 and not dead[state]:
+            reduction.merged[names[state]] = [names[other] for other in sorted(block) if other != state]
+    if reduction.dead:
+        reduction.sink = reduction.representative[reduction.dead[0]]
+
+    Q = [names[state] for state in sorted(representative)]
+    delta = []
+    for state in sorted(representative):
+        for symbol in range(width):
+            transition = table.getTransition(state, symbol)
+            target = table.next_state[state * width + symbol]
+            next_name = names[representative[block_of[target]]] if target >= 0 else transition[2]
+            delta.append([names[state], transition[1], next_name, transition[3]])
+    reduction.reduced_states = len(Q)
+    reduction.reduced_transitions = len(delta)
+    return Q, delta, reduction
+
+"""
+@definition: This reduces a valid machine, see the description of this file
+@params: machine - the 2-way dfa object
+@returns: machine - a new 2-way dfa object of the reduced machine, with its compiled table
+          reduction - the Reduction that describes what was removed and merged
+"""
+def reduceMachine(machine):
+    Q, delta, reduction = reduceTable(machine.getTable())
+    reduced = Machine_2DFA(Q, machine.getSigma(), delta, machine.getStart(), machine.getAccept(), machine.getReject())
+    reduced.getTable()
+    return reduced, reduction
+
+"""
+@definition: This finds the strongly connected components of a graph with Tarjan's algorithm, without recursion so a
+             machine with many states does not hit the recursion limit
+@params: successors - successors[node] is the list of nodes node has an edge to
+@returns: component - component[node] is the index of the component of node
+          components - the list of nodes of every component. A component comes after every component it has a path
+                       to, so they can be visited from the last to the first in one pass.
+"""
+def stronglyConnected(successors):
+    count = len(successors)
+    index = [-1] * count
+    low = [0] * count
+    on_stack = bytearray(count)
+    stack = []
+    component = [-1] * count
+    components = []
+    counter = 0
+    for root in range(count):
+        if index[root] != -1:
+            continue
+        index[root] = low[root] = counter
+        counter += 1
+        stack.append(root)
+        on_stack[root] = 1
+        work = [(root, 0)]
+        while work:
+            node, i = work[-1]
+            if i < len(successors[node]):
+                work[-1] = (node, i + 1)
+                target = successors[node][i]
+                if index[target] == -1:
+                    index[target] = low[target] = counter
+                    counter += 1
+                    stack.append(target)
+                    on_stack[target] = 1
+                    work.append((target, 0))
+                elif on_stack[target] and index[target] < low[node]:
+                    low[node] = index[target]
+                continue
+            work.pop()
+            if work and low[node] < low[work[-1][0]]:
+                low[work[-1][0]] = low[node]
+            if low[node] == index[node]:
+                members = []
+                while True:
+                    member = stack.pop()
+                    on_stack[member] = 0
+                    component[member] = len(components)
+                    members.append(member)
+                    if member == node:
+                        break
+                components.append(members)
+    return component, components
+
+"""
+@definition: This gives where the head can land after a move, the end marker in the direction of the move or a
+             symbol of the word if the alphabet is not empty
+"""
+def landings(table, move):
+    marker = AT_RIGHT_END if move > 0 else AT_LEFT_END
+    return (INSIDE, marker) if table.width > table.RIGHT_END + 1 else (marker,)
+
+"""
+@definition: This finds the verdicts the machine can still give from every state and position of the head, whatever
+             the word is. The runs of every word are followed at once on a graph of (state, position) nodes, where the
+             position only tells whether the head is on an end marker, so a node can reach every outcome any word can
+             give from it. A node can loop if it reaches a strongly connected part of the graph that moves both left and
+             right: a run that never halts has to turn around forever, since the tape is finite, while a part that
+             only moves one way reaches an end marker.
+@params: table - the compiled transition table of the machine
+@returns: outcomes - outcomes[state * 3 + position] is the union of ACCEPTS, REJECTS and LOOPS that can follow
+"""
+def reachableOutcomes(table):
+    width = table.width
+    # a machine may use one state to accept and reject, the engines accept in it, so accept is put last to win
+    halting = {table.reject: REJECTS, table.accept: ACCEPTS}
+    successors = []
+    moves = []
+    outcomes = []
+    for state in range(len(table.states)):
+        for position, symbols in ((INSIDE, range(table.RIGHT_END + 1, width)), (AT_LEFT_END, (table.LEFT_END,)),
+                                  (AT_RIGHT_END, (table.RIGHT_END,))):
+            targets = []
+            directions = []
+            outcome = 0
+            for symbol in symbols:
+                index = state * width + symbol
+                target = table.next_state[index]
+                if target < 0:
+                    outcome |= REJECTS
+                    continue
+                move = table.direction[index]
+                for landing in landings(table, move):
+                    if landing != INSIDE and target in halting:
+                        outcome |= halting[target]
+                    else:
+                        targets.append(target * 3 + landing)
+                        directions.append(move)
+            successors.append(targets)
+            moves.append(directions)
+            outcomes.append(outcome)
+
+    component, components = stronglyConnected(successors)
+    for members in components:
+        outcome = 0
+        turns = 0
+        for node in members:
+            outcome |= outcomes[node]
+            for target, move in zip(successors[node], moves[node]):
+                if component[target] == component[node]:
+                    turns |= 1 if move > 0 else 2
+                else:
+                    outcome |= outcomes[target]
+        if turns == 3:
+            outcome |= LOOPS
+        for node in members:
+            outcomes[node] = outcome
+    return outcomes
+
+"""
+@definition: This copies the compiled transition table and marks every transition after which the verdict cannot
+             change with DECIDED_ACCEPT or DECIDED_REJECT in place of the next state. A transition is marked when every
+             word gives the same verdict from the state it moves into, whether the head lands on a symbol or on an end
+             marker. The engines stop at a marked transition as they do at a transition with no next state, so they
+             give the same verdicts in fewer steps.
+@params: table - the compiled transition table of the machine
+@returns: early - the copy of the table with the decided transitions marked
+"""
+def earlyTable(table):
+    width = table.width
+    outcomes = reachableOutcomes(table)
+    # a machine may use one state to accept and reject, the engines accept in it, so accept is put last to win
+    halting = {table.reject: REJECTS, table.accept: ACCEPTS}
+    decided = {ACCEPTS: table.DECIDED_ACCEPT, REJECTS: table.DECIDED_REJECT}
+    next_state = list(table.next_state)
+    for index, target in enumerate(next_state):
+        if target < 0:
+            continue
+        verdicts = set()
+        for landing in landings(table, table.direction[index]):
+            if landing != INSIDE and target in halting:
+                verdicts.add(halting[target])
+            else:
+                verdicts.add(outcomes[target * 3 + landing])
+        if len(verdicts) == 1:
+            verdict = verdicts.pop()
+            if verdict in decided:
+                next_state[index] = decided[verdict]
+    early = copy.copy(table)
+    early.next_state = next_state
+    return early
@@ -0,0 +1,137 @@
+"""
+Author: Ralph Dawson G. Pineda
+Section: STALGCM S13
+Description: This file keeps compiled machines on disk so a machine definition is only read and validated once.
+             The artifact of a machine definition file is stored in a cache directory under the SHA-256 hash of the
+             file contents. It holds the validation result, the machine definition and the packed transition table
+             (see TransitionTable.pack()), so loading it skips readMachine() and every validation. Editing the
+             definition file changes its hash, so a new artifact is compiled the next time it is loaded.
+"""
+import hashlib
+import json
+import os
+import struct
+import tempfile
+
+from controller import *
+from model import Machine_2DFA, TransitionTable, ValidationReport
+
+MAGIC = b'2DFA'
+VERSION = 2
+CACHE_DIR = os.environ.get('STALGCM_CACHE', os.path.join(os.path.expanduser('~'), '.cache', 'stalgcm'))
+
+"""
+@definition: This gives the path of the artifact of a machine definition
+@params: source - the contents of the machine definition file
+         cache_dir - the cache directory
+"""
+def artifactPath(source, cache_dir=CACHE_DIR):
+    return os.path.join(cache_dir, hashlib.sha256(source).hexdigest() + '.2dfa')
+
+"""
+@definition: This packs a validated machine definition into an artifact: MAGIC, the version, the length of a
+             json header with the validation errors and the machine definition, the header, then the packed table
+@params: report - the ValidationReport of the machine definition
+         machine - the 2-way dfa object, None if the machine definition is invalid
+"""
+def packArtifact(report, machine):
+    header = {'errors': report.getErrors()}
+    if machine is not None:
+        header.update({
+            'Q': machine.getQ(),
+            'sigma': machine.getSigma(),
+            'start': machine.getStart(),
+            'accept': machine.getAccept(),
+            'reject': machine.getReject(),
+        })
+    header = json.dumps(header).encode('utf-8')
+    packed = MAGIC + struct.pack('<BI', VERSION, len(header)) + header
+    if machine is not None:
+        packed += machine.getTable().pack()
+    return packed
+
+"""
+@definition: This rebuilds a validated machine definition from an artifact
+@returns: report - the ValidationReport of the machine definition
+          machine - the 2-way dfa object with its compiled table, None if the machine is invalid
+          None is returned instead if the artifact was written by another version
+"""
+def unpackArtifact(packed):
+    if packed[:4] != MAGIC:
+        return None
+    version, header_length = struct.unpack_from('<BI', packed, 4)
+    if version != VERSION:
+        return None
+    offset = 4 + struct.calcsize('<BI')
+    header = json.loads(packed[offset:offset + header_length])
+    report = ValidationReport(header['errors'])
+    if not report.isValid():
+        return report, None
+    table = TransitionTable.unpack(memoryview(packed)[offset + header_length:], copy=True)
+    machine = Machine_2DFA(header['Q'], header['sigma'], table.delta, header['start'], header['accept'], header['reject'])
+    machine.setTable(table)
+    return report, machine
+
+"""
+@definition: This reads a machine definition file, validates it and instantiates the 2-way dfa through the artifact
+             cache. Failing to write the cache is not an error, the machine is still returned.
+@params: filename - file name of the machine definition, see README.md for the format
+         cache_dir - the cache directory, None to always read and validate the definition file
+@returns: report - the ValidationReport of the machine definition, see validateMachine()
+          machine - the 2-way dfa object if the machine definition is valid, None otherwise
+"""
+def loadMachineReport(filename, cache_dir=CACHE_DIR):
+    if cache_dir is None:
+        return compileMachineFile(filename)
+
+    with open(filename, 'rb') as f:
+        source = f.read()
+    path = artifactPath(source, cache_dir)
+    try:
+        with open(path, 'rb') as f:
+            loaded = unpackArtifact(f.read())
+        if loaded is not None:
+            return loaded
+    except (OSError, ValueError, KeyError, struct.error):
+        pass
+
+    report, machine = compileMachineFile(filename)
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        # write to a temporary file first so another process never reads half an artifact
+        descriptor, temporary = tempfile.mkstemp(dir=cache_dir, suffix='.tmp')
+        try:
+            with os.fdopen(descriptor, 'wb') as f:
+                f.write(packArtifact(report, machine))
+            os.replace(temporary, path)
+        except OSError:
+            os.remove(temporary)
+            raise
+    except OSError:
+        pass
+    return report, machine
+
+"""
+@definition: This reads and validates a machine definition file without the artifact cache
+"""
+def compileMachineFile(filename):
+    Q, sigma, start, accept, reject, delta = readMachine(filename)
+    report = validateMachine(Q, sigma, delta, start, accept, reject)
+    machine = None
+    if report.isValid():
+        machine = Machine_2DFA(Q, sigma, delta, start, accept, reject)
+        machine.getTable()
+    return report, machine
+
+"""
+@definition: This reads a machine definition file and instantiates the 2-way dfa, the same as readMachine() followed by
+             initializeMachine(), but through the artifact cache. The errors of an invalid machine are printed.
+@params: filename - file name of the machine definition, see README.md for the format
+         cache_dir - the cache directory, None to always read and validate the definition file
+@returns: code - the validity of the machine, see initializeMachine()
+          machine - the 2-way dfa object if the machine definition is valid, None otherwise
+"""
+def loadMachine(filename, cache_dir=CACHE_DIR):
+    report, machine = loadMachineReport(filename, cache_dir)
+    report.printErrors()
+    return report.getCode(), machine
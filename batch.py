@@ -0,0 +1,247 @@
+"""
+Author: Ralph Dawson G. Pineda
+Section: STALGCM S13
+Description: This file is the headless entry point of the program. It runs every word of a word file through a
+             machine definition file and writes the verdict of each word, so machines can be used in pipelines
+             without opening the view. Read the README.md for more information.
+
+Usage: python batch.py machine.txt words.txt [-o verdicts.txt]
+"""
+import argparse
+import sys
+
+from controller import *
+from analysis import earlyTable
+from sweep import Sweeps
+from codegen import compiledFor
+from verdictcache import VerdictCache, machineFingerprint, MAX_ENTRIES, MAX_BYTES
+import artifact
+import lockstep
+import oneway
+
+CHUNK_SIZE = 4096
+BUFFER_SIZE = 1 << 20
+
+"""
+@definition: This reads the machine definition file and instantiates the 2-way dfa, see artifact.loadMachine()
+@params: filename - file name of the machine definition, see README.md for the format
+         cache_dir - the directory of the compiled machines, None to read and validate the file every time
+@returns: code - the validity of the machine, see initializeMachine()
+          machine - the 2-way dfa object if the machine definition is valid, None otherwise
+"""
+def loadMachineFile(filename, cache_dir=artifact.CACHE_DIR):
+    return artifact.loadMachine(filename, cache_dir)
+
+"""
+@definition: This reads the word file in chunks. Every line is one word, an empty line is the empty word.
+@params: f - the opened word file
+         size - the number of words per chunk
+@returns: chunk - list of words, yielded until the file is exhausted
+"""
+def readWordChunks(f, size=CHUNK_SIZE):
+    chunk = []
+    for line in f:
+        chunk.append(line.rstrip('\r\n'))
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+"""
+@definition: This runs every word of a chunk to completion
+@params: table - the compiled transition table of the machine
+         words - list of words
+         engine - 'python' to run the words one at a time, 'numpy' to run the whole chunk in lockstep,
+                  'oneway' to read every word once with the equivalent one way dfa, 'sweep' to run the words one at a
+                  time taking every sweep in one macro-step, 'compiled' to run the words one at a time with the run
+                  functions generated for the machine, see codegen.py, 'trie' to read the chunk with the equivalent
+                  one way dfa reading the prefixes the words share once
+         bitset - how loops are detected by the python, sweep and compiled engines, see runTape()
+         instrumentation - the Instrumentation the python engine records its steps in, None to not profile
+@returns: results - list of (verdict, steps) in the same order as the words, the one way dfa does not
+                    take 2-way steps so its step counts are None
+"""
+def evaluateChunk(table, words, engine='python', bitset=True, instrumentation=None):
+    if instrumentation is not None:
+        return [instrumentation.runWord(word, bitset) for word in words]
+    if engine == 'numpy':
+        return lockstep.runWords(table, words)
+    if engine == 'oneway':
+        dfa = oneway.compileOneWay(table)
+        return [(dfa.runWord(word), None) for word in words]
+    if engine == 'trie':
+        return [(verdict, None) for verdict in oneway.compileOneWay(table).runWords(words)]
+    if engine == 'sweep':
+        sweeps = Sweeps(table)
+        return [sweeps.runWord(word, bitset) for word in words]
+    if engine == 'compiled':
+        compiled = compiledFor(table)
+        return [compiled.runWord(word, bitset) for word in words]
+    return [runWord(table, word, bitset) for word in words]
+
+"""
+@definition: This gives the number of words for every verdict, all set to zero
+"""
+def newCounts():
+    return {verdict: 0 for verdict in VERDICTS}
+
+"""
+@definition: This writes one line per word: the word, its verdict and its step count separated by tabs
+@params: out - the opened output file
+         words - list of words
+         results - list of (verdict, steps) in the same order as the words
+         counts - the number of words for every verdict, updated with the results
+"""
+def writeResults(out, words, results, counts):
+    lines = []
+    for word, (verdict, steps) in zip(words, results):
+        counts[verdict] += 1
+        lines.append(f'{word}\t{verdict}\t{"-" if steps is None else steps}\n')
+    out.writelines(lines)
+
+"""
+@definition: This runs a whole word file and writes the results in the same order as the word file
+@params: table - the compiled transition table of the machine
+         words_file - the opened word file
+         out - the opened output file
+         engine - the engine that runs the words, see evaluateChunk()
+         bitset - how loops are detected by the python engine, see runTape()
+         instrumentation - see evaluateChunk()
+         cache - the VerdictCache the words are looked up in before they are run, None to run every word
+@returns: counts - the number of words for every verdict
+"""
+def evaluateFile(table, words_file, out, engine='python', bitset=True, instrumentation=None, cache=None):
+    counts = newCounts()
+    run = lambda words: evaluateChunk(table, words, engine, bitset, instrumentation)
+    if cache is not None:
+        fingerprint = machineFingerprint(table, engine, bitset)
+        run = lambda words, run=run: cache.runWords(fingerprint, words, run)
+    for words in readWordChunks(words_file):
+        writeResults(out, words, run(words), counts)
+    return counts
+
+def parseArguments(argv):
+    parser = argparse.ArgumentParser(description='Run a word file through a 2-way dfa without the view.')
+    parser.add_argument('machine', help='machine definition file, see README.md for the format')
+    parser.add_argument('words', help='word file with one word per line, - for stdin')
+    parser.add_argument('-o', '--output', default='-', help='output file for the verdicts, - for stdout')
+    parser.add_argument('--engine', choices=('python', 'numpy', 'oneway', 'sweep', 'compiled', 'trie'), default='python',
+                        help='run the words one at a time, a whole chunk in lockstep with NumPy, '
+                             'in one pass each with the equivalent one way dfa, one at a time taking every '
+                             'sweep of a state over the symbols it loops on in one step, or one at a time with run '
+                             'functions generated for the machine, cached next to the definition file, or with the '
+                             'one way dfa walking the trie of every chunk so shared prefixes are read once')
+    parser.add_argument('-j', '--jobs', type=int, default=1,
+                        help='number of worker processes, the compiled machine is shared with them through shared memory')
+    parser.add_argument('--mmap', action='store_true',
+                        help='memory map the word file and translate it byte by byte, every symbol must be a single byte')
+    parser.add_argument('--cache-dir', default=artifact.CACHE_DIR,
+                        help='directory of the compiled machines, keyed by the hash of the definition file')
+    parser.add_argument('--no-cache', action='store_true', help='read and validate the definition file every time')
+    parser.add_argument('--loop-check', choices=('bitset', 'bound'), default='bitset',
+                        help='detect loops with a visited-configuration bitset or with the |Q| * n step bound')
+    parser.add_argument('--profile', default=None,
+                        help='count the hits of every transition and the steps of every state and word, and write '
+                             'them to this file as CSV if it ends with .csv and as JSON otherwise')
+    parser.add_argument('--reduce', action='store_true',
+                        help='remove the unreachable states, collapse the states that never halt and merge the '
+                             'equivalent states before running the words')
+    parser.add_argument('--early-verdict', action='store_true',
+                        help='stop every word as soon as its verdict cannot change, the step column then counts the '
+                             'steps up to that point')
+    parser.add_argument('--verdict-cache', action='store_true',
+                        help='answer the words that were already run from a cache of the most recently used words '
+                             'instead of running them again')
+    parser.add_argument('--verdict-cache-file', default=None,
+                        help='load the verdict cache from this file and save it back after the run, implies '
+                             '--verdict-cache')
+    parser.add_argument('--verdict-cache-size', type=int, default=MAX_ENTRIES,
+                        help='the largest number of words in the verdict cache')
+    parser.add_argument('--verdict-cache-memory', type=int, default=MAX_BYTES >> 20,
+                        help='the largest estimated memory of the verdict cache in MiB')
+    args = parser.parse_args(argv)
+    if args.verdict_cache_file:
+        args.verdict_cache = True
+    if args.profile and (args.engine != 'python' or args.jobs > 1 or args.mmap):
+        parser.error('--profile runs in one process with the python engine')
+    if args.verdict_cache and (args.jobs > 1 or args.mmap or args.profile):
+        parser.error('--verdict-cache runs in one process without --mmap or --profile')
+    if args.mmap and (args.words == '-' or args.jobs > 1 or args.engine in ('oneway', 'trie')):
+        parser.error('--mmap needs a word file and runs in one process with the python, numpy, sweep or compiled engine')
+    if args.early_verdict and args.engine in ('oneway', 'trie'):
+        parser.error('--early-verdict works with the python, numpy, sweep and compiled engines, the oneway and trie '
+                     'engines read every word once')
+    return parser, args
+
+def main(argv=None):
+    parser, args = parseArguments(argv)
+    if args.engine == 'numpy':
+        lockstep.requireNumpy()
+    code, machine = loadMachineFile(args.machine, None if args.no_cache else args.cache_dir)
+    if code != 0:
+        print(f'Invalid machine definition {args.machine} (code {code})', file=sys.stderr)
+        return 1
+    if args.reduce:
+        machine, reduction = reduceMachine(machine)
+        print('\n'.join(reduction.describe()), file=sys.stderr)
+    table = machine.getTable()
+    if args.early_verdict:
+        table = earlyTable(table)
+    if args.mmap:
+        from corpus import buildTranslation
+        try:
+            buildTranslation(table)
+        except ValueError as error:
+            parser.error(f'--mmap cannot read the words of {args.machine}: {error}')
+    if args.engine == 'compiled':
+        # generated once here and cached next to the definition file, the chunks get it from compiledFor()
+        compiledFor(table, args.machine)
+
+    if args.mmap:
+        # the corpus reader maps the word file itself
+        words_file = None
+    elif args.words == '-':
+        words_file = sys.stdin
+    else:
+        words_file = open(args.words, encoding='utf-8', buffering=BUFFER_SIZE)
+    if args.output == '-':
+        out = open(sys.stdout.fileno(), 'w', encoding='utf-8', buffering=BUFFER_SIZE, closefd=False)
+    else:
+        out = open(args.output, 'w', encoding='utf-8', buffering=BUFFER_SIZE)
+    try:
+        if args.mmap:
+            from corpus import evaluateCorpus
+            counts = evaluateCorpus(table, args.words, out, args.engine, args.loop_check == 'bitset')
+        elif args.jobs > 1:
+            from parallel import evaluateFileParallel
+            counts = evaluateFileParallel(table, words_file, out, args.jobs, args.engine,
+                                          args.loop_check == 'bitset')
+        else:
+            instrumentation = None
+            if args.profile:
+                from instrument import Instrumentation
+                instrumentation = Instrumentation(table)
+            cache = None
+            if args.verdict_cache:
+                cache = VerdictCache(args.verdict_cache_size, args.verdict_cache_memory << 20)
+                if args.verdict_cache_file:
+                    cache.load(args.verdict_cache_file)
+            counts = evaluateFile(table, words_file, out, args.engine, args.loop_check == 'bitset',
+                                  instrumentation, cache)
+            if instrumentation is not None:
+                instrumentation.write(args.profile)
+            if cache is not None:
+                print(cache.describe(), file=sys.stderr)
+                if args.verdict_cache_file:
+                    cache.save(args.verdict_cache_file)
+    finally:
+        out.close()
+        if words_file not in (None, sys.stdin):
+            words_file.close()
+
+    print(' '.join(f'{verdict}={count}' for verdict, count in counts.items()), file=sys.stderr)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
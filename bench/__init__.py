@@ -0,0 +1,10 @@
+"""
+Author: Ralph Dawson G. Pineda
+Section: STALGCM S13
+Description: This package measures the simulator. generate.py writes random valid machine definitions and word
+             workloads, and run.py times reading, validating, compiling and running them with every engine and
+             writes the results as JSON so two releases can be compared. Run it from the root of the repository:
+
+             python -m bench.run -o results.json
+             python -m bench.run --baseline results.json
+"""
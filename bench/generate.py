@@ -0,0 +1,132 @@
+"""
+Author: Ralph Dawson G. Pineda
+Section: STALGCM S13
+Description: This file generates random valid 2-way dfas and words for the benchmarks. A generated machine is built
+             from sweeps: the states are split into groups, the states of an even group only move right and the states
+             of an odd group only move left, and reaching an end marker moves on to the next group. Every word is
+             therefore crossed from end to end once per group, like the Q4/Q5 leftward scan of tests/test.txt, so the
+             number of steps grows with the length of the word and not only with the number of states. Inside a group
+             the next state is random, and the last group either accepts, rejects or starts over from the first group,
+             which gives a mix of every verdict.
+
+Usage: python -m bench.generate states machine.txt [--sweeps N] [--symbols N] [--seed N]
+"""
+import argparse
+import random
+import string
+import sys
+
+ACCEPT_STATE = 'qA'
+REJECT_STATE = 'qR'
+
+"""
+@definition: This generates a random valid machine definition
+@params: states - the number of states, at least 2 * sweeps + 2
+         sweeps - the number of times every word is crossed in both directions before the machine decides
+         symbols - the number of symbols in the alphabet, at most 52
+         rng - the random.Random instance to draw from
+         restart - the chance that a state of the last group goes back to the first group instead of halting
+@returns: Q, sigma, start, accept, reject, delta - the machine definition in the same form as readMachine()
+"""
+def generateMachine(states, sweeps=4, symbols=2, rng=None, restart=0.2):
+    rng = rng or random.Random()
+    if states < 2 * sweeps + 2:
+        raise ValueError(f'{states} states are not enough for {sweeps} sweeps, at least {2 * sweeps + 2} are needed')
+    if not 0 < symbols <= len(string.ascii_letters):
+        raise ValueError(f'the alphabet should have between 1 and {len(string.ascii_letters)} symbols')
+    sigma = list(string.ascii_letters[:symbols])
+
+    # split the states that are not accept or reject into 2 * sweeps groups of almost the same size
+    count = states - 2
+    group_count = 2 * sweeps
+    groups = []
+    first = 0
+    for i in range(group_count):
+        size = count // group_count + (1 if i < count % group_count else 0)
+        groups.append(['q' + str(j) for j in range(first, first + size)])
+        first += size
+    Q = [state for group in groups for state in group] + [ACCEPT_STATE, REJECT_STATE]
+
+    delta = []
+    for i, group in enumerate(groups):
+        rightward = i % 2 == 0
+        for state in group:
+            if rightward:
+                # the left end marker is only read by the start state before the first move
+                delta.append([state, '-', rng.choice(group), 'right'])
+                for symbol in sigma:
+                    delta.append([state, symbol, rng.choice(group), 'right'])
+                delta.append([state, '+', rng.choice(groups[i + 1]), 'left'])
+            else:
+                if i + 1 < group_count:
+                    delta.append([state, '-', rng.choice(groups[i + 1]), 'right'])
+                else:
+                    roll = rng.random()
+                    if roll < restart:
+                        delta.append([state, '-', rng.choice(groups[0]), 'right'])
+                    else:
+                        delta.append([state, '-', ACCEPT_STATE if roll < (1 + restart) / 2 else REJECT_STATE, 'right'])
+                for symbol in sigma:
+                    delta.append([state, symbol, rng.choice(group), 'left'])
+                # never read, the head only moves left in this group
+                delta.append([state, '+', rng.choice(group), 'left'])
+    for halt in (ACCEPT_STATE, REJECT_STATE):
+        delta.append([halt, '-', halt, 'right'])
+        for symbol in sigma:
+            delta.append([halt, symbol, halt, 'right'])
+        delta.append([halt, '+', halt, 'left'])
+
+    return Q, sigma, groups[0][0], ACCEPT_STATE, REJECT_STATE, delta
+
+"""
+@definition: This writes a machine definition in the format read by readMachine(), see README.md
+@params: f - the opened output file
+         Q, sigma, start, accept, reject, delta - the machine definition
+"""
+def writeMachine(f, Q, sigma, start, accept, reject, delta):
+    f.write(' '.join(Q) + '\n')
+    f.write(' '.join(sigma) + '\n')
+    f.write(' '.join((start, accept, reject)) + '\n')
+    f.writelines(' '.join(transition) + '\n' for transition in delta)
+
+"""
+@definition: This generates random words over an alphabet
+@params: sigma - the alphabet, every symbol should be a single character
+         count - the number of words
+         length - the length of every word
+         rng - the random.Random instance to draw from
+@returns: words - list of words
+"""
+def generateWords(sigma, count, length, rng=None):
+    rng = rng or random.Random()
+    return [''.join(rng.choices(sigma, k=length)) for _ in range(count)]
+
+def parseArguments(argv):
+    parser = argparse.ArgumentParser(description='Generate a random valid 2-way dfa for the benchmarks.')
+    parser.add_argument('states', type=int, help='number of states')
+    parser.add_argument('machine', help='output file for the machine definition, - for stdout')
+    parser.add_argument('--sweeps', type=int, default=4, help='number of back and forth sweeps over every word')
+    parser.add_argument('--symbols', type=int, default=2, help='number of symbols in the alphabet')
+    parser.add_argument('--seed', type=int, default=None, help='seed of the random generator')
+    parser.add_argument('--words', type=int, default=0, help='also write this many random words to machine.words')
+    parser.add_argument('--length', type=int, default=64, help='length of the generated words')
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parseArguments(argv)
+    rng = random.Random(args.seed)
+    machine = generateMachine(args.states, args.sweeps, args.symbols, rng)
+    if args.machine == '-':
+        writeMachine(sys.stdout, *machine)
+    else:
+        with open(args.machine, 'w') as f:
+            writeMachine(f, *machine)
+    if args.words:
+        out = sys.stdout if args.machine == '-' else open(args.machine + '.words', 'w')
+        out.writelines(word + '\n' for word in generateWords(machine[1], args.words, args.length, rng))
+        if out is not sys.stdout:
+            out.close()
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
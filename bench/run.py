@@ -0,0 +1,367 @@
+"""
+Author: Ralph Dawson G. Pineda
+Section: STALGCM S13
+Description: This file runs the benchmarks. For tests/test.txt and for generated machines of every size it measures
+             how long the machine definition takes to read, validate, compile and load from the artifact cache, then
+             runs word workloads of every length through every available engine and measures words per second and
+             steps per second. The results are written as JSON, and a previous result file can be given as a baseline
+             to report the measurements that got slower.
+
+Usage: python -m bench.run [-o results.json] [--baseline old.json] [--quick]
+"""
+import argparse
+import functools
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+
+from controller import *
+from model import TransitionTable
+import artifact
+from batch import newCounts
+import lockstep
+from analysis import reduceTable, earlyTable
+import oneway
+from sweep import Sweeps
+from codegen import compiledFor
+from bench.generate import generateMachine, generateWords, writeMachine
+
+SAMPLE_MACHINE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'tests', 'test.txt')
+STATES = (10, 100, 1000, 10000)
+LENGTHS = (16, 256, 4096)
+SYMBOLS = 1 << 16
+QUICK_STATES = (10, 100)
+QUICK_LENGTHS = (16, 256)
+QUICK_SYMBOLS = 1 << 12
+
+# the early table of the machine being measured is built once, like its transition table
+cachedEarlyTable = functools.lru_cache(maxsize=1)(earlyTable)
+
+"""
+@definition: The engines that are benchmarked. Every engine runs a list of words and gives (verdict, steps) for every
+             word like runWord(), the steps are None when the engine does not take 2-way steps.
+"""
+ENGINES = {
+    'python': lambda table, words: [runWord(table, word) for word in words],
+    'bound': lambda table, words: [runWord(table, word, False) for word in words],
+    'numpy': lockstep.runWords,
+    'oneway': lambda table, words: [(verdict, None) for verdict in map(oneway.compileOneWay(table).runWord, words)],
+    'trie': lambda table, words: [(verdict, None) for verdict in oneway.compileOneWay(table).runWords(words)],
+    'sweep': lambda table, words: list(map(Sweeps(table).runWord, words)),
+    'early': lambda table, words: [runWord(early, word) for early in (cachedEarlyTable(table),) for word in words],
+    'compiled': lambda table, words: list(map(compiledFor(table).runWord, words)),
+}
+
+"""
+@definition: The largest machine every engine is run on by default. The bound engine takes |Q| * n steps for a word
+             that loops and the one way dfa of the oneway and trie engines takes |Q| operations per new symbol, so
+             they become too slow to wait for on large machines. Use --all-engines to run them anyway.
+"""
+ENGINE_LIMITS = {
+    'bound': 1000,
+    'oneway': 1000,
+    'trie': 1000,
+}
+
+"""
+@definition: The engines that take exactly the same 2-way steps as runWord(), their step counts are compared word by
+             word. The bound engine notices a loop later, so the steps of the words that loop are not compared with it.
+"""
+STEP_ENGINES = ('python', 'sweep', 'compiled', 'bound')
+
+"""
+@definition: This gives the engines that can run on this installation, the numpy engine needs NumPy
+"""
+def availableEngines():
+    return [engine for engine in ENGINES if engine != 'numpy' or lockstep.np is not None]
+
+"""
+@definition: This runs a function a number of times and gives the fastest run
+@params: function - the function to run, without arguments
+         repeat - the number of runs
+@returns: seconds - the time of the fastest run
+          result - the result of the last run
+"""
+def bestOf(function, repeat):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = function()
+        elapsed = time.perf_counter() - started
+        if best is None or elapsed < best:
+            best = elapsed
+    return best, result
+
+"""
+@definition: This measures how long a machine definition file takes to be read, validated, compiled, reduced (see
+             analysis.py), and loaded through the artifact cache both before and after its artifact is written
+@params: filename - the machine definition file
+         repeat - the number of runs of every measurement
+@returns: timings - dictionary of the seconds taken by every stage
+          table - the compiled transition table of the machine
+"""
+def measureLoading(filename, repeat):
+    parse, (Q, sigma, start, accept, reject, delta) = bestOf(lambda: readMachine(filename), repeat)
+    validate, report = bestOf(lambda: validateMachine(Q, sigma, delta, start, accept, reject), repeat)
+    if not report.isValid():
+        raise ValueError(f'{filename} is not a valid machine definition:\n' + '\n'.join(report.describe()))
+    compile_, table = bestOf(lambda: TransitionTable(Q, sigma, delta, start, accept, reject), repeat)
+    reduce, (_, _, reduction) = bestOf(lambda: reduceTable(table), repeat)
+
+    cold = warm = None
+    for _ in range(repeat):
+        with tempfile.TemporaryDirectory() as cache_dir:
+            started = time.perf_counter()
+            artifact.loadMachineReport(filename, cache_dir)
+            elapsed = time.perf_counter() - started
+            cold = elapsed if cold is None else min(cold, elapsed)
+            started = time.perf_counter()
+            artifact.loadMachineReport(filename, cache_dir)
+            elapsed = time.perf_counter() - started
+            warm = elapsed if warm is None else min(warm, elapsed)
+
+    timings = {
+        'states': len(Q),
+        'transitions': len(delta),
+        'parse_seconds': parse,
+        'validate_seconds': validate,
+        'compile_seconds': compile_,
+        'reduce_seconds': reduce,
+        'reduced_states': reduction.reduced_states,
+        'cold_load_seconds': cold,
+        'cached_load_seconds': warm,
+    }
+    return timings, table
+
+"""
+@definition: This counts the words an engine gives another result for than the engines it is checked against
+@params: results - list of (verdict, steps) of the engine
+         expected - list of (verdict, steps) of the first engine, only the verdicts are compared
+         expected_steps - list of (verdict, steps) of the first engine of STEP_ENGINES, None to not compare the steps
+         loop_steps - True to also compare the steps of the words that loop
+@returns: disagreements - the number of words with another verdict or another step count
+"""
+def countDisagreements(results, expected, expected_steps=None, loop_steps=True):
+    disagreements = sum(verdict != other for (verdict, _), (other, _) in zip(results, expected))
+    if expected_steps is not None:
+        disagreements += sum(verdict == other and steps != other_steps and (verdict != LOOP or loop_steps)
+                             for (verdict, steps), (other, other_steps) in zip(results, expected_steps))
+    return disagreements
+
+"""
+@definition: This runs one word workload through every engine. The verdicts of every engine are compared with the
+             first engine, and the step counts of the engines of STEP_ENGINES with the first of them. A benchmark of
+             an engine that gives other results is not worth keeping, see listDisagreements().
+@params: table - the compiled transition table of the machine
+         words - list of words
+         engines - the names of the engines to run
+         repeat - the number of runs of every engine
+@returns: workload - dictionary with the size of the workload and the measurements of every engine
+"""
+def measureWorkload(table, words, engines, repeat):
+    symbols = sum(len(word) for word in words)
+    workload = {'words': len(words), 'length': len(words[0]) if words else 0, 'symbols': symbols, 'engines': {}}
+    expected = None
+    expected_steps = None
+    step_engine = None
+    for engine in engines:
+        seconds, results = bestOf(lambda: ENGINES[engine](table, words), repeat)
+        if expected is None:
+            expected = results
+        if engine in STEP_ENGINES and expected_steps is None:
+            expected_steps = results
+            step_engine = engine
+        if engine in STEP_ENGINES:
+            disagreements = countDisagreements(results, expected, expected_steps, 'bound' not in (engine, step_engine))
+        else:
+            disagreements = countDisagreements(results, expected)
+        steps = None if results and results[0][1] is None else sum(count for _, count in results)
+        counts = newCounts()
+        for verdict, _ in results:
+            counts[verdict] += 1
+        workload['engines'][engine] = {
+            'seconds': seconds,
+            'words_per_second': len(words) / seconds if seconds else None,
+            'symbols_per_second': symbols / seconds if seconds else None,
+            'steps': steps,
+            'steps_per_second': steps / seconds if steps is not None and seconds else None,
+            'verdicts': counts,
+            'disagreements': disagreements,
+            'agrees': disagreements == 0,
+        }
+    return workload
+
+"""
+@definition: This benchmarks one machine definition file with words of every length
+@params: name - the name of the machine in the results
+         filename - the machine definition file
+         lengths - the lengths of the words of every workload
+         symbols - the number of symbols of every workload, so short words come in larger numbers
+         engines - the names of the engines to run
+         repeat - the number of runs of every measurement
+         rng - the random.Random instance the words are drawn from
+         all_engines - True to ignore ENGINE_LIMITS
+@returns: result - dictionary of the measurements of the machine
+"""
+def benchmarkMachine(name, filename, lengths, symbols, engines, repeat, rng, all_engines=False):
+    result, table = measureLoading(filename, repeat)
+    result['name'] = name
+    states = len(table.states)
+    runnable = [engine for engine in engines if all_engines or states <= ENGINE_LIMITS.get(engine, states)]
+    result['skipped_engines'] = [engine for engine in engines if engine not in runnable]
+    sigma = table.symbols[table.RIGHT_END + 1:]
+    result['workloads'] = []
+    for length in lengths:
+        words = generateWords(sigma, max(1, symbols // max(length, 1)), length, rng)
+        result['workloads'].append(measureWorkload(table, words, runnable, repeat))
+    return result
+
+"""
+@definition: This runs every benchmark
+@params: args - the parsed command line arguments, see parseArguments()
+@returns: results - dictionary with the environment, the configuration and the measurements of every machine
+"""
+def runBenchmarks(args):
+    rng = random.Random(args.seed)
+    engines = args.engines or availableEngines()
+    results = {
+        'environment': {
+            'python': platform.python_version(),
+            'implementation': platform.python_implementation(),
+            'platform': platform.platform(),
+            'processor': platform.processor(),
+            'cpus': os.cpu_count(),
+            'numpy': lockstep.np.__version__ if lockstep.np is not None else None,
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        },
+        'config': {
+            'states': args.states,
+            'lengths': args.lengths,
+            'symbols': args.symbols,
+            'sweeps': args.sweeps,
+            'alphabet': args.alphabet,
+            'repeat': args.repeat,
+            'seed': args.seed,
+            'engines': engines,
+        },
+        'machines': [],
+    }
+
+    machines = [('sample', SAMPLE_MACHINE)]
+    with tempfile.TemporaryDirectory() as directory:
+        for states in args.states:
+            filename = os.path.join(directory, f'generated-{states}.txt')
+            with open(filename, 'w') as f:
+                writeMachine(f, *generateMachine(states, args.sweeps, args.alphabet, rng))
+            machines.append((f'generated-{states}', filename))
+
+        for name, filename in machines:
+            print(f'benchmarking {name}', file=sys.stderr)
+            results['machines'].append(benchmarkMachine(name, filename, args.lengths, args.symbols, engines,
+                                                        args.repeat, rng, args.all_engines))
+    return results
+
+"""
+@definition: This lists the workloads on which an engine gave another verdict or step count than the engines it was
+             checked against, see measureWorkload()
+@params: results - the results of this run
+@returns: disagreements - list of descriptions of the engines that disagree
+"""
+def listDisagreements(results):
+    disagreements = []
+    for machine in results['machines']:
+        for workload in machine['workloads']:
+            for engine, measured in workload['engines'].items():
+                if not measured['agrees']:
+                    disagreements.append(f'{machine["name"]} length {workload["length"]} {engine}: '
+                                         f'{measured["disagreements"]} of {workload["words"]} words')
+    return disagreements
+
+"""
+@definition: This compares the results with the results of a previous run and lists the measurements that got slower
+             by more than the tolerance. Only measurements of the same machine, word length and engine are compared,
+             so the two runs should use the same configuration.
+@params: baseline - the results of the previous run
+         results - the results of this run
+         tolerance - the allowed slowdown, 0.2 allows a measurement to take 20% longer
+@returns: regressions - list of descriptions of the measurements that got slower
+"""
+def compareResults(baseline, results, tolerance):
+    regressions = []
+    previous = {machine['name']: machine for machine in baseline['machines']}
+    for machine in results['machines']:
+        old = previous.get(machine['name'])
+        if old is None:
+            continue
+        for key in ('parse_seconds', 'validate_seconds', 'compile_seconds', 'reduce_seconds',
+                    'cached_load_seconds'):
+            if old.get(key) and machine[key] > old[key] * (1 + tolerance):
+                regressions.append(f'{machine["name"]} {key}: {old[key]:.6f} -> {machine[key]:.6f}')
+        old_workloads = {workload['length']: workload for workload in old['workloads']}
+        for workload in machine['workloads']:
+            old_workload = old_workloads.get(workload['length'])
+            if old_workload is None:
+                continue
+            for engine, measured in workload['engines'].items():
+                old_measured = old_workload['engines'].get(engine)
+                if old_measured is None or not old_measured['words_per_second']:
+                    continue
+                if measured['words_per_second'] * (1 + tolerance) < old_measured['words_per_second']:
+                    regressions.append(f'{machine["name"]} length {workload["length"]} {engine}: '
+                                       f'{old_measured["words_per_second"]:.1f} -> '
+                                       f'{measured["words_per_second"]:.1f} words/s')
+    return regressions
+
+def parseArguments(argv):
+    parser = argparse.ArgumentParser(description='Benchmark reading, validating and running 2-way dfas.')
+    parser.add_argument('-o', '--output', default='-', help='output file for the JSON results, - for stdout')
+    parser.add_argument('--states', type=int, nargs='+', default=None, help='sizes of the generated machines')
+    parser.add_argument('--lengths', type=int, nargs='+', default=None, help='lengths of the words of every workload')
+    parser.add_argument('--symbols', type=int, default=None, help='number of symbols in every workload')
+    parser.add_argument('--sweeps', type=int, default=4, help='number of back and forth sweeps of the generated machines')
+    parser.add_argument('--alphabet', type=int, default=2, help='number of symbols in the generated alphabets')
+    parser.add_argument('--engines', nargs='+', choices=tuple(ENGINES), default=None,
+                        help='engines to run, every available engine by default')
+    parser.add_argument('--all-engines', action='store_true', help='run the slow engines on large machines too')
+    parser.add_argument('--repeat', type=int, default=3, help='number of runs of every measurement, the fastest is kept')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the machines and words')
+    parser.add_argument('--quick', action='store_true', help='small machines and short words, for a quick check')
+    parser.add_argument('--baseline', default=None, help='JSON results of a previous run to compare with')
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help='allowed slowdown compared with the baseline before it is reported')
+    args = parser.parse_args(argv)
+    args.states = args.states or list(QUICK_STATES if args.quick else STATES)
+    args.lengths = args.lengths or list(QUICK_LENGTHS if args.quick else LENGTHS)
+    args.symbols = args.symbols or (QUICK_SYMBOLS if args.quick else SYMBOLS)
+    if 'numpy' in (args.engines or ()):
+        lockstep.requireNumpy()
+    return args
+
+def main(argv=None):
+    args = parseArguments(argv)
+    results = runBenchmarks(args)
+    if args.output == '-':
+        json.dump(results, sys.stdout, indent=2)
+        print()
+    else:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    failed = False
+    for disagreement in listDisagreements(results):
+        print('disagrees: ' + disagreement, file=sys.stderr)
+        failed = True
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compareResults(json.load(f), results, args.tolerance)
+        for regression in regressions:
+            print('slower: ' + regression, file=sys.stderr)
+            failed = True
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
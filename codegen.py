@@ -0,0 +1,316 @@
+"""
+Author: Ralph Dawson G. Pineda
+Section: STALGCM S13
+Description: This file writes a run function specialized for one machine as Python source and compiles it with
+             compile(), so a fixed machine runs as fast as CPython allows without a native dependency. In the
+             generated source:
+                1. the states are renumbered so the accept and reject states come last, and every transition stores
+                   the start of the row of its next state, so a step is one index and one addition
+                2. there is one table and one inner loop per direction, the head only leaves the loop when it turns
+                   around or stops, so the steps of a loop are counted from the head and the direction and the loop
+                   check are only looked at when the head turns, which is the only time runTape() marks a
+                   configuration anyway
+                3. the start state, the halting states and the number of states are literal constants, and the end
+                   check of isEnd() and isAccepted() is a single comparison against the first halting row, which
+                   only the steps into the accept or reject state go past
+                4. the tables are tuples of literals in the source, so the generated module needs nothing else
+             The source of a machine definition file is cached next to it (tests/test.txt -> tests/test.2dfa.py),
+             under the hash of the compiled table, and is only generated again when the machine changes.
+"""
+import collections
+import hashlib
+import os
+import tempfile
+
+from controller import *
+
+# the code of a transition that turns the head around to the row of its next state is TURN - row, below the
+# stop codes of TransitionTable
+TURN = -4
+
+# the number of machines compiledFor() keeps compiled
+COMPILED_MACHINES = 4
+_compiled = collections.OrderedDict()
+
+HEADER = '# generated from a 2-way dfa by codegen.py, do not edit\n# key: '
+# the last line of a generated source, a cached source without it was not written in full
+FOOTER = '# end of the generated source\n'
+
+TEMPLATE = '''{header}{key}
+# {states} states, {symbols} symbols
+
+# RIGHT[row + symbol] is the row of the next state for a transition that moves right, LEFT[row + symbol] for one
+# that moves left. A transition that turns the head around is stored as {turn} - row and one that stops the run
+# keeps its stop code, so the inner loops only leave on a negative code.
+RIGHT = {right}
+LEFT = {left}
+
+def runTape(tape, bitset=True):
+    if not bitset:
+        return runTapeBounded(tape)
+    right = RIGHT
+    left = LEFT
+    length = len(tape)
+    last = length - 1
+    bits = bytearray(({states} * length + 7) >> 3)
+    # the first step reads the left end marker, it can only move right
+    code = right[{start} + tape[0]]
+    if code < 0:
+        steps = 0
+        return {stop}
+    row = code
+    head = 1
+    steps = 1
+    if row >= {halting} and head == last:
+        return {halt}
+    config = row // {symbols} * length + head
+    bits[config >> 3] |= 1 << (config & 7)
+    while True:
+        first = head
+        while True:
+            code = right[row + tape[head]]
+            if code < 0:
+                break
+            row = code
+            head += 1
+            if row >= {halting} and head == last:
+                return {halt_right}
+        steps += head - first
+        if code > {turn}:
+            return {stop}
+        row = {turn} - code
+        head -= 1
+        steps += 1
+        if row >= {halting} and head == 0:
+            return {halt}
+        config = row // {symbols} * length + head
+        mask = 1 << (config & 7)
+        byte = bits[config >> 3]
+        if byte & mask:
+            return {loop!r}, steps
+        bits[config >> 3] = byte | mask
+
+        first = head
+        while True:
+            code = left[row + tape[head]]
+            if code < 0:
+                break
+            row = code
+            head -= 1
+            if row >= {halting} and head == 0:
+                return {halt_left}
+        steps += first - head
+        if code > {turn}:
+            return {stop}
+        row = {turn} - code
+        head += 1
+        steps += 1
+        if row >= {halting} and head == last:
+            return {halt}
+        config = row // {symbols} * length + head
+        mask = 1 << (config & 7)
+        byte = bits[config >> 3]
+        if byte & mask:
+            return {loop!r}, steps
+        bits[config >> 3] = byte | mask
+
+def runTapeBounded(tape):
+    right = RIGHT
+    left = LEFT
+    last = len(tape) - 1
+    limit = {states} * len(tape)
+    code = right[{start} + tape[0]]
+    if code < 0:
+        steps = 0
+        return {stop}
+    row = code
+    head = 1
+    steps = 1
+    if row >= {halting} and head == last:
+        return {halt}
+    while True:
+        # the run stops at the bound when the head reaches bound
+        first = head
+        bound = head + limit - steps
+        while True:
+            if head == bound:
+                return {loop!r}, limit
+            code = right[row + tape[head]]
+            if code < 0:
+                break
+            row = code
+            head += 1
+            if row >= {halting} and head == last:
+                return {halt_right}
+        steps += head - first
+        if code > {turn}:
+            return {stop}
+        row = {turn} - code
+        head -= 1
+        steps += 1
+        if row >= {halting} and head == 0:
+            return {halt}
+
+        first = head
+        bound = head - limit + steps
+        while True:
+            if head == bound:
+                return {loop!r}, limit
+            code = left[row + tape[head]]
+            if code < 0:
+                break
+            row = code
+            head -= 1
+            if row >= {halting} and head == 0:
+                return {halt_left}
+        steps += first - head
+        if code > {turn}:
+            return {stop}
+        row = {turn} - code
+        head += 1
+        steps += 1
+        if row >= {halting} and head == last:
+            return {halt}
+{footer}'''
+
+"""
+@definition: This gives the key of a compiled table, the generated source is only reused for the same key
+"""
+def tableKey(table):
+    return hashlib.sha256(table.pack()).hexdigest()
+
+"""
+@definition: This writes the source of the run functions of a machine, see the description of this file
+@params: table - the compiled transition table of a valid machine, it can be an early table (see analysis.py)
+         key - the key written in the header of the source, see tableKey()
+@returns: source - the source of a module with runTape(tape, bitset) and runTapeBounded(tape), which give the same
+                   verdicts and steps as the functions of the same name in controller.py
+"""
+def generateSource(table, key=None):
+    width = table.width
+    halting = [state for state in (table.accept, table.reject) if state >= 0]
+    halting = list(dict.fromkeys(halting))
+    order = [state for state in range(len(table.states)) if state not in halting] + halting
+    row_of = [0] * len(table.states)
+    for new, state in enumerate(order):
+        row_of[state] = new * width
+
+    # a transition that turns the head around and one that stops the run leave the inner loops, see TEMPLATE
+    right = []
+    left = []
+    for state in order:
+        for symbol in range(width):
+            target = table.next_state[state * width + symbol]
+            move = table.direction[state * width + symbol]
+            if target < 0:
+                right.append(target)
+                left.append(target)
+            else:
+                right.append(row_of[target] if move > 0 else TURN - row_of[target])
+                left.append(row_of[target] if move < 0 else TURN - row_of[target])
+
+    # the halting states come last and the accept state is checked first, like in isAccepted()
+    accept_row = row_of[table.accept]
+    def halt(steps):
+        if table.accept == table.reject:
+            return f'{ACCEPT!r}, {steps}'
+        return f'({ACCEPT!r} if row == {accept_row} else {REJECT!r}), {steps}'
+    stop = (f'({ACCEPT!r}, steps + 1) if code == {table.DECIDED_ACCEPT} else '
+            f'({REJECT!r}, steps + (code != {table.NO_TRANSITION}))')
+    return TEMPLATE.format(header=HEADER, key=key or tableKey(table), states=len(table.states), symbols=width,
+                           right=tuple(right), left=tuple(left), turn=TURN, start=row_of[table.start],
+                           halting=(len(table.states) - len(halting)) * width, halt=halt('steps'),
+                           halt_right=halt('steps + head - first'), halt_left=halt('steps + first - head'),
+                           stop=stop, loop=LOOP, footer=FOOTER)
+
+"""
+@definition: This class is a machine with its generated run functions
+@attributes: table - the compiled transition table the source was generated from
+             source - the generated source
+             runTape - the generated runTape(tape, bitset=True), see controller.runTape()
+"""
+class CompiledMachine:
+    def __init__(self, table, source, filename='<2dfa>'):
+        self.table = table
+        self.source = source
+        namespace = {}
+        exec(compile(source, filename, 'exec'), namespace)
+        self.runTape = namespace['runTape']
+
+    """
+    @definition: This runs the machine on a word like runWord(), with the generated run function
+    @params: word - the word input without end markers
+             bitset - how loops are detected, see controller.runTape()
+    @return: verdict - ACCEPT, REJECT, LOOP, or INVALID if the word has a symbol not in the alphabet
+             steps - the number of transitions taken
+    """
+    def runWord(self, word, bitset=True):
+        tape = encodeWord(self.table, word)
+        if tape is None:
+            return INVALID, 0
+        return self.runTape(tape, bitset)
+
+"""
+@definition: This generates and compiles the run functions of a machine in memory
+@params: table - the compiled transition table of a valid machine
+@returns: the CompiledMachine
+"""
+def compileMachine(table):
+    return CompiledMachine(table, generateSource(table))
+
+"""
+@definition: This gives the path the generated source of a machine definition file is cached at
+"""
+def sourcePath(filename):
+    return os.path.splitext(filename)[0] + '.2dfa.py'
+
+"""
+@definition: This compiles the run functions of a machine read from a definition file. The generated source is cached
+             next to the file and reused while its key matches the table, a cached source that is cut short or does
+             not compile is generated again. Failing to write the cache is not an error, the machine is still compiled.
+@params: table - the compiled transition table of the machine
+         filename - the machine definition file the table was read from
+@returns: the CompiledMachine
+"""
+def loadCompiledMachine(table, filename):
+    key = tableKey(table)
+    path = sourcePath(filename)
+    try:
+        with open(path, encoding='utf-8') as f:
+            source = f.read()
+        if source.startswith(HEADER + key + '\n') and source.endswith(FOOTER):
+            return CompiledMachine(table, source, path)
+    except (OSError, UnicodeDecodeError, SyntaxError, ValueError, KeyError):
+        pass
+
+    source = generateSource(table, key)
+    try:
+        # write to a temporary file first so another process never reads half a source
+        descriptor, temporary = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix='.tmp')
+        try:
+            with os.fdopen(descriptor, 'w', encoding='utf-8') as f:
+                f.write(source)
+            os.replace(temporary, path)
+        except OSError:
+            os.remove(temporary)
+            raise
+    except OSError:
+        pass
+    return CompiledMachine(table, source, path)
+
+"""
+@definition: This compiles a machine once per table, for the engines that get the same table for every chunk of words.
+             The last COMPILED_MACHINES machines are kept.
+@params: table - the compiled transition table of a valid machine
+         filename - the machine definition file the table was read from to cache the source next to it, see
+                    loadCompiledMachine(), None to only compile it in memory
+@returns: the CompiledMachine
+"""
+def compiledFor(table, filename=None):
+    compiled = _compiled.pop(table, None)
+    if compiled is None:
+        compiled = compileMachine(table) if filename is None else loadCompiledMachine(table, filename)
+    _compiled[table] = compiled
+    while len(_compiled) > COMPILED_MACHINES:
+        _compiled.popitem(last=False)
+    return compiled
@@ -1,7 +1,20 @@
 from queue import Queue
 import sys
-from model import Machine_2DFA
-from math import sqrt
+from model import Machine_2DFA, TransitionTable, ConfigurationBitset, ValidationReport
+from analysis import reduceMachine
+from math import sqrt, ceil
+
+ACCEPT = 'accept'
+REJECT = 'reject'
+LOOP = 'loop'
+INVALID = 'invalid'
+VERDICTS = (ACCEPT, REJECT, LOOP, INVALID)
+# the verdict of a run that stops at a negative next state, see TransitionTable
+STOP_VERDICTS = {
+    TransitionTable.NO_TRANSITION: REJECT,
+    TransitionTable.DECIDED_REJECT: REJECT,
+    TransitionTable.DECIDED_ACCEPT: ACCEPT,
+}
 """
 
     Author : Ralph Dawson G. Pineda
@@ -11,10 +24,6 @@ from math import sqrt
 
                     change return 0 in whichTransition() function to something better
 
-                    cases where the machine is stuck in a loop
-                    validation for 
-
-                    validation for uniqueness of state name and symbols
                     fix for updating colors
 """ 
 
@@ -61,39 +70,97 @@ def readMachine(filename):
             reject  -  the reject state from Q
             delta  -  set of all transition functions
                    -  transition function: (current state, input, next state, direction)
+            reduce  -  True to remove the unreachable states, collapse the states that never halt and merge the
+                       equivalent states of a valid machine before it is returned, see analysis.py
 @returns:   code  -  the validity of the machine, can point out which part of the machine definition is invalid
             machine  -  the 2-way dfa object if the machine definition is valid, None otherwise
 """
-def initializeMachine(Q, sigma, delta, start, accept, reject):
-    if not validateDeterministic(Q, sigma, delta):
-        code = 1
-        machine = None
-    elif not validateTransition(sigma,delta, Q, accept, reject):
-        code = 2
-        machine = None
-    else:
-        Q = validateUniqueStateName(Q)
-        code = 0
+def initializeMachine(Q, sigma, delta, start, accept, reject, reduce=False):
+    report = validateMachine(Q, sigma, delta, start, accept, reject)
+    report.printErrors()
+    code = report.getCode()
+    machine = None
+    if code == 0:
         machine = Machine_2DFA(Q, sigma, delta, start, accept, reject)
-        
+        machine.getTable()
+        if reduce:
+            machine, reduction = reduceMachine(machine)
+            print('\n'.join(reduction.describe()))
+
     return code, machine
 
 """
-@definiiton: This function makes sure that the given names of the states in the machine definition
-              are unique. If not, it appends a number to the state name to make it unique.
-@params:  Q  -  set of all states
-@returns:  Q  -  set of all states with unique names
+@definition: This checks every rule of a 2-way dfa in a single pass over the machine definition, using a dictionary
+             of the transition functions indexed by (state, input) instead of scanning the list for every state.
+             It does not stop at the first problem, every error is collected in the report with its line number.
+             A machine definition is valid if:
+                1. the state names are unique, and the start, accept and reject states are in Q
+                2. the symbols of sigma are unique and are not the end markers '-' and '+'
+                3. every transition function is valid:
+                   - its input is in the alphabet union (left and right end markers)
+                   - its current state is in Q, and its next state is in Q or 'NA' for no transition
+                   - its direction is left or right, or 'NA' for no transition
+                   - the accept state only moves into the accept state, and the reject state into the reject state
+                   - it does not move left from the left end marker or right from the right end marker
+                4. every state has exactly one transition function for every input in the alphabet union
+                   (left and right end markers), a second one for the same (state, input) makes it nondeterministic
+@params:    Q  -  set of all states
+            sigma  -  the alphabet of all symbols to be read
+            delta  -  set of all transition functions
+            start  -  the start state from Q
+            accept  -  the acceptance state from Q
+            reject  -  the reject state from Q
+@returns:   report  -  the ValidationReport with every error found
 """
-
-def validateUniqueStateName(Q):
-    for i in range(len(Q)):
-        counter = 0
-        for j in range(len(Q)):
-            if i != j:
-                if Q[i] == Q[j]:
-                    counter +=1
-                    Q[j] += str(counter)
-    return Q
+def validateMachine(Q, sigma, delta, start, accept, reject):
+    report = ValidationReport()
+    states = set()
+    for state in Q:
+        if state in states:
+            report.addError(1, report.INVALID_DEFINITION, "state name " + state + " is not unique")
+        states.add(state)
+    symbols = set()
+    for symbol in sigma:
+        if symbol in ('-', '+'):
+            report.addError(2, report.INVALID_DEFINITION, "symbol " + symbol + " is reserved for the end markers")
+        elif symbol in symbols:
+            report.addError(2, report.INVALID_DEFINITION, "symbol " + symbol + " is not unique")
+        symbols.add(symbol)
+    for kind, state in (("start", start), ("accept", accept), ("reject", reject)):
+        if state not in states:
+            report.addError(3, report.INVALID_DEFINITION, kind + " state " + str(state) + " is not in the set of states")
+    extended_sigma = symbols | {'-', '+'}
+
+    index = {}
+    for line, transition in enumerate(delta, report.FIRST_TRANSITION_LINE):
+        if len(transition) != 4:
+            report.addError(line, report.INVALID_TRANSITION, "transition function should be: current state, input, next state, direction", transition)
+            continue
+        state, req_input, state2, direction = transition
+        for invalid, message in (
+            (req_input not in extended_sigma, "input not in alphabet"),
+            (state not in states, "current state not in set of states"),
+            (state2 not in states and state2 != 'NA', "next state not in set of states"),
+            (direction not in ('left', 'right', 'NA'), "direction should be left or right"),
+            (state == accept and state2 != accept, "accept state cannot have an outgoing transition"),
+            (state == reject and state2 != reject, "reject state cannot have an outgoing transition"),
+            (req_input == '-' and direction == 'left', "cannot move left from left end marker"),
+            (req_input == '+' and direction == 'right', "cannot move right from right end marker"),
+        ):
+            if invalid:
+                report.addError(line, report.INVALID_TRANSITION, "Invalid transition function : " + message, transition)
+        key = (state, req_input)
+        if key in index:
+            report.addError(line, report.NOT_DETERMINISTIC, "state " + state + " already has a transition for input " + req_input + " on line " + str(index[key]), transition)
+        else:
+            index[key] = line
+
+    markers_and_symbols = ['-', '+'] + [symbol for symbol in dict.fromkeys(sigma) if symbol not in ('-', '+')]
+    for state in dict.fromkeys(Q):
+        for symbol in markers_and_symbols:
+            if (state, symbol) not in index:
+                report.addError(1, report.NOT_DETERMINISTIC, "state " + state + " has no transition for input " + symbol)
+    return report
 
 """
 
@@ -112,7 +179,7 @@ def nextStep(list_transition, state, input):
         _, req_input, next_state, direction = i
         if req_input == input:
             return next_state, direction, i
-        
+
 """
 
 @definition: This function filters the set all all transitions from the machine definition based
@@ -163,95 +230,9 @@ def validateSymbol(character, sigma):
         print("Invalid input : input not in alphabet")
         return False
 
-"""
-
-definition: This checks the all transition functions in the 
-            list provided by the machine definition is valid
-            A transition function is considered valid if: 
-                1. the input is in the alphabet union (left and right end markers)
-                2. the current state is in the set of states
-                3. the next state is in the set of states
-                4. the accept state has no outgoing transition
-                5. the reject state has no outgoing transition
-                6. the left end marker has no outgoing transition to the left
-                7. the right end marker has no outgoing transition to the right
-@params:  list_transition  -  set of all transition functions defined in the machine definition
-            sigma  -  the alphabet of all symbols to be read
-            Q  -  the set of all states
-            accept = accept state
-            reject = reject state
-@returns: True  - all transition functions are valid
-            False - atleast one transition function is invalid
-
-"""
-def validateTransition(sigma, list_transition, Q, accept, reject):
-    extended_sigma = ['-','+']
-    for i in sigma:
-        extended_sigma.append(i)
-
-    for i in list_transition:
-        state, req_input, state2, direction = i
-        if req_input not in extended_sigma:
-            print("Invalid transition function : input not in alphabet")
-            print("transition function in question: "+ str(i))
-            return False
-        if state not in Q:
-            print("Invalid transition function : current state not in set of states")
-            print("transition function in question: "+ str(i))
-            return False
-        if state2 not in Q:
-            if state2 != 'NA':
-                print("Invalid transition function : next state not in set of states")
-                print("transition function in question: "+ str(i))
-                return False
-        if state == accept and state2 != accept:
-            print("Invalid transition function : accept state cannot have an outgoing transition")
-            print("transition function in question: "+ str(i))
-            return False
-        if state == reject and state2 != reject:
-            print("Invalid transition function : reject state cannot have an outgoing transition")
-            print("transition function in question: "+ str(i))
-            return False
-        if req_input == '-'and direction == 'left':
-            print("Invalid transition function : cannot move left from left end marker")
-            print("transition function in question: "+ str(i))
-            return False
-        if req_input == '+'and direction == 'right':
-            print("Invalid transition function : cannot move right from right end marker")
-            print("transition function in question: "+ str(i))
-            return False
-    return True
 def determineGridSize(length):
-    return round(sqrt(length))
-"""
-
-@definition: This checks if the machine is deterministic or not. A machine is deterministic if:
-             every state has a transition function for every input in the alphabet union (left and right end markers)
-
-@params:  list_transition  -  set of all transition functions defined in the machine definition
-            sigma  -  the alphabet of all symbols to be read
-            Q  -  the set of all states
-@returns: False - machine is non-deterministic, True otherwise
-
-"""
-
-def validateDeterministic(Q, sigma, list_transition):
-    extended_sigma = ['-','+']
-    for i in sigma:
-        extended_sigma.append(i)
-    flag = False
-    for state in Q:
-        transitions = filterTransistionList(list_transition, state)
-        for i in extended_sigma:
-            flag = False
-            for t in transitions:
-                _, req_input, _, _ = t
-                if req_input == i:
-                    flag = True
-            if flag == False:
-                print("state "+ state+" has no transition for input "+ i)
-    return flag
-
+    # rounding down would leave some states without a cell
+    return ceil(sqrt(length))
 """
 
 note: might update this function. As of my current understanding, 
@@ -302,6 +283,146 @@ def attachEndMarker(word):
 
 """
 
+@definition: This encodes the word input as the symbol ids of the compiled transition table,
+             with the left and right end markers attached
+@params: table - the compiled transition table of the machine
+         word - the word to be encoded
+@return: tape - list of symbol ids of -w+, None if a character of the word is not in the alphabet
+
+"""
+
+def encodeWord(table, word):
+    symbol_index = table.symbol_index
+    tape = [symbol_index.get(character, -1) for character in word]
+    # ids 0 and 1 are the end markers, so they cannot appear inside the word either
+    if tape and min(tape) <= table.RIGHT_END:
+        return None
+    return [table.LEFT_END] + tape + [table.RIGHT_END]
+
+"""
+
+@definition: This finds every character of a word that is not in the alphabet at once, instead of checking
+             the characters one by one while the word is being read
+@params: table - the compiled transition table of the machine
+         word - the word input without end markers
+@return: the characters of the word that are not in the alphabet, in the order they first appear
+
+"""
+
+def invalidSymbols(table, word):
+    invalid = set(word).difference(table.symbols[table.RIGHT_END + 1:])
+    if not invalid:
+        return []
+    return sorted(invalid, key=word.index)
+
+"""
+
+@definition: This runs the machine on an encoded word until it halts. It follows the same rules as stepping
+             through the word in the view: the machine stops when it is in the accept or reject state and the
+             head is on an end marker, and it stops in rejection when there is no transition to follow.
+             A run that never halts is detected in one of two ways:
+                1. bitset - the configurations (state, head) reached right after the head changes direction
+                            are marked in a ConfigurationBitset. Every loop has to turn the head around, so a
+                            loop is found the second time around it, at a cost of one bit per configuration.
+                2. bound - there are at most |Q| * n configurations on a tape of length n, so a run longer
+                           than that has repeated a configuration. This needs no memory but can take
+                           |Q| times longer to notice a loop.
+             With an early table (see analysis.earlyTable()) the run also stops, one step later, at a transition after
+             which the verdict cannot change.
+@params: table - the compiled transition table of the machine
+         tape - the encoded word, see encodeWord()
+         bitset - True to detect loops with the bitset, False to detect them with the bound
+@return: verdict - ACCEPT, REJECT or LOOP
+         steps - the number of transitions taken
+
+"""
+
+def runTape(table, tape, bitset=True):
+    if not bitset:
+        return runTapeBounded(table, tape)
+    next_state = table.next_state
+    direction = table.direction
+    width = table.width
+    accept = table.accept
+    reject = table.reject
+    length = len(tape)
+    last = length - 1
+    bits = ConfigurationBitset(len(table.states), length).bits
+
+    state = table.start
+    head = 0
+    steps = 0
+    move = 0
+    while True:
+        index = state * width + tape[head]
+        state = next_state[index]
+        if state < 0:
+            return STOP_VERDICTS[state], steps + (state != TransitionTable.NO_TRANSITION)
+        head += direction[index]
+        steps += 1
+        if (head == 0 or head == last) and (state == accept or state == reject):
+            return (ACCEPT if state == accept else REJECT), steps
+        if direction[index] != move:
+            move = direction[index]
+            config = state * length + head
+            mask = 1 << (config & 7)
+            byte = bits[config >> 3]
+            if byte & mask:
+                return LOOP, steps
+            bits[config >> 3] = byte | mask
+
+"""
+
+@definition: This runs the machine on an encoded word like runTape(), detecting loops with the |Q| * n bound
+@params: table - the compiled transition table of the machine
+         tape - the encoded word, see encodeWord()
+@return: verdict - ACCEPT, REJECT or LOOP
+         steps - the number of transitions taken
+
+"""
+
+def runTapeBounded(table, tape):
+    next_state = table.next_state
+    direction = table.direction
+    width = table.width
+    accept = table.accept
+    reject = table.reject
+    last = len(tape) - 1
+    limit = len(table.states) * len(tape)
+
+    state = table.start
+    head = 0
+    steps = 0
+    while steps < limit:
+        index = state * width + tape[head]
+        state = next_state[index]
+        if state < 0:
+            return STOP_VERDICTS[state], steps + (state != TransitionTable.NO_TRANSITION)
+        head += direction[index]
+        steps += 1
+        if (head == 0 or head == last) and (state == accept or state == reject):
+            return (ACCEPT if state == accept else REJECT), steps
+    return LOOP, steps
+
+"""
+
+@definition: This runs the machine on a word from start to finish without the view
+@params: table - the compiled transition table of the machine
+         word - the word input without end markers
+         bitset - how loops are detected, see runTape()
+@return: verdict - ACCEPT, REJECT, LOOP, or INVALID if the word has a symbol not in the alphabet
+         steps - the number of transitions taken
+
+"""
+
+def runWord(table, word, bitset=True):
+    tape = encodeWord(table, word)
+    if tape is None:
+        return INVALID, 0
+    return runTape(table, tape, bitset)
+
+"""
+
 HELPER FUNCTION 
 @definition: This displays the current state of the machine
 @params:  state   -  the current state
@@ -0,0 +1,213 @@
+"""
+Author: Ralph Dawson G. Pineda
+Section: STALGCM S13
+Description: This file reads word corpora that are too large to load as Python strings. The corpus file is memory
+             mapped and split into records (one word per line) without copying them. Every symbol of the alphabet must
+             be a single byte, so the records are turned into symbol ids of the compiled transition table with one
+             precomputed 256 entry translation table, and the symbols outside the alphabet are found in bulk instead of
+             one character at a time.
+"""
+import mmap
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from controller import *
+from model import TransitionTable
+import lockstep
+from sweep import Sweeps
+from codegen import compiledFor
+from batch import CHUNK_SIZE, newCounts, writeResults
+
+INVALID_SYMBOL = 255
+
+"""
+@definition: This builds the translation table from bytes to symbol ids. The end markers and every byte that is not a
+             symbol of the alphabet are translated to INVALID_SYMBOL. A ValueError is raised when a symbol of the
+             alphabet is not a single byte in UTF-8, its words could not be told apart from invalid ones.
+@params: table - the compiled transition table of the machine
+@returns: translation - 256 bytes, translation[b] is the symbol id of the byte b
+"""
+def buildTranslation(table):
+    if table.width > INVALID_SYMBOL:
+        raise ValueError(f'the corpus reader supports at most {INVALID_SYMBOL - 2} symbols')
+    translation = bytearray([INVALID_SYMBOL]) * 256
+    for symbol_id in range(table.RIGHT_END + 1, table.width):
+        symbol = table.symbols[symbol_id].encode('utf-8')
+        if len(symbol) != 1:
+            raise ValueError(f'the symbol {table.symbols[symbol_id]!r} is not a single byte')
+        translation[symbol[0]] = symbol_id
+    return bytes(translation)
+
+"""
+@definition: This encodes one record as a tape for runTape(), with the end markers attached
+@params: record - the bytes of the word, such as a memoryview from Corpus
+         translation - the translation table, see buildTranslation()
+@returns: tape - the symbol ids of -w+, None if the word has a symbol not in the alphabet
+"""
+def encodeRecord(record, translation):
+    tape = bytearray(len(record) + 2)
+    tape[1:-1] = record
+    tape = tape.translate(translation)
+    if tape.find(INVALID_SYMBOL, 1, len(tape) - 1) >= 0:
+        return None
+    tape[0] = TransitionTable.LEFT_END
+    tape[-1] = TransitionTable.RIGHT_END
+    return tape
+
+"""
+@definition: This class is a memory mapped word corpus with one word per line. Lines may end with \\n or \\r\\n.
+@attributes: file - the opened corpus file
+             data - the memory map of the file, None for an empty file
+             view - memoryview of the memory map, the words are slices of it
+             array - NumPy uint8 view of the memory map, created by getArray()
+"""
+class Corpus:
+    def __init__(self, filename):
+        self.file = open(filename, 'rb')
+        self.array = None
+        try:
+            self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+            self.view = memoryview(self.data)
+        except ValueError:
+            # an empty file cannot be mapped
+            self.data = None
+            self.view = memoryview(b'')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    """
+    @definition: This closes the corpus. The memory map can only be closed once every word taken from it is gone.
+    """
+    def close(self):
+        self.array = None
+        try:
+            self.view.release()
+            if self.data is not None:
+                self.data.close()
+        except BufferError:
+            # a word is still referenced somewhere, the map is closed when it is garbage collected
+            pass
+        self.file.close()
+
+    def getArray(self):
+        if self.array is None:
+            lockstep.requireNumpy()
+            self.array = np.frombuffer(self.view, dtype=np.uint8)
+        return self.array
+
+    """
+    @definition: This splits the corpus into records without copying them
+    @returns: (start, end) - the byte offsets of every word in the file, in order
+    """
+    def records(self):
+        data = self.data
+        if data is None:
+            return
+        size = len(data)
+        start = 0
+        while start < size:
+            end = data.find(b'\n', start)
+            if end < 0:
+                end = size
+            stop = end - 1 if end > start and data[end - 1] == 13 else end
+            yield start, stop
+            start = end + 1
+
+    """
+    @definition: This gives the records in batches as views into the memory map
+    @params: size - the number of records per batch
+    @returns: starts, ends - lists of the byte offsets of the words of the batch, yielded until the corpus is exhausted
+    """
+    def batches(self, size=CHUNK_SIZE):
+        starts, ends = [], []
+        for start, end in self.records():
+            starts.append(start)
+            ends.append(end)
+            if len(starts) == size:
+                yield starts, ends
+                starts, ends = [], []
+        if starts:
+            yield starts, ends
+
+    def __iter__(self):
+        for start, end in self.records():
+            yield self.view[start:end]
+
+"""
+@definition: This encodes a batch of records straight from the memory map into the padded tapes of the lockstep engine,
+             see lockstep.encodeBatch(). The bytes are read through a NumPy view of the memory map and translated
+             with one fancy index, and the words with symbols outside the alphabet are flagged for the whole batch at once.
+@params: data - NumPy uint8 view of the memory map
+         starts, ends - the byte offsets of the words of the batch
+         lookup - the translation table as a NumPy array
+@returns: tapes, lengths, valid - the encoded words, see lockstep.encodeBatch()
+"""
+def encodeRecords(data, starts, ends, lookup):
+    starts = np.asarray(starts, dtype=np.int64)
+    lengths = np.asarray(ends, dtype=np.int64) - starts
+    count = lengths.size
+    tapes = np.full((count, int(lengths.max(initial=0)) + 2), TransitionTable.RIGHT_END, dtype=np.uint8)
+    tapes[:, 0] = TransitionTable.LEFT_END
+    valid = np.ones(count, dtype=bool)
+
+    rows = np.repeat(np.arange(count), lengths)
+    columns = np.arange(rows.size) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    symbols = lookup[data[np.repeat(starts, lengths) + columns]]
+    valid[rows[symbols == INVALID_SYMBOL]] = False
+    tapes[rows, columns + 1] = symbols
+    return tapes, lengths, valid
+
+"""
+@definition: This runs one batch of records of a corpus
+@params: table - the compiled transition table of the machine
+         corpus - the opened corpus
+         starts, ends - the byte offsets of the words of the batch
+         translation - the translation table, see buildTranslation()
+         engine, bitset - see evaluateCorpus()
+@returns: words - the words of the batch as views into the memory map
+          results - list of (verdict, steps) in the same order as the words
+"""
+def evaluateRecords(table, corpus, starts, ends, translation, engine, bitset):
+    if engine == 'numpy':
+        lookup = np.frombuffer(translation, dtype=np.uint8)
+        verdicts, steps = lockstep.runTapes(table, *encodeRecords(corpus.getArray(), starts, ends, lookup))
+        return [(VERDICTS[code], count) for code, count in zip(verdicts.tolist(), steps.tolist())]
+    if engine == 'sweep':
+        run = Sweeps(table).runTape
+    elif engine == 'compiled':
+        run = compiledFor(table).runTape
+    else:
+        run = lambda tape, bitset: runTape(table, tape, bitset)
+    results = []
+    for start, end in zip(starts, ends):
+        tape = encodeRecord(corpus.view[start:end], translation)
+        results.append((INVALID, 0) if tape is None else run(tape, bitset))
+    return results
+
+"""
+@definition: This runs a whole memory mapped corpus and writes the results in the same format and order as evaluateFile()
+@params: table - the compiled transition table of the machine
+         filename - the corpus file, one word per line
+         out - the opened output file
+         engine - 'python' to run the words one at a time, 'numpy' to run every batch in lockstep, 'sweep' to run
+                  the words one at a time with macro-steps over sweeps, see sweep.py, 'compiled' to run them one at a
+                  time with the run functions generated for the machine, see codegen.py
+         bitset - how loops are detected by the python, sweep and compiled engines, see runTape()
+@returns: counts - the number of words for every verdict
+"""
+def evaluateCorpus(table, filename, out, engine='python', bitset=True):
+    counts = newCounts()
+    translation = buildTranslation(table)
+    with Corpus(filename) as corpus:
+        for starts, ends in corpus.batches():
+            results = evaluateRecords(table, corpus, starts, ends, translation, engine, bitset)
+            words = [str(corpus.data[start:end], 'utf-8', 'replace') for start, end in zip(starts, ends)]
+            writeResults(out, words, results, counts)
+    return counts
@@ -0,0 +1,183 @@
+"""
+Author: Ralph Dawson G. Pineda
+Section: STALGCM S13
+Description: This file counts the words of every length a machine accepts, rejects or loops on, and samples words
+             uniformly among them, without running a single word. The 2-way dfa is converted into its minimal
+             equivalent one way dfa (see oneway.py), then counts[k][s], the number of words of length k that lead
+             from the one way state s to a state with the verdict, is found by dynamic programming over k with
+             Python's big integers:
+                counts[0][s] = 1 if the verdict of s is the one counted, 0 otherwise
+                counts[k][s] = the sum of counts[k - 1][t] over the states t that s reaches by reading one symbol
+             The number of words of length n is counts[n][start]. A uniform sample is drawn symbol by symbol, picking
+             every symbol with a probability proportional to the number of words it can still be completed into.
+             The one way dfa can have exponentially more states than the 2-way dfa, so it is only built up to
+             MAX_STATES states, the machines with a larger one cannot be counted.
+
+Usage: python counting.py machine.txt n [--verdict accept] [--sample k] [--seed s]
+"""
+import argparse
+import collections
+import random
+import sys
+
+from controller import *
+import oneway
+
+MAX_STATES = 100000
+
+"""
+@definition: This class holds the counts of the words of a machine for one verdict, up to the longest length asked for.
+             A ValueError is raised when the one way dfa of the machine has more than max_states states.
+@attributes: dfa - the minimal one way dfa of the machine
+             verdict - the verdict the words are counted for
+             symbols - the symbols of the alphabet, in the order of the symbol ids
+             successors - successors[s] is the list of the states reached from state s by reading every symbol
+             counts - counts[k][s] is the number of words of length k leading from state s to the verdict
+"""
+class WordCounter:
+    def __init__(self, table, verdict=ACCEPT, max_states=MAX_STATES):
+        dfa = oneway.compileOneWay(table)
+        if not dfa.complete:
+            dfa.build(max_states)
+        self.dfa = oneway.compileOneWay(table, minimal=True)
+        self.verdict = verdict
+        width = table.width
+        symbol_ids = range(table.RIGHT_END + 1, width)
+        self.symbols = [table.symbols[symbol] for symbol in symbol_ids]
+        self.successors = [[self.dfa.next_state[state * width + symbol] for symbol in symbol_ids]
+                           for state in range(len(self.dfa.behaviors))]
+        self.counts = [[int(found == verdict) for found in self.dfa.verdicts]]
+
+    """
+    @definition: This extends the counts up to words of the given length
+    """
+    def extend(self, length):
+        successors = self.successors
+        while len(self.counts) <= length:
+            previous = self.counts[-1]
+            self.counts.append([sum(map(previous.__getitem__, row)) for row in successors])
+
+    """
+    @definition: This gives the number of words of one length with the verdict
+    @params: length - the length of the words
+    @returns: count - the number of words, a Python int of any size
+    """
+    def count(self, length):
+        self.extend(length)
+        return self.counts[length][self.dfa.start]
+
+    """
+    @definition: This gives the number of words with the verdict for every length from 0 up to the given one
+    """
+    def countUpTo(self, length):
+        self.extend(length)
+        start = self.dfa.start
+        return [counts[start] for counts in self.counts[:length + 1]]
+
+    """
+    @definition: This draws one word uniformly among the words of one length with the verdict
+    @params: length - the length of the word
+             rng - the random.Random the word is drawn with
+    @returns: word - the word, None if there is no word of that length with the verdict
+    """
+    def sample(self, length, rng=random):
+        self.extend(length)
+        counts = self.counts
+        state = self.dfa.start
+        if counts[length][state] == 0:
+            return None
+        word = []
+        for remaining in range(length, 0, -1):
+            below = counts[remaining - 1]
+            pick = rng.randrange(counts[remaining][state])
+            for symbol, next_state in zip(self.symbols, self.successors[state]):
+                if pick < below[next_state]:
+                    break
+                pick -= below[next_state]
+            word.append(symbol)
+            state = next_state
+        return ''.join(word)
+
+# the number of machines wordCounter() keeps the counters of, a counter holds its table so it is never freed on its own
+COUNTED_MACHINES = 4
+_counters = collections.OrderedDict()
+
+"""
+@definition: This gives the word counter of a machine for a verdict. The counters are kept for the compiled
+             transition table, so the counts are only computed once until the machine definition changes. The
+             counters of the last COUNTED_MACHINES tables are kept.
+@params: machine - a valid 2-way dfa object, see initializeMachine()
+         verdict - ACCEPT, REJECT or LOOP
+         max_states - the most states of the one way dfa, see WordCounter
+@returns: the WordCounter
+"""
+def wordCounter(machine, verdict=ACCEPT, max_states=MAX_STATES):
+    table = machine.getTable()
+    counters = _counters.pop(table, {})
+    _counters[table] = counters
+    while len(_counters) > COUNTED_MACHINES:
+        _counters.popitem(last=False)
+    if verdict not in counters:
+        counters[verdict] = WordCounter(table, verdict, max_states)
+    return counters[verdict]
+
+"""
+@definition: This gives the number of words of a length a valid machine gives a verdict on, see WordCounter
+@params: machine - a valid 2-way dfa object, see initializeMachine()
+         length - the length of the words
+         verdict - ACCEPT, REJECT or LOOP
+@returns: count - the number of words, a Python int of any size
+"""
+def countWords(machine, length, verdict=ACCEPT):
+    return wordCounter(machine, verdict).count(length)
+
+"""
+@definition: This draws words uniformly and independently among the words of a length a valid machine gives a
+             verdict on, see WordCounter
+@params: machine - a valid 2-way dfa object, see initializeMachine()
+         length - the length of the words
+         samples - the number of words to draw
+         verdict - ACCEPT, REJECT or LOOP
+         rng - the random.Random the words are drawn with
+@returns: words - list of words, empty if there is no word of that length with the verdict
+"""
+def sampleWords(machine, length, samples, verdict=ACCEPT, rng=random):
+    counter = wordCounter(machine, verdict)
+    if counter.count(length) == 0:
+        return []
+    return [counter.sample(length, rng) for _ in range(samples)]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Count and sample the words of one length a 2-way dfa gives a verdict on.')
+    parser.add_argument('machine', help='machine definition file, see README.md for the format')
+    parser.add_argument('length', type=int, help='the length of the words')
+    parser.add_argument('--verdict', choices=(ACCEPT, REJECT, LOOP), default=None,
+                        help='the verdict to count and sample, every verdict is counted by default')
+    parser.add_argument('--sample', type=int, default=0, help='the number of words to draw, one per line on stdout')
+    parser.add_argument('--seed', type=int, default=None, help='the seed of the random words')
+    parser.add_argument('--max-states', type=int, default=MAX_STATES,
+                        help='give up when the equivalent one way dfa has more states than this')
+    args = parser.parse_args(argv)
+    if args.sample and args.verdict is None:
+        parser.error('--sample needs a --verdict')
+
+    Q, sigma, start, accept, reject, delta = readMachine(args.machine)
+    code, machine = initializeMachine(Q, sigma, delta, start, accept, reject)
+    if code != 0:
+        print(f'Invalid machine definition {args.machine} (code {code})', file=sys.stderr)
+        return 1
+
+    try:
+        for verdict in (args.verdict,) if args.verdict else (ACCEPT, REJECT, LOOP):
+            wordCounter(machine, verdict, args.max_states)
+    except ValueError as error:
+        print(f'{args.machine} cannot be counted: {error}', file=sys.stderr)
+        return 1
+    for verdict in (args.verdict,) if args.verdict else (ACCEPT, REJECT, LOOP):
+        print(f'{verdict}={countWords(machine, args.length, verdict)}', file=sys.stderr)
+    for word in sampleWords(machine, args.length, args.sample, args.verdict, random.Random(args.seed)):
+        print(word)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,276 @@
+"""
+Author: Ralph Dawson G. Pineda
+Section: STALGCM S13
+Description: This file draws the machine as a state diagram on a QGraphicsScene, for machines too large for the grid of
+             State widgets in view.py. Every state is a light graphics item instead of a widget, and the view only paints
+             what is inside the visible part of the scene, so the cost of a frame depends on the zoom and not on the
+             number of states. The diagram draws less the more it is zoomed out (its level of detail):
+                1. zoomed in, the states have their names and the transitions have their symbols and arrow heads
+                2. further out, the names, symbols and arrow heads are hidden
+                3. further out, the transitions are hidden
+                4. all the way out, the state items are hidden and the whole machine is drawn as one image with a
+                   block of color per state, which is updated one pixel at a time when a state changes color
+             The diagram is panned by dragging and zoomed with the mouse wheel. The states use the same colors as the
+             grid: yellow for start, green for accept, red for reject, white for normal and blue for the current state.
+"""
+from math import ceil, sqrt, hypot
+
+from PyQt5.QtWidgets import QGraphicsView, QGraphicsScene, QGraphicsItem, QGraphicsRectItem
+from PyQt5.QtGui import QPainter, QColor, QBrush, QPen, QFont, QPainterPath, QPolygonF, QImage
+from PyQt5.QtCore import Qt, QRectF, QPointF
+
+RADIUS = 30
+SPACING = 120
+# the scale of the view below which the labels, the transitions and the state items are not drawn
+LABEL_DETAIL = 0.6
+EDGE_DETAIL = 0.35
+OVERVIEW_DETAIL = 0.25
+# every state is a block of OVERVIEW_CELL - 1 pixels with a gap of one pixel in the overview image
+OVERVIEW_CELL = 4
+ZOOM_STEP = 1.25
+
+"""
+@definition: This class is a state of the diagram. Setting its color repaints it and its block in the overview image,
+             so the view colors it the same way as the State widget of the grid.
+@attributes: name - the name of the state
+             index - the position of the state in Q, which places it in the diagram
+             color - the color of the state
+"""
+class StateItem(QGraphicsItem):
+    def __init__(self, diagram, name, index, color, parent=None):
+        super().__init__(parent)
+        self.diagram = diagram
+        self.name = name
+        self.index = index
+        self.brush = None
+        self.color = color
+        self.setToolTip(name)
+
+    @property
+    def color(self):
+        return self._color
+
+    @color.setter
+    def color(self, color):
+        self._color = color
+        self.brush = QBrush(QColor(color))
+        self.diagram.recolor(self)
+
+    def boundingRect(self):
+        return QRectF(-RADIUS - 1, -RADIUS - 1, 2 * RADIUS + 2, 2 * RADIUS + 2)
+
+    def paint(self, painter, option, widget=None):
+        painter.setBrush(self.brush)
+        painter.setPen(QPen(Qt.black, 1))
+        painter.drawEllipse(QRectF(-RADIUS, -RADIUS, 2 * RADIUS, 2 * RADIUS))
+        if option.levelOfDetailFromTransform(painter.worldTransform()) >= LABEL_DETAIL:
+            painter.setFont(QFont("Arial", 10))
+            painter.drawText(QRectF(-RADIUS, -RADIUS, 2 * RADIUS, 2 * RADIUS), Qt.AlignCenter, self.name)
+
+"""
+@definition: This class is an edge of the diagram, every transition from one state to another with the symbols that
+             take it. Edges in both directions between two states bend to opposite sides so they do not overlap, and an
+             edge from a state to itself is drawn as a loop above it.
+@attributes: label - the symbols read, separated by commas
+             path - the curve of the edge
+             head - the arrow head at the end of the curve
+             anchor - where the label is drawn
+"""
+class Edge:
+    def __init__(self, source, target, label):
+        self.label = label
+        self.path = QPainterPath()
+        if source is target:
+            center = source.pos()
+            start = center + QPointF(-RADIUS * 0.5, -RADIUS * 0.85)
+            end = center + QPointF(RADIUS * 0.5, -RADIUS * 0.85)
+            self.path.moveTo(start)
+            self.path.cubicTo(center + QPointF(-RADIUS, -RADIUS * 2.2), center + QPointF(RADIUS, -RADIUS * 2.2), end)
+            self.anchor = center + QPointF(0, -RADIUS * 2)
+            self.head = arrowHead(end, QPointF(end.x() - RADIUS * 0.3, end.y() - RADIUS * 0.6))
+        else:
+            a, b = source.pos(), target.pos()
+            dx, dy = b.x() - a.x(), b.y() - a.y()
+            length = hypot(dx, dy) or 1
+            ux, uy = dx / length, dy / length
+            start = QPointF(a.x() + ux * RADIUS, a.y() + uy * RADIUS)
+            end = QPointF(b.x() - ux * RADIUS, b.y() - uy * RADIUS)
+            # bend to the left of the direction of the edge, the edge coming back bends to the other side
+            control = QPointF((a.x() + b.x()) / 2 + uy * RADIUS, (a.y() + b.y()) / 2 - ux * RADIUS)
+            self.path.moveTo(start)
+            self.path.quadTo(control, end)
+            self.anchor = control
+            self.head = arrowHead(end, control)
+
+"""
+@definition: This builds the arrow head of an edge that ends at tip, coming from the direction of towards
+"""
+def arrowHead(tip, towards):
+    dx, dy = towards.x() - tip.x(), towards.y() - tip.y()
+    length = hypot(dx, dy) or 1
+    ux, uy = dx / length * 10, dy / length * 10
+    return QPolygonF([tip, QPointF(tip.x() + ux - uy * 0.5, tip.y() + uy + ux * 0.5),
+                      QPointF(tip.x() + ux + uy * 0.5, tip.y() + uy - ux * 0.5)])
+
+"""
+@definition: This class is the state diagram of a machine. The states are laid out in a square grid in the order of Q,
+             the same order as the grid of State widgets, and the whole diagram is shown when it is first opened.
+             The transitions are not scene items: the ones that touch a visible state are drawn behind the states, and
+             the curves of a state are only built the first time it is visible.
+@attributes: states - dictionary from state name to its StateItem
+             layer - the parent of every StateItem, hidden all at once when the overview image is drawn instead
+             overview - the image of the whole machine drawn when zoomed all the way out
+             outgoing, incoming - the (target, symbols) and sources of the transitions of every state
+             edges - the Edge objects of every state that has been visible, by state name
+"""
+class DiagramView(QGraphicsView):
+    """
+    @definition: This is the constructor of the DiagramView class
+    @param: machine - the 2-way dfa object to draw
+            colors - function from state name to the color of the state
+    """
+    def __init__(self, machine, colors, parent=None):
+        super().__init__(parent)
+        self.setScene(QGraphicsScene(self))
+        self.setRenderHint(QPainter.Antialiasing)
+        self.setDragMode(QGraphicsView.ScrollHandDrag)
+        self.setTransformationAnchor(QGraphicsView.AnchorUnderMouse)
+        self.setViewportUpdateMode(QGraphicsView.SmartViewportUpdate)
+        self.setOptimizationFlags(QGraphicsView.DontSavePainterState | QGraphicsView.DontAdjustForAntialiasing)
+        self.states = {}
+        self.outgoing = {}
+        self.incoming = {}
+        self.edges = {}
+        self.columns = 1
+        self.overview = None
+        self.showing_overview = False
+        self.layer = None
+        self.draw(machine, colors)
+
+    """
+    @definition: This adds every state of the machine to the scene and indexes its transitions
+    """
+    def draw(self, machine, colors):
+        scene = self.scene()
+        Q = [q for q in dict.fromkeys(machine.getQ())]
+        self.columns = max(1, ceil(sqrt(len(Q))))
+        rows = max(1, ceil(len(Q) / self.columns))
+        self.overview = QImage(self.columns * OVERVIEW_CELL, rows * OVERVIEW_CELL, QImage.Format_RGB32)
+        self.overview.fill(QColor("lightgray"))
+
+        self.layer = QGraphicsRectItem()
+        scene.addItem(self.layer)
+        for i, q in enumerate(Q):
+            item = StateItem(self, q, i, colors(q), self.layer)
+            item.setPos((i % self.columns) * SPACING, (i // self.columns) * SPACING)
+            self.states[q] = item
+
+        table = machine.getTable()
+        for state_id, q in enumerate(table.getStates()):
+            targets = {}
+            for symbol_id, symbol in enumerate(table.getSymbols()):
+                transition = table.getTransition(state_id, symbol_id)
+                if transition is not None and transition[2] in self.states:
+                    targets.setdefault(transition[2], []).append(symbol)
+            self.outgoing[q] = [(target, ','.join(symbols)) for target, symbols in targets.items()]
+            for target in targets:
+                self.incoming.setdefault(target, []).append(q)
+
+        scene.setSceneRect(QRectF(-SPACING, -SPACING, (self.columns + 1) * SPACING, (rows + 1) * SPACING))
+        self.fitInView(scene.sceneRect(), Qt.KeepAspectRatio)
+        self.updateDetail()
+
+    """
+    @definition: This updates the block of a state in the overview image after its color changed
+    @param: item - the StateItem that changed color
+    """
+    def recolor(self, item):
+        if self.overview is None:
+            return
+        column, row = item.index % self.columns, item.index // self.columns
+        color = item.brush.color()
+        for x in range(OVERVIEW_CELL - 1):
+            for y in range(OVERVIEW_CELL - 1):
+                self.overview.setPixelColor(column * OVERVIEW_CELL + x, row * OVERVIEW_CELL + y, color)
+        if self.showing_overview:
+            self.scene().invalidate(item.sceneBoundingRect(), QGraphicsScene.BackgroundLayer)
+
+    """
+    @definition: This gives the scale of the view, 1 when the scene is drawn at its real size
+    """
+    def detail(self):
+        return self.transform().m11()
+
+    """
+    @definition: This switches between the state items and the overview image after the zoom changed
+    """
+    def updateDetail(self):
+        overview = self.detail() < OVERVIEW_DETAIL
+        if overview != self.showing_overview:
+            self.showing_overview = overview
+            self.layer.setVisible(not overview)
+            self.scene().invalidate(self.scene().sceneRect(), QGraphicsScene.BackgroundLayer)
+
+    """
+    @definition: This gives the edges of a state, building them the first time
+    """
+    def edgesOf(self, q):
+        if q not in self.edges:
+            source = self.states[q]
+            self.edges[q] = [Edge(source, self.states[target], label) for target, label in self.outgoing.get(q, ())]
+        return self.edges[q]
+
+    """
+    @definition: This draws the overview image, or the transitions that touch a visible state, behind the states
+    @param: painter - the painter of the view
+            rect - the part of the scene being drawn
+    """
+    def drawBackground(self, painter, rect):
+        super().drawBackground(painter, rect)
+        if self.showing_overview:
+            painter.drawImage(QRectF(-SPACING / 2, -SPACING / 2, self.columns * SPACING,
+                                     self.overview.height() / OVERVIEW_CELL * SPACING), self.overview)
+            return
+        detail = self.detail()
+        if detail < EDGE_DETAIL:
+            return
+
+        visible = [item for item in self.scene().items(rect) if isinstance(item, StateItem)]
+        shown = {item.name for item in visible}
+        edges = []
+        for item in visible:
+            edges.extend(self.edgesOf(item.name))
+            # the transitions coming in from states that are not visible
+            for source in self.incoming.get(item.name, ()):
+                if source not in shown:
+                    edges.extend(edge for edge in self.edgesOf(source) if edge.path.intersects(rect))
+
+        painter.setPen(QPen(QColor("gray"), 1))
+        painter.setBrush(Qt.NoBrush)
+        for edge in edges:
+            painter.drawPath(edge.path)
+        if detail >= LABEL_DETAIL:
+            painter.setBrush(QBrush(QColor("gray")))
+            for edge in edges:
+                painter.drawPolygon(edge.head)
+            painter.setPen(QPen(Qt.black, 1))
+            painter.setFont(QFont("Arial", 8))
+            for edge in edges:
+                painter.drawText(QRectF(edge.anchor.x() - RADIUS * 2, edge.anchor.y() - 10, RADIUS * 4, 20),
+                                 Qt.AlignCenter, edge.label)
+
+    """
+    @definition: This zooms in or out around the mouse
+    @param: event - the event that triggers the wheelEvent
+    """
+    def wheelEvent(self, event):
+        factor = ZOOM_STEP if event.angleDelta().y() > 0 else 1 / ZOOM_STEP
+        self.scale(factor, factor)
+        self.updateDetail()
+
+    """
+    @definition: This scrolls the diagram so a state is visible, if it is not already
+    @param: q - the name of the state
+    """
+    def follow(self, q):
+        self.ensureVisible(self.states[q], SPACING // 2, SPACING // 2)
@@ -0,0 +1,236 @@
+"""
+Author: Ralph Dawson G. Pineda
+Section: STALGCM S13
+Description: This file profiles where a machine spends its steps. An Instrumentation follows every step of the words
+             it runs and counts how many times every transition function is taken, how many steps are spent reading
+             in every state, how many times the head turns around, and how long every word takes. The counters live
+             in their own copy of the step loop, so runTape() and the other engines stay exactly as fast as before
+             when nothing is being profiled. The aggregated counters can be written as JSON or CSV, and the view can
+             color its states by them.
+"""
+import csv
+import json
+import time
+from array import array
+
+from controller import *
+
+"""
+@definition: This class holds the counters of every word run through it
+@attributes: table - the compiled transition table of the machine
+             transition_hits - transition_hits[state * width + symbol] is the number of times that transition was taken,
+                               taking a transition with no next state (NA) counts as well
+             state_dwell - state_dwell[state] is the number of steps read while in that state
+             hottest - the largest dwell count, None until it is needed after runTape() changed the counts
+             reversals - the number of times the head turned around
+             word_steps, word_reversals, word_seconds, word_lengths - the steps, reversals, wall time and length of every
+                                                                      word, in the order the words were run
+             verdicts - the number of words for every verdict
+"""
+class Instrumentation:
+    def __init__(self, table):
+        self.table = table
+        self.transition_hits = array('q', bytes(8 * len(table.next_state)))
+        self.state_dwell = array('q', bytes(8 * len(table.states)))
+        self.hottest = 0
+        self.reversals = 0
+        self.word_steps = array('q')
+        self.word_reversals = array('q')
+        self.word_seconds = array('d')
+        self.word_lengths = array('q')
+        self.verdicts = {verdict: 0 for verdict in VERDICTS}
+
+    """
+    @definition: This records one step taken outside of runTape(), such as a step of the view
+    @params: state - the id of the state the transition was taken from
+             symbol - the id of the symbol that was read
+             turned - True if the head moved in the other direction than in the step before
+    """
+    def recordStep(self, state, symbol, turned=False):
+        self.transition_hits[state * self.table.width + symbol] += 1
+        self.state_dwell[state] += 1
+        if self.hottest is not None and self.state_dwell[state] > self.hottest:
+            self.hottest = self.state_dwell[state]
+        if turned:
+            self.reversals += 1
+
+    """
+    @definition: This runs the machine on an encoded word like runTape() and counts every step it takes
+    @params: tape - the encoded word, see encodeWord()
+             bitset - True to detect loops with the bitset, False to detect them with the bound
+    @return: verdict - ACCEPT, REJECT or LOOP
+             steps - the number of transitions taken
+    """
+    def runTape(self, tape, bitset=True):
+        table = self.table
+        next_state = table.next_state
+        direction = table.direction
+        width = table.width
+        accept = table.accept
+        reject = table.reject
+        hits = self.transition_hits
+        dwell = self.state_dwell
+        length = len(tape)
+        last = length - 1
+        bits = ConfigurationBitset(len(table.states), length).bits if bitset else None
+        limit = len(table.states) * length
+
+        state = table.start
+        head = 0
+        steps = 0
+        move = 0
+        reversals = 0
+        verdict = None
+        while True:
+            if bits is None and steps >= limit:
+                verdict = LOOP
+                break
+            index = state * width + tape[head]
+            hits[index] += 1
+            dwell[state] += 1
+            state = next_state[index]
+            if state < 0:
+                verdict = STOP_VERDICTS[state]
+                steps += state != table.NO_TRANSITION
+                break
+            head += direction[index]
+            steps += 1
+            if (head == 0 or head == last) and (state == accept or state == reject):
+                verdict = ACCEPT if state == accept else REJECT
+                break
+            if direction[index] != move:
+                if move:
+                    reversals += 1
+                move = direction[index]
+                if bits is not None:
+                    config = state * length + head
+                    mask = 1 << (config & 7)
+                    byte = bits[config >> 3]
+                    if byte & mask:
+                        verdict = LOOP
+                        break
+                    bits[config >> 3] = byte | mask
+        self.reversals += reversals
+        self.word_reversals.append(reversals)
+        self.hottest = None
+        return verdict, steps
+
+    """
+    @definition: This runs the machine on a word like runWord() and records its counters and wall time
+    @params: word - the word input without end markers
+             bitset - how loops are detected, see runTape()
+    @return: verdict - ACCEPT, REJECT, LOOP, or INVALID if the word has a symbol not in the alphabet
+             steps - the number of transitions taken
+    """
+    def runWord(self, word, bitset=True):
+        started = time.perf_counter()
+        tape = encodeWord(self.table, word)
+        if tape is None:
+            verdict, steps = INVALID, 0
+            self.word_reversals.append(0)
+        else:
+            verdict, steps = self.runTape(tape, bitset)
+        self.word_seconds.append(time.perf_counter() - started)
+        self.word_steps.append(steps)
+        self.word_lengths.append(len(word))
+        self.verdicts[verdict] += 1
+        return verdict, steps
+
+    """
+    @definition: This gives the hits of every transition function that was taken at least once, the most taken first
+    @returns: list of (transition, hits), where transition is the transition function from the machine definition
+    """
+    def hotTransitions(self):
+        table = self.table
+        hot = []
+        for index, hits in enumerate(self.transition_hits):
+            if hits:
+                transition = table.getTransition(index // table.width, index % table.width)
+                hot.append((transition, hits))
+        hot.sort(key=lambda item: -item[1])
+        return hot
+
+    """
+    @definition: This gives the share of the steps read in every state, between 0 and 1, for the heatmap of the view
+    @returns: heat - dictionary from state name to the dwell count of the state over the largest dwell count
+    """
+    def heat(self):
+        return {state: self.stateHeat(state_id) for state_id, state in enumerate(self.table.states)}
+
+    """
+    @definition: This gives the share of the steps read in one state, see heat(). The largest dwell count is kept up
+                 to date by recordStep(), so a state can be recolored after every step without looking at the others.
+    @params: state - the state id
+    """
+    def stateHeat(self, state):
+        if self.hottest is None:
+            self.hottest = max(self.state_dwell, default=0)
+        if not self.hottest:
+            return 0.0
+        return self.state_dwell[state] / self.hottest
+
+    """
+    @definition: This aggregates every counter into a dictionary that can be written as JSON
+    """
+    def toDict(self):
+        words = len(self.word_steps)
+        steps = sum(self.word_steps)
+        seconds = sum(self.word_seconds)
+        return {
+            'words': words,
+            'steps': steps,
+            'seconds': seconds,
+            'steps_per_second': steps / seconds if seconds else None,
+            'reversals': self.reversals,
+            'verdicts': dict(self.verdicts),
+            'transitions': [
+                {'state': transition[0], 'input': transition[1], 'next_state': transition[2],
+                 'direction': transition[3], 'hits': hits}
+                for transition, hits in self.hotTransitions()
+            ],
+            'states': [
+                {'state': state, 'dwell': dwell} for state, dwell in zip(self.table.states, self.state_dwell)
+            ],
+            'word_steps': {
+                'min': min(self.word_steps, default=0),
+                'max': max(self.word_steps, default=0),
+                'mean': steps / words if words else 0,
+            },
+            'word_seconds': {
+                'min': min(self.word_seconds, default=0.0),
+                'max': max(self.word_seconds, default=0.0),
+                'mean': seconds / words if words else 0.0,
+            },
+        }
+
+    """
+    @definition: This writes the aggregated counters as JSON, see toDict()
+    @params: f - the opened output file
+    """
+    def writeJSON(self, f):
+        json.dump(self.toDict(), f, indent=2)
+        f.write('\n')
+
+    """
+    @definition: This writes the counters as CSV with one row per transition function that was taken and one row per
+                 state, so it can be sorted and filtered in a spreadsheet
+    @params: f - the opened output file
+    """
+    def writeCSV(self, f):
+        writer = csv.writer(f)
+        writer.writerow(('kind', 'state', 'input', 'next_state', 'direction', 'count'))
+        for transition, hits in self.hotTransitions():
+            writer.writerow(('transition', *transition, hits))
+        for state, dwell in zip(self.table.states, self.state_dwell):
+            writer.writerow(('state', state, '', '', '', dwell))
+
+    """
+    @definition: This writes the counters to a file, as CSV if its name ends with .csv and as JSON otherwise
+    @params: filename - the output file
+    """
+    def write(self, filename):
+        with open(filename, 'w', newline='') as f:
+            if filename.lower().endswith('.csv'):
+                self.writeCSV(f)
+            else:
+                self.writeJSON(f)
@@ -0,0 +1,144 @@
+"""
+Author: Ralph Dawson G. Pineda
+Section: STALGCM S13
+Description: This file runs a batch of words through the machine in lockstep with NumPy. Every word of the batch is
+             one row of a padded tape array with the end markers attached, and every iteration advances the state and
+             head of all the words that have not halted yet with a single fancy index into the compiled transition
+             table. NumPy is optional, install it with pip install numpy to use this engine.
+"""
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from controller import *
+
+ACCEPT_CODE, REJECT_CODE, LOOP_CODE, INVALID_CODE = range(len(VERDICTS))
+
+"""
+@definition: This makes sure NumPy is installed before using the lockstep engine
+"""
+def requireNumpy():
+    if np is None:
+        raise ImportError('the lockstep engine needs NumPy, install it with pip install numpy')
+
+"""
+@definition: This encodes a batch of words as a padded array of symbol ids. Row i is -w+ for the i-th word, the same
+             tape encodeWord() gives, followed by right end markers up to the length of the longest word. The head
+             never moves past the first right end marker, so the padding is never read.
+@params: table - the compiled transition table of the machine
+         words - list of words without end markers
+@returns: tapes - 2d array of symbol ids, one row per word
+          lengths - the length of every word, without end markers
+          valid - False for the words that have a symbol not in the alphabet
+"""
+def encodeBatch(table, words):
+    requireNumpy()
+    count = len(words)
+    lengths = np.fromiter((len(word) for word in words), dtype=np.int64, count=count)
+    dtype = np.uint8 if table.width <= 256 else np.int32
+    tapes = np.full((count, int(lengths.max(initial=0)) + 2), table.RIGHT_END, dtype=dtype)
+    tapes[:, 0] = table.LEFT_END
+    valid = np.ones(count, dtype=bool)
+
+    characters = np.frombuffer(''.join(words).encode('utf-32-le'), dtype=np.uint32)
+    if characters.size:
+        # only single character symbols can be matched, the view reads the word one character at a time
+        symbols = {ord(symbol): i for i, symbol in enumerate(table.symbols) if len(symbol) == 1 and i > table.RIGHT_END}
+        lookup = np.full(max(symbols, default=0) + 1, -1, dtype=np.int64)
+        for code, symbol_id in symbols.items():
+            lookup[code] = symbol_id
+        encoded = lookup[np.minimum(characters, lookup.size - 1)]
+        encoded[characters >= lookup.size] = -1
+
+        rows = np.repeat(np.arange(count), lengths)
+        starts = np.cumsum(lengths) - lengths
+        columns = np.arange(characters.size) - np.repeat(starts, lengths) + 1
+        valid[rows[encoded < 0]] = False
+        tapes[rows, columns] = np.maximum(encoded, 0)
+        tapes[np.arange(count), lengths + 1] = table.RIGHT_END
+    return tapes, lengths, valid
+
+"""
+@definition: This runs a batch of words in lockstep. It follows the same rules as runTape(), the words that halt are
+             masked out and the remaining ones keep advancing together. Loops are detected per word with Brent's
+             cycle detection: every word remembers one earlier configuration (state, head) and the configuration
+             is saved again at every power of two steps, so a word that comes back to it is stuck in a loop.
+             This takes two integers per word instead of a bitset per word.
+@params: table - the compiled transition table of the machine
+         words - list of words without end markers
+@returns: verdicts - array of verdict codes, VERDICTS[code] is the verdict of the word
+          steps - array of the number of transitions taken by every word
+"""
+def runBatch(table, words):
+    return runTapes(table, *encodeBatch(table, words))
+
+"""
+@definition: This runs a batch of words that are already encoded, see runBatch()
+@params: table - the compiled transition table of the machine
+         tapes, lengths, valid - the encoded words, see encodeBatch()
+@returns: verdicts - array of verdict codes, VERDICTS[code] is the verdict of the word
+          steps - array of the number of transitions taken by every word
+"""
+def runTapes(table, tapes, lengths, valid):
+    count = len(lengths)
+    verdicts = np.full(count, INVALID_CODE, dtype=np.int8)
+    steps = np.zeros(count, dtype=np.int64)
+
+    next_state = np.asarray(table.next_state, dtype=np.int64)
+    direction = np.asarray(table.direction, dtype=np.int64)
+    width = table.width
+    accept = table.accept
+    reject = table.reject
+    no_transition = table.NO_TRANSITION
+    decided_accept = table.DECIDED_ACCEPT
+
+    active = np.flatnonzero(valid)
+    last = lengths[active] + 1
+    state = np.full(active.size, table.start, dtype=np.int64)
+    head = np.zeros(active.size, dtype=np.int64)
+    taken = np.zeros(active.size, dtype=np.int64)
+    saved_state = state.copy()
+    saved_head = head.copy()
+    power = np.ones(active.size, dtype=np.int64)
+    since_saved = np.zeros(active.size, dtype=np.int64)
+
+    while active.size:
+        index = state * width + tapes[active, head]
+        state = next_state[index]
+        stopped = state < 0
+        head += direction[index]
+        taken += state != no_transition
+
+        # a negative next state stops the run, see STOP_VERDICTS
+        at_end = (head == 0) | (head == last)
+        accepted = (at_end & (state == accept)) | (state == decided_accept)
+        rejected = (stopped & (state != decided_accept)) | (at_end & (state == reject))
+        looped = (state == saved_state) & (head == saved_head) & ~accepted & ~rejected
+        done = accepted | rejected | looped
+        if done.any():
+            finished = active[done]
+            verdicts[finished] = np.where(accepted[done], ACCEPT_CODE, np.where(looped[done], LOOP_CODE, REJECT_CODE))
+            steps[finished] = taken[done]
+            keep = ~done
+            active, last, state, head, taken = active[keep], last[keep], state[keep], head[keep], taken[keep]
+            saved_state, saved_head = saved_state[keep], saved_head[keep]
+            power, since_saved = power[keep], since_saved[keep]
+
+        since_saved += 1
+        save = since_saved == power
+        saved_state[save] = state[save]
+        saved_head[save] = head[save]
+        power[save] *= 2
+        since_saved[save] = 0
+    return verdicts, steps
+
+"""
+@definition: This runs a batch of words in lockstep and gives the results in the same form as runWord()
+@params: table - the compiled transition table of the machine
+         words - list of words without end markers
+@returns: results - list of (verdict, steps) in the same order as the words
+"""
+def runWords(table, words):
+    verdicts, steps = runBatch(table, words)
+    return [(VERDICTS[code], int(count)) for code, count in zip(verdicts.tolist(), steps.tolist())]
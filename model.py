@@ -1,3 +1,6 @@
+import json
+import struct
+from array import array
 
 class Machine_2DFA:
     def __init__(self, Q, sigma, delta, start, accept, reject):
@@ -14,6 +17,7 @@ class Machine_2DFA:
         self.direction = "right"
         self.accepted = False
         self.prev_state = start
+        self.table = None
 
     """
     getters for the DFA
@@ -42,22 +46,38 @@ class Machine_2DFA:
         return self.accepted
     def getPrevState(self):
         return self.prev_state
+    """
+    the transition table is compiled the first time it is needed and
+    recompiled after any part of the machine definition changes
+    """
+    def getTable(self):
+        if self.table is None:
+            self.table = TransitionTable(self.Q, self.sigma, self.delta, self.start, self.accept, self.reject)
+        return self.table
+    def setTable(self, table):
+        self.table = table
   
     """
     setters for the DFA
     """
     def setQ(self, Q):
         self.Q = Q
+        self.table = None
     def setSigma(self, sigma):
         self.sigma = sigma
+        self.table = None
     def setDelta(self, delta):
         self.delta = delta
+        self.table = None
     def setStart(self, start):
         self.start = start
+        self.table = None
     def setAccept(self, accept):
         self.accept = accept
+        self.table = None
     def setReject(self, reject):
         self.reject = reject
+        self.table = None
     def setWord(self, word):
         self.word = word
     def setCurrState(self, curr_state):
@@ -66,6 +86,8 @@ class Machine_2DFA:
         self.head = self.head + 1
     def setLeftHead(self):
         self.head = self.head - 1
+    def setHead(self, head):
+        self.head = head
     def setDirection(self, direction):
         self.direction = direction
     def setAccepted(self, accepted):
@@ -85,6 +107,7 @@ class Machine_2DFA:
         self.direction ="right"
         self.accepted = False
         self.prev_state = None
+        self.table = None
         
     def resetState(self):
         self.word = None
@@ -92,4 +115,204 @@ class Machine_2DFA:
         self.head = 0
         self.direction = "right"
         self.accepted = False
-        self.prev_state = self.curr_state
\ No newline at end of file
+        self.prev_state = self.curr_state
+
+"""
+@definition: This class is the compiled form of the transition functions of a 2-way dfa. States and symbols
+             are interned as integers and the transitions are stored in a flat state x symbol table, so finding
+             the next step is a single index instead of a scan over every transition function.
+             The left end marker '-' is always symbol 0 and the right end marker '+' is always symbol 1.
+@attributes: states  -  list of state names, the index of a state is its id
+             symbols  -  list of symbols, the end markers followed by sigma, the index of a symbol is its id
+             width  -  number of symbols, the length of one row of the table
+             next_state  -  next_state[state * width + symbol] is the id of the next state or NO_TRANSITION, in an
+                            early table it can also be DECIDED_ACCEPT or DECIDED_REJECT, see analysis.earlyTable()
+             direction  -  direction[state * width + symbol] is 1 for right, -1 for left and 0 for no transition
+             transition_id  -  transition_id[state * width + symbol] is the index in delta of the transition used
+"""
+class TransitionTable:
+    NO_TRANSITION = -1
+    DECIDED_REJECT = -2
+    DECIDED_ACCEPT = -3
+    LEFT_END = 0
+    RIGHT_END = 1
+
+    def __init__(self, Q, sigma, delta, start, accept, reject):
+        self.states = list(Q)
+        self.symbols = ['-', '+'] + [s for s in sigma if s not in ('-', '+')]
+        self.delta = delta
+        self.state_index = {}
+        for i, state in enumerate(self.states):
+            self.state_index.setdefault(state, i)
+        self.symbol_index = {symbol: i for i, symbol in enumerate(self.symbols)}
+        self.width = len(self.symbols)
+
+        self.start = self.state_index.get(start, self.NO_TRANSITION)
+        self.accept = self.state_index.get(accept, self.NO_TRANSITION)
+        self.reject = self.state_index.get(reject, self.NO_TRANSITION)
+
+        size = len(self.states) * self.width
+        self.next_state = [self.NO_TRANSITION] * size
+        self.direction = [0] * size
+        self.transition_id = [self.NO_TRANSITION] * size
+        for i, transition in enumerate(delta):
+            curr_state, req_input, next_state, direction = transition
+            if curr_state not in self.state_index or req_input not in self.symbol_index:
+                continue
+            index = self.state_index[curr_state] * self.width + self.symbol_index[req_input]
+            # the first matching transition wins, the same one a linear scan would find
+            if self.transition_id[index] != self.NO_TRANSITION:
+                continue
+            self.transition_id[index] = i
+            if next_state in self.state_index:
+                self.next_state[index] = self.state_index[next_state]
+                self.direction[index] = -1 if direction == 'left' else 1
+
+    """
+    getters for the transition table
+    """
+    def getStates(self):
+        return self.states
+    def getSymbols(self):
+        return self.symbols
+    def getWidth(self):
+        return self.width
+    def getStateId(self, state):
+        return self.state_index.get(state, self.NO_TRANSITION)
+    def getSymbolId(self, symbol):
+        return self.symbol_index.get(symbol, self.NO_TRANSITION)
+    def getStateName(self, state_id):
+        return self.states[state_id]
+    def getTransition(self, state_id, symbol_id):
+        transition = self.transition_id[state_id * self.width + symbol_id]
+        if transition == self.NO_TRANSITION:
+            return None
+        return self.delta[transition]
+
+    """
+    @definition: This packs the transition table into bytes: the length of a json header with the names of the states
+                 and symbols and the machine definition, the header itself, then next_state, direction and transition_id
+                 as arrays of 32-bit integers. The packed table can be placed in shared memory or saved to a file.
+    @return: the packed table
+    """
+    def pack(self):
+        header = json.dumps({
+            'states': self.states,
+            'symbols': self.symbols,
+            'delta': self.delta,
+            'start': self.start,
+            'accept': self.accept,
+            'reject': self.reject,
+        }).encode('utf-8')
+        header += b' ' * (-len(header) % 4)
+        packed = bytearray(struct.pack('<I', len(header)))
+        packed += header
+        for values in (self.next_state, self.direction, self.transition_id):
+            packed += array('i', values).tobytes()
+        return bytes(packed)
+
+    """
+    @definition: This rebuilds a transition table packed with pack(). Unless copy is True the arrays are not copied,
+                 next_state, direction and transition_id become integer views over the buffer, so the buffer has to
+                 outlive the table.
+    @param: buffer - the packed table, any object supporting the buffer protocol such as bytes or shared memory
+            copy - True to copy the arrays into lists, which are faster to index
+    @return: the transition table
+    """
+    @staticmethod
+    def unpack(buffer, copy=False):
+        view = memoryview(buffer)
+        (header_length,) = struct.unpack_from('<I', view)
+        header = json.loads(bytes(view[4:4 + header_length]))
+        table = TransitionTable.__new__(TransitionTable)
+        table.states = header['states']
+        table.symbols = header['symbols']
+        table.delta = header['delta']
+        table.state_index = {}
+        for i, state in enumerate(table.states):
+            table.state_index.setdefault(state, i)
+        table.symbol_index = {symbol: i for i, symbol in enumerate(table.symbols)}
+        table.width = len(table.symbols)
+        table.start = header['start']
+        table.accept = header['accept']
+        table.reject = header['reject']
+
+        size = len(table.states) * table.width * 4
+        offset = 4 + header_length
+        table.next_state = view[offset:offset + size].cast('i')
+        table.direction = view[offset + size:offset + 2 * size].cast('i')
+        table.transition_id = view[offset + 2 * size:offset + 3 * size].cast('i')
+        if copy:
+            table.next_state = table.next_state.tolist()
+            table.direction = table.direction.tolist()
+            table.transition_id = table.transition_id.tolist()
+        return table
+
+
+"""
+@definition: This class keeps track of the configurations a 2-way dfa has been in while reading one word.
+             A configuration is a (state, head) pair, so there are at most |Q| * n of them for a tape of length n
+             and each one takes a single bit. A deterministic machine that comes back to a configuration
+             it has been in before is stuck in a loop.
+@attributes: length - the length of the tape, including the end markers
+             bits - one bit per configuration, the bit of (state, head) is at index state * length + head
+"""
+class ConfigurationBitset:
+    def __init__(self, states, length):
+        self.length = length
+        self.bits = bytearray((states * length + 7) >> 3)
+
+
+"""
+@definition: This class collects every problem found while validating a machine definition, instead of stopping at
+             the first one. Every error keeps the line of the definition file it comes from: line 1 is Q, line 2 is
+             sigma, line 3 is the start, accept and reject states, and transition function i is on line i + 4.
+@attributes: errors - list of errors, each one a dict with:
+                        line - the line of the definition file
+                        code - the kind of error, the same codes initializeMachine() returns:
+                                1 - the machine is not deterministic
+                                2 - a transition function is invalid
+                                3 - the states or the alphabet are invalid
+                        message - what is wrong
+                        transition - the transition function in question, None for the other lines
+"""
+class ValidationReport:
+    NOT_DETERMINISTIC = 1
+    INVALID_TRANSITION = 2
+    INVALID_DEFINITION = 3
+    FIRST_TRANSITION_LINE = 4
+
+    def __init__(self, errors=None):
+        self.errors = errors if errors is not None else []
+
+    def addError(self, line, code, message, transition=None):
+        self.errors.append({'line': line, 'code': code, 'message': message, 'transition': transition})
+
+    def getErrors(self):
+        return self.errors
+
+    def isValid(self):
+        return not self.errors
+
+    """
+    @definition: This gives the code of the machine definition, 0 if it is valid. When there are several kinds of
+                 errors the lowest code is given, in the same order initializeMachine() used to check them.
+    """
+    def getCode(self):
+        return min((error['code'] for error in self.errors), default=0)
+
+    """
+    @definition: This gives one line of text per error, sorted by line
+    """
+    def describe(self):
+        lines = []
+        for error in sorted(self.errors, key=lambda error: error['line']):
+            text = f"line {error['line']}: {error['message']}"
+            if error['transition'] is not None:
+                text += " (" + ' '.join(error['transition']) + ")"
+            lines.append(text)
+        return lines
+
+    def printErrors(self):
+        for line in self.describe():
+            print(line)
@@ -0,0 +1,339 @@
+"""
+Author: Ralph Dawson G. Pineda
+Section: STALGCM S13
+Description: This file converts a 2-way dfa into an equivalent one way dfa with Shepherdson's construction, so a word
+             can be decided in a single left to right pass. A state of the one way dfa is the behavior of the 2-way dfa
+             on the prefix -x read so far:
+                init  -  the state in which the machine started on the left end marker first leaves the prefix to the right
+                T(q)  -  the state in which the machine leaves the prefix to the right after entering its last cell
+                         from the right in state q
+             Either one can also be a verdict, when the machine halts or loops without leaving the prefix.
+             The behaviors are built lazily, only the ones reached by the words actually read are ever computed.
+"""
+import collections
+
+from controller import *
+
+EXIT_ACCEPT = -1
+EXIT_REJECT = -2
+EXIT_LOOP = -3
+EXIT_VERDICTS = {EXIT_ACCEPT: ACCEPT, EXIT_REJECT: REJECT, EXIT_LOOP: LOOP}
+
+"""
+@definition: This class is the one way dfa equivalent to a 2-way dfa. Its states are numbered in the order their
+             behaviors are found and its transitions are filled in the first time they are taken.
+@attributes: table - the compiled transition table of the 2-way dfa
+             behaviors - behaviors[i] is the behavior of state i, (init, T(0), ..., T(|Q| - 1))
+             next_state - next_state[i * width + symbol] is the state reached from state i by reading the symbol,
+                          NOT_BUILT until it is computed. The end markers are never read.
+             verdicts - verdicts[i] is the verdict of a word that ends in state i, None until it is computed
+             complete - True when every reachable state and transition has been built
+             minimal - True when the dfa has been minimized
+"""
+class OneWayDFA:
+    NOT_BUILT = -1
+
+    def __init__(self, table):
+        self.table = table
+        self.width = table.width
+        self.behaviors = []
+        self.behavior_index = {}
+        self.next_state = []
+        self.verdicts = []
+        self.complete = False
+        self.minimal = False
+        self.start = self.addBehavior(self.leftEndBehavior())
+
+    """
+    @definition: This gives the behavior of the prefix made of the left end marker alone
+    """
+    def leftEndBehavior(self):
+        table = self.table
+        exits = []
+        for q in range(len(table.states)):
+            if q == table.accept:
+                exits.append(EXIT_ACCEPT)
+            elif q == table.reject:
+                exits.append(EXIT_REJECT)
+            else:
+                exits.append(self.exitRight(q, table.LEFT_END))
+        # the machine starts on the left end marker without checking if it should halt
+        return (self.exitRight(table.start, table.LEFT_END),) + tuple(exits)
+
+    """
+    @definition: This follows a single transition from a cell that the machine can only leave to the right
+    @returns: the state in which the machine leaves the cell, EXIT_REJECT if it halts or falls off the tape
+    """
+    def exitRight(self, state, symbol):
+        index = state * self.width + symbol
+        next_state = self.table.next_state[index]
+        if next_state < 0 or self.table.direction[index] < 0:
+            return EXIT_REJECT
+        return next_state
+
+    """
+    @definition: This follows the machine after it enters a cell holding a symbol of the alphabet from the left,
+                 bouncing between the cell and the prefix behind it until it leaves the cell to the right
+    @params: behavior - the behavior of the prefix to the left of the cell
+             state - the state in which the machine enters the cell
+             symbol - the symbol in the cell
+    @returns: the state in which the machine leaves the cell to the right, or the verdict it reaches
+    """
+    def arrive(self, behavior, state, symbol):
+        next_states = self.table.next_state
+        direction = self.table.direction
+        width = self.width
+        seen = set()
+        while state >= 0:
+            if state in seen:
+                return EXIT_LOOP
+            seen.add(state)
+            index = state * width + symbol
+            next_state = next_states[index]
+            if next_state < 0:
+                return EXIT_REJECT
+            if direction[index] > 0:
+                return next_state
+            state = behavior[next_state + 1]
+        return state
+
+    """
+    @definition: This gives the behavior of the prefix extended by one symbol of the alphabet
+    """
+    def extend(self, behavior, symbol):
+        init = self.arrive(behavior, behavior[0], symbol)
+        return (init,) + tuple(self.arrive(behavior, q, symbol) for q in range(len(self.table.states)))
+
+    """
+    @definition: This gives the verdict of a word whose prefix behavior is known, by following the machine
+                 on the right end marker
+    """
+    def finish(self, behavior):
+        table = self.table
+        state = behavior[0]
+        seen = set()
+        while state >= 0:
+            if state == table.accept:
+                return ACCEPT
+            if state == table.reject:
+                return REJECT
+            if state in seen:
+                return LOOP
+            seen.add(state)
+            index = state * self.width + table.RIGHT_END
+            next_state = table.next_state[index]
+            if next_state < 0 or table.direction[index] > 0:
+                return REJECT
+            state = behavior[next_state + 1]
+        return EXIT_VERDICTS[state]
+
+    """
+    @definition: This gives the state of a behavior, adding a new state the first time the behavior is found
+    """
+    def addBehavior(self, behavior):
+        state = self.behavior_index.get(behavior)
+        if state is None:
+            state = len(self.behaviors)
+            self.behavior_index[behavior] = state
+            self.behaviors.append(behavior)
+            self.next_state.extend([self.NOT_BUILT] * self.width)
+            self.verdicts.append(None)
+        return state
+
+    """
+    @definition: This gives the state reached by reading a symbol of the alphabet, building it if needed
+    @params: state - the current state of the one way dfa
+             symbol - the id of the symbol being read, see TransitionTable
+    """
+    def step(self, state, symbol):
+        index = state * self.width + symbol
+        next_state = self.next_state[index]
+        if next_state == self.NOT_BUILT:
+            next_state = self.addBehavior(self.extend(self.behaviors[state], symbol))
+            self.next_state[index] = next_state
+        return next_state
+
+    """
+    @definition: This gives the verdict of a word that ends in the given state
+    """
+    def verdict(self, state):
+        verdict = self.verdicts[state]
+        if verdict is None:
+            verdict = self.finish(self.behaviors[state])
+            self.verdicts[state] = verdict
+        return verdict
+
+    """
+    @definition: This reads a piece of a word starting from any state of the one way dfa
+    @params: state - the state before reading the piece
+             word - the piece of the word, without end markers
+    @returns: the state after reading the piece, None if it has a symbol not in the alphabet
+    """
+    def read(self, state, word):
+        symbol_index = self.table.symbol_index
+        next_states = self.next_state
+        width = self.width
+        for character in word:
+            symbol = symbol_index.get(character, -1)
+            if symbol <= self.table.RIGHT_END:
+                return None
+            next_state = next_states[state * width + symbol]
+            if next_state == self.NOT_BUILT:
+                next_state = self.step(state, symbol)
+            state = next_state
+        return state
+
+    """
+    @definition: This decides a word in one left to right pass
+    @params: word - the word without end markers
+    @returns: verdict - ACCEPT, REJECT, LOOP, or INVALID if the word has a symbol not in the alphabet
+    """
+    def runWord(self, word):
+        state = self.read(self.start, word)
+        if state is None:
+            return INVALID
+        return self.verdict(state)
+
+    """
+    @definition: This decides a batch of words, reading the prefixes they share once. The words are visited in sorted
+                 order, which is a depth-first walk of their trie, and the state reached after every prefix of the
+                 previous word is kept. A word only reads the symbols after its longest common prefix with the word
+                 before it, so the symbols read are the nodes of the trie instead of the sum of the word lengths.
+    @params: words - list of words without end markers
+    @returns: verdicts - list of ACCEPT, REJECT, LOOP or INVALID in the same order as the words
+    """
+    def runWords(self, words):
+        symbol_index = self.table.symbol_index
+        next_states = self.next_state
+        width = self.width
+        known = self.verdicts
+        verdicts = [None] * len(words)
+        # path[d] is the state after the first d symbols of the previous word, None after a symbol not in the alphabet
+        path = [self.start]
+        previous = ''
+        for i in sorted(range(len(words)), key=words.__getitem__):
+            word = words[i]
+            depth = commonPrefixLength(previous, word)
+            del path[depth + 1:]
+            state = path[depth]
+            for character in word[depth:]:
+                if state is not None:
+                    symbol = symbol_index.get(character, -1)
+                    if symbol <= self.table.RIGHT_END:
+                        state = None
+                    else:
+                        next_state = next_states[state * width + symbol]
+                        if next_state == self.NOT_BUILT:
+                            next_state = self.step(state, symbol)
+                        state = next_state
+                path.append(state)
+            if state is None:
+                verdicts[i] = INVALID
+            else:
+                verdicts[i] = known[state] or self.verdict(state)
+            previous = word
+        return verdicts
+
+    """
+    @definition: This builds every state and transition reachable from the start state. The number of states can be
+                 exponential in |Q|, so this is only done when the whole dfa is needed, as in minimize()
+    @params: max_states - the most states to build, a ValueError is raised past it and the dfa stays lazy, None for no
+                          limit
+    """
+    def build(self, max_states=None):
+        state = 0
+        while state < len(self.behaviors):
+            if max_states is not None and len(self.behaviors) > max_states:
+                raise ValueError(f'the one way dfa has more than {max_states} states')
+            for symbol in range(self.table.RIGHT_END + 1, self.width):
+                self.step(state, symbol)
+            self.verdict(state)
+            state += 1
+        self.complete = True
+
+    """
+    @definition: This builds the whole one way dfa and merges the states that give the same verdict for every
+                 possible rest of the word (Moore's partition refinement)
+    @returns: a new complete OneWayDFA with the fewest states, each state keeps the behavior of one of the states it merges
+    """
+    def minimize(self):
+        if not self.complete:
+            self.build()
+        symbols = range(self.table.RIGHT_END + 1, self.width)
+        verdict_block = {verdict: i for i, verdict in enumerate(VERDICTS)}
+        blocks = [verdict_block[verdict] for verdict in self.verdicts]
+        count = len(set(blocks))
+        while True:
+            signatures = {}
+            refined = []
+            for state in range(len(self.behaviors)):
+                row = state * self.width
+                signature = (blocks[state],) + tuple(blocks[self.next_state[row + symbol]] for symbol in symbols)
+                refined.append(signatures.setdefault(signature, len(signatures)))
+            blocks = refined
+            if len(signatures) == count:
+                break
+            count = len(signatures)
+
+        minimal = OneWayDFA.__new__(OneWayDFA)
+        minimal.table = self.table
+        minimal.width = self.width
+        minimal.behaviors = [None] * count
+        minimal.behavior_index = {}
+        minimal.next_state = [self.NOT_BUILT] * (count * self.width)
+        minimal.verdicts = [None] * count
+        minimal.complete = True
+        minimal.minimal = True
+        for state in range(len(self.behaviors)):
+            block = blocks[state]
+            if minimal.behaviors[block] is None:
+                minimal.behaviors[block] = self.behaviors[state]
+                minimal.behavior_index[self.behaviors[state]] = block
+                minimal.verdicts[block] = self.verdicts[state]
+                for symbol in symbols:
+                    minimal.next_state[block * self.width + symbol] = blocks[self.next_state[state * self.width + symbol]]
+        minimal.start = blocks[self.start]
+        return minimal
+
+"""
+@definition: This gives the length of the longest common prefix of two words. The prefixes are compared as slices,
+             with a binary search on their length, so the characters are compared in C instead of one at a time.
+"""
+def commonPrefixLength(first, second):
+    if second.startswith(first):
+        return len(first)
+    length = min(len(first), len(second))
+    if first[:length] == second[:length]:
+        return length
+    # first[:low] == second[:low] and first[:high] != second[:high]
+    low, high = 0, length
+    while high - low > 1:
+        middle = (low + high) // 2
+        if first[:middle] == second[:middle]:
+            low = middle
+        else:
+            high = middle
+    return low
+
+# the number of machines compileOneWay() keeps the one way dfa of, a dfa holds its table so it is never freed on its own
+ONEWAY_MACHINES = 4
+_cache = collections.OrderedDict()
+
+"""
+@definition: This gives the one way dfa of a validated machine. The dfa is cached for the compiled transition table,
+             so it keeps the states it has built until the machine definition changes. The dfas of the last
+             ONEWAY_MACHINES tables are kept.
+@params: table - the compiled transition table of the machine, see Machine_2DFA.getTable()
+         minimal - True to build the whole one way dfa and minimize it, False to build it lazily
+@returns: the OneWayDFA of the machine
+"""
+def compileOneWay(table, minimal=False):
+    dfa = _cache.pop(table, None)
+    if dfa is None:
+        dfa = OneWayDFA(table)
+    if minimal and not dfa.minimal:
+        dfa = dfa.minimize()
+    _cache[table] = dfa
+    while len(_cache) > ONEWAY_MACHINES:
+        _cache.popitem(last=False)
+    return dfa
@@ -0,0 +1,69 @@
+"""
+Author: Ralph Dawson G. Pineda
+Section: STALGCM S13
+Description: This file runs a word file over a pool of worker processes. The machine is read and validated once, its
+             compiled transition table is packed into shared memory, and every worker attaches to it when it starts
+             instead of reading the machine definition again. The word file is split into chunks that are sent to the
+             workers, and the results are written back in the same order as the word file.
+"""
+from collections import deque
+from multiprocessing import Pool, shared_memory
+
+from model import TransitionTable
+from batch import CHUNK_SIZE, evaluateChunk, readWordChunks, writeResults, newCounts
+
+# the compiled table of the machine in a worker process, attached by attachTable()
+_memory = None
+_table = None
+
+"""
+@definition: This attaches a worker process to the packed transition table in shared memory
+@params: name - the name of the shared memory block
+"""
+def attachTable(name):
+    global _memory, _table
+    _memory = shared_memory.SharedMemory(name=name)
+    _table = TransitionTable.unpack(_memory.buf)
+    # indexing a list is faster than indexing a memoryview, and the arrays are only |Q| * |sigma| long
+    _table.next_state = _table.next_state.tolist()
+    _table.direction = _table.direction.tolist()
+
+"""
+@definition: This runs a chunk of words in a worker process, see evaluateChunk()
+"""
+def evaluateWorkerChunk(words, engine, bitset):
+    return evaluateChunk(_table, words, engine, bitset)
+
+"""
+@definition: This runs a whole word file over a pool of worker processes and writes the results in the same format
+             and order as evaluateFile(). At most two chunks per worker are in flight at a time, so the word file is
+             never held in memory all at once.
+@params: table - the compiled transition table of the machine
+         words_file - the opened word file
+         out - the opened output file
+         jobs - the number of worker processes
+         engine - the engine that runs the words, see evaluateChunk()
+         bitset - how loops are detected by the python engine, see runTape()
+         size - the number of words per chunk
+@returns: counts - the number of words for every verdict
+"""
+def evaluateFileParallel(table, words_file, out, jobs, engine='python', bitset=True, size=CHUNK_SIZE * 4):
+    counts = newCounts()
+    packed = table.pack()
+    memory = shared_memory.SharedMemory(create=True, size=len(packed))
+    try:
+        memory.buf[:len(packed)] = packed
+        with Pool(jobs, initializer=attachTable, initargs=(memory.name,)) as pool:
+            pending = deque()
+            for words in readWordChunks(words_file, size):
+                pending.append((words, pool.apply_async(evaluateWorkerChunk, (words, engine, bitset))))
+                if len(pending) >= 2 * jobs:
+                    words, results = pending.popleft()
+                    writeResults(out, words, results.get(), counts)
+            while pending:
+                words, results = pending.popleft()
+                writeResults(out, words, results.get(), counts)
+    finally:
+        memory.close()
+        memory.unlink()
+    return counts
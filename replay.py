@@ -0,0 +1,160 @@
+"""
+Author: Ralph Dawson G. Pineda
+Section: STALGCM S13
+Description: This file records a run of the machine so it can be replayed without computing it again. A Trace keeps
+             the configuration after every step as packed integer arrays of state ids, head positions and transition
+             ids, so seeking to any step is a single index. For runs too long to keep every step, a trace can keep only
+             every k-th configuration instead; seeking then replays at most k - 1 steps from the checkpoint before it.
+"""
+from array import array
+
+from controller import *
+
+PROGRESS_INTERVAL = 1 << 14
+
+"""
+@definition: This class is a recorded run of the machine on one word. Position 0 is the start configuration, before
+             any step is taken, and position i is the configuration after the i-th step.
+@attributes: table - the compiled transition table of the machine
+             tape - the encoded word, see encodeWord()
+             checkpoint - 0 if every configuration is kept, otherwise only every checkpoint-th configuration is kept
+             states, heads - the state id and head position of every kept configuration
+             transitions - the index in delta of the transition that led to every kept configuration, -1 at position 0
+             steps - the number of steps of the run, so the positions go from 0 to steps
+             verdict - ACCEPT, REJECT or LOOP, None if the recording was cancelled before the run ended
+             halt_transition - the index in delta of the transition with no next state (NA) that rejected the word
+                               after the last position, -1 if the run did not end that way
+             cursor - the last configuration that was sought, so replaying the next step takes a single step
+"""
+class Trace:
+    def __init__(self, table, tape, checkpoint=0):
+        self.table = table
+        self.tape = tape
+        self.checkpoint = checkpoint
+        self.states = array('i')
+        self.heads = array('i')
+        self.transitions = array('i')
+        self.steps = 0
+        self.verdict = None
+        self.halt_transition = -1
+        self.cursor = None
+
+    def __len__(self):
+        return self.steps + 1
+
+    """
+    @definition: This gives the number of bytes used by the kept configurations
+    """
+    def nbytes(self):
+        return sum(len(values) * values.itemsize for values in (self.states, self.heads, self.transitions))
+
+    """
+    @definition: This gives the configuration of the run at a position
+    @params: position - the number of steps taken, from 0 to steps
+    @returns: state - the state id
+              head - the head position, 0 is the left end marker
+              transition - the index in delta of the transition that led to this configuration, -1 at position 0
+    """
+    def seek(self, position):
+        if not 0 <= position <= self.steps:
+            raise IndexError(f'position {position} is not between 0 and {self.steps}')
+        if not self.checkpoint:
+            return self.states[position], self.heads[position], self.transitions[position]
+
+        cursor = self.cursor
+        if cursor is None or not cursor[0] <= position or position - cursor[0] >= self.checkpoint:
+            kept = position // self.checkpoint
+            cursor = (kept * self.checkpoint, self.states[kept], self.heads[kept], self.transitions[kept])
+        at, state, head, transition = cursor
+        table = self.table
+        while at < position:
+            index = state * table.width + self.tape[head]
+            transition = table.transition_id[index]
+            head += table.direction[index]
+            state = table.next_state[index]
+            at += 1
+        self.cursor = (at, state, head, transition)
+        return state, head, transition
+
+    """
+    @definition: This keeps a configuration if the trace keeps every configuration or if it is a checkpoint
+    """
+    def keep(self, position, state, head, transition):
+        if not self.checkpoint or position % self.checkpoint == 0:
+            self.states.append(state)
+            self.heads.append(head)
+            self.transitions.append(transition)
+
+"""
+@definition: This runs the machine on an encoded word like runTape() and records every configuration of the run
+@params: table - the compiled transition table of the machine
+         tape - the encoded word, see encodeWord()
+         bitset - True to detect loops with the bitset, False to detect them with the bound
+         checkpoint - 0 to keep every configuration, otherwise keep only every checkpoint-th configuration
+         progress - None, or a function called with (steps, state, head) every PROGRESS_INTERVAL steps.
+                    Returning True from it cancels the recording.
+@returns: trace - the recorded run, its verdict is the verdict runTape() gives, or None if it was cancelled
+"""
+def recordTrace(table, tape, bitset=True, checkpoint=0, progress=None):
+    trace = Trace(table, tape, checkpoint)
+    next_state = table.next_state
+    direction = table.direction
+    transition_id = table.transition_id
+    width = table.width
+    accept = table.accept
+    reject = table.reject
+    length = len(tape)
+    last = length - 1
+    bits = ConfigurationBitset(len(table.states), length).bits if bitset else None
+    limit = len(table.states) * length
+
+    state = table.start
+    head = 0
+    steps = 0
+    move = 0
+    report = PROGRESS_INTERVAL if progress is not None else -1
+    trace.keep(0, state, head, -1)
+    while True:
+        if bits is None and steps >= limit:
+            trace.verdict = LOOP
+            break
+        index = state * width + tape[head]
+        if next_state[index] < 0:
+            trace.verdict = REJECT
+            trace.halt_transition = transition_id[index]
+            break
+        state = next_state[index]
+        head += direction[index]
+        steps += 1
+        trace.keep(steps, state, head, transition_id[index])
+        if steps == report:
+            if progress(steps, state, head):
+                break
+            report += PROGRESS_INTERVAL
+        if (head == 0 or head == last) and (state == accept or state == reject):
+            trace.verdict = ACCEPT if state == accept else REJECT
+            break
+        if bits is not None and direction[index] != move:
+            move = direction[index]
+            config = state * length + head
+            mask = 1 << (config & 7)
+            byte = bits[config >> 3]
+            if byte & mask:
+                trace.verdict = LOOP
+                break
+            bits[config >> 3] = byte | mask
+    trace.steps = steps
+    return trace
+
+"""
+@definition: This records the run of the machine on a word, see recordTrace()
+@params: table - the compiled transition table of the machine
+         word - the word input without end markers
+         bitset, checkpoint, progress - see recordTrace()
+@returns: trace - the recorded run, None if the word has a symbol not in the alphabet
+"""
+def recordWord(table, word, bitset=True, checkpoint=0, progress=None):
+    tape = encodeWord(table, word)
+    if tape is None:
+        return None
+    return recordTrace(table, tape, bitset, checkpoint, progress)
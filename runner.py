@@ -0,0 +1,58 @@
+"""
+Author: Ralph Dawson G. Pineda
+Section: STALGCM S13
+Description: This file runs the machine for the view outside of the GUI thread. A TraceWorker records the whole run
+             of a word in a QThread (see replay.py) so a long word does not freeze the window. While it runs it sends
+             the step, state and head it has reached, at most PROGRESS_RATE times per second so the view is never
+             asked to repaint faster than the display can show it, and it stops early when it is cancelled.
+"""
+import time
+
+from PyQt5.QtCore import QThread, pyqtSignal
+
+from replay import recordWord
+
+PROGRESS_RATE = 60
+
+"""
+@definition: This class records the run of a word in a worker thread
+@attributes: table - the compiled transition table of the machine
+             word - the word input without end markers
+             checkpoint - see replay.recordTrace()
+             trace - the recorded run once the thread is finished, its verdict is None if it was cancelled
+@signals: progress(steps, state, head) - the step the run has reached, with the state id and head position
+          recorded(trace) - the recorded run, sent once when the thread is finished or cancelled
+"""
+class TraceWorker(QThread):
+    progress = pyqtSignal(int, int, int)
+    recorded = pyqtSignal(object)
+
+    def __init__(self, table, word, checkpoint=0, parent=None):
+        super().__init__(parent)
+        self.table = table
+        self.word = word
+        self.checkpoint = checkpoint
+        self.trace = None
+        self.reported = 0.0
+
+    """
+    @definition: This records the run, it is called in the worker thread by QThread.start()
+    """
+    def run(self):
+        self.reported = time.monotonic()
+        self.trace = recordWord(self.table, self.word, checkpoint=self.checkpoint, progress=self.report)
+        self.recorded.emit(self.trace)
+
+    """
+    @definition: This is called by the recording every few thousand steps. It sends the progress if the last one was
+                 sent more than a frame ago, and tells the recording to stop if the thread was cancelled.
+    @returns: True to cancel the recording
+    """
+    def report(self, steps, state, head):
+        if self.isInterruptionRequested():
+            return True
+        now = time.monotonic()
+        if now - self.reported >= 1 / PROGRESS_RATE:
+            self.reported = now
+            self.progress.emit(steps, state, head)
+        return False
@@ -0,0 +1,424 @@
+"""
+Author: Ralph Dawson G. Pineda
+Section: STALGCM S13
+Description: This file is a local evaluation service, so other programs on the same host can run words through
+             machines without starting batch.py for every query. The machine definitions are read and validated once
+             at startup, then the server listens on a Unix socket or a local TCP port. Every line a client sends is a
+             JSON request and every request gets one JSON response line, in the same order as the requests:
+                {"id": 1, "machine": "test", "word": "abba"}  ->  {"id": 1, "verdict": "reject", "steps": 7}
+                {"id": 2, "op": "stats"}                       ->  {"id": 2, "stats": {...}}
+             The machine can be left out when only one machine is loaded. The words of every client go through one
+             queue, and the requests waiting in it are run together in micro-batches, up to --batch-size words or
+             --batch-delay seconds after the first one, so the engine gets whole chunks instead of single words.
+             Both the queue and the requests of a connection waiting for their response are bounded: when they are
+             full the server stops reading from the clients, so an overloaded server slows its clients down instead
+             of growing without limit.
+
+Usage: python server.py tests/test.txt [name=machine.txt ...] (--socket /tmp/2dfa.sock | --port 8765)
+"""
+import argparse
+import asyncio
+import json
+import os
+import signal
+import stat
+import sys
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from controller import *
+from batch import evaluateChunk
+from codegen import compiledFor
+import codegen
+import oneway
+from verdictcache import VerdictCache, machineFingerprint
+import lockstep
+
+ENGINES = ('compiled', 'python', 'numpy', 'sweep', 'oneway', 'trie')
+BATCH_SIZE = 256
+BATCH_DELAY = 0.001
+QUEUE_SIZE = 4096
+IN_FLIGHT = 256
+# the longest request line, the stream of a connection also buffers at most twice this much
+LINE_LIMIT = 1 << 20
+LATENCY_WINDOW = 10000
+
+"""
+@definition: This class holds the metrics of the server
+@attributes: latencies - the seconds from the arrival to the answer of the last LATENCY_WINDOW words
+             requests - the number of requests answered, errors included
+             errors - the number of requests answered with an error
+             batches - the number of micro-batches run
+             batched_words - the number of words run in the micro-batches
+             max_queue_depth - the largest number of words waiting in the queue at once
+             connections - the number of open connections
+"""
+class Metrics:
+    def __init__(self, window=LATENCY_WINDOW):
+        self.latencies = deque(maxlen=window)
+        self.requests = 0
+        self.errors = 0
+        self.batches = 0
+        self.batched_words = 0
+        self.max_queue_depth = 0
+        self.connections = 0
+
+    """
+    @definition: This gives the latency percentiles of the words in the window, in milliseconds
+    """
+    def percentiles(self):
+        latencies = sorted(self.latencies)
+        if not latencies:
+            return {}
+        percentiles = {f'p{percent}': latencies[min(len(latencies) - 1, len(latencies) * percent // 100)] * 1e3
+                       for percent in (50, 90, 99)}
+        percentiles['max'] = latencies[-1] * 1e3
+        return percentiles
+
+"""
+@definition: This class is the evaluation service
+@attributes: machines - dictionary from the name of a machine to its compiled transition table
+             engine - the engine the micro-batches are run with, see batch.evaluateChunk()
+             bitset - how loops are detected, see runTape()
+             batch_size - the most words in a micro-batch
+             batch_delay - the most seconds a micro-batch waits for more words after its first one
+             in_flight - the most requests of one connection waiting for their response
+             queue - the words waiting to be run, as (name, word, future, arrival)
+             cache - the VerdictCache the words are looked up in first, None to run every word
+             fingerprints - the fingerprint of every machine in the cache
+             metrics - the Metrics of the server
+             connections - the tasks of the open connections
+"""
+class EvaluationServer:
+    def __init__(self, machines, engine='compiled', bitset=True, batch_size=BATCH_SIZE, batch_delay=BATCH_DELAY,
+                 queue_size=QUEUE_SIZE, in_flight=IN_FLIGHT, cache=None):
+        self.machines = machines
+        self.engine = engine
+        self.bitset = bitset
+        self.batch_size = batch_size
+        self.batch_delay = batch_delay
+        self.in_flight = in_flight
+        self.queue_size = queue_size
+        self.queue = None
+        self.cache = cache
+        self.fingerprints = {name: machineFingerprint(table, engine, bitset) for name, table in machines.items()}
+        self.metrics = Metrics()
+        self.connections = set()
+        # the words are run outside of the event loop, so it keeps reading requests and filling the next batch
+        self.executor = ThreadPoolExecutor(max_workers=1)
+
+    """
+    @definition: This runs a micro-batch, one chunk per machine, in the worker thread
+    @params: batch - list of (name, word, future, arrival)
+    @returns: results - list of (verdict, steps) in the same order as the batch
+    """
+    def evaluate(self, batch):
+        groups = {}
+        for position, (name, word, _, _) in enumerate(batch):
+            groups.setdefault(name, []).append(position)
+        results = [None] * len(batch)
+        for name, positions in groups.items():
+            table = self.machines[name]
+            words = [batch[position][1] for position in positions]
+            run = lambda words: evaluateChunk(table, words, self.engine, self.bitset)
+            if self.cache is not None:
+                found = self.cache.runWords(self.fingerprints[name], words, run)
+            else:
+                found = run(words)
+            for position, result in zip(positions, found):
+                results[position] = result
+        return results
+
+    """
+    @definition: This takes the words from the queue in micro-batches and answers them, for as long as the server runs
+    """
+    async def runBatches(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.batch_delay
+            while len(batch) < self.batch_size:
+                if self.queue.empty():
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                    except asyncio.TimeoutError:
+                        break
+                else:
+                    batch.append(self.queue.get_nowait())
+
+            try:
+                results = await loop.run_in_executor(self.executor, self.evaluate, batch)
+            except Exception as error:
+                results = [error] * len(batch)
+            self.metrics.batches += 1
+            self.metrics.batched_words += len(batch)
+            answered = time.perf_counter()
+            for (_, _, future, arrival), result in zip(batch, results):
+                self.metrics.latencies.append(answered - arrival)
+                if future.cancelled():
+                    continue
+                if isinstance(result, Exception):
+                    future.set_exception(result)
+                else:
+                    future.set_result({'verdict': result[0], 'steps': result[1]})
+
+    """
+    @definition: This gives the metrics of the server as a dictionary, see Metrics
+    """
+    def stats(self):
+        metrics = self.metrics
+        stats = {
+            'requests': metrics.requests,
+            'errors': metrics.errors,
+            'connections': metrics.connections,
+            'queue_depth': self.queue.qsize() if self.queue is not None else 0,
+            'max_queue_depth': metrics.max_queue_depth,
+            'queue_size': self.queue_size,
+            'batches': metrics.batches,
+            'mean_batch_size': metrics.batched_words / metrics.batches if metrics.batches else 0.0,
+            'latency_ms': metrics.percentiles(),
+        }
+        if self.cache is not None:
+            stats['verdict_cache'] = self.cache.stats()
+        return stats
+
+    """
+    @definition: This reads one request line and gives the future of its response. A word is put in the queue,
+                 waiting while the queue is full. A request that cannot be read is answered with an error at once, so
+                 a bad line never closes the connection or loses the responses of the lines before it.
+    @params: line - the request line as bytes
+    @returns: request_id - the id of the request, echoed in the response, None if it has none
+              future - the future of the response, a dictionary
+    """
+    async def submit(self, line):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        request_id = None
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise ValueError('a request is a JSON object')
+            if not isinstance(request.get('id'), (str, int, type(None))):
+                raise ValueError('the id is not a string or an integer')
+            request_id = request.get('id')
+            if request.get('op') == 'stats':
+                future.set_result({'stats': self.stats()})
+                return request_id, future
+            if 'op' in request:
+                raise ValueError(f"unknown op {request['op']!r}")
+            name = request.get('machine')
+            if name is None and len(self.machines) == 1:
+                name = next(iter(self.machines))
+            if not isinstance(name, str) or name not in self.machines:
+                raise ValueError(f'unknown machine {name!r}')
+            word = request.get('word')
+            if not isinstance(word, str):
+                raise ValueError('the word is missing or is not a string')
+        except ValueError as error:
+            future.set_exception(error)
+            return request_id, future
+        except Exception as error:
+            # anything else a strange request runs into, such as a JSON document nested too deep to decode
+            future.set_exception(ValueError(f'the request cannot be read: {error!r}'))
+            return request_id, future
+
+        await self.queue.put((name, word, future, time.perf_counter()))
+        self.metrics.max_queue_depth = max(self.metrics.max_queue_depth, self.queue.qsize())
+        return request_id, future
+
+    """
+    @definition: This writes the responses of one connection in the order of its requests. Once the client is gone the
+                 responses are still awaited, so the reader of the connection is never left waiting, but not written.
+    @params: pending - the queue of (request_id, future) of the connection, None after the last request
+             writer - the StreamWriter of the connection
+    """
+    async def writeResponses(self, pending, writer):
+        connected = True
+        while True:
+            item = await pending.get()
+            if item is None:
+                return
+            request_id, future = item
+            try:
+                response = {'id': request_id, **await future}
+            except Exception as error:
+                response = {'id': request_id, 'error': str(error)}
+                self.metrics.errors += 1
+            self.metrics.requests += 1
+            if not connected:
+                continue
+            writer.write(json.dumps(response).encode('utf-8') + b'\n')
+            # the responses that are already answered go out together
+            if pending.empty():
+                try:
+                    await writer.drain()
+                except ConnectionError:
+                    connected = False
+
+    """
+    @definition: This serves one connection until the client closes it or the server stops. When the server stops, the
+                 responses that are still pending are dropped instead of waiting for a client that may not read them.
+    """
+    async def handleConnection(self, reader, writer):
+        task = asyncio.current_task()
+        self.connections.add(task)
+        self.metrics.connections += 1
+        pending = asyncio.Queue(self.in_flight)
+        responses = asyncio.create_task(self.writeResponses(pending, writer))
+        try:
+            try:
+                while True:
+                    try:
+                        line = await reader.readline()
+                    except ValueError:
+                        # the line is longer than the limit of the stream, the rest of the connection cannot be framed
+                        future = asyncio.get_running_loop().create_future()
+                        future.set_exception(ValueError(f'the request is longer than {LINE_LIMIT} bytes'))
+                        await pending.put((None, future))
+                        break
+                    if not line:
+                        break
+                    if line.strip():
+                        await pending.put(await self.submit(line))
+            except ConnectionError:
+                pass
+            await pending.put(None)
+            await responses
+        except asyncio.CancelledError:
+            # the server is stopping, see closeConnections(), the connection task ends quietly
+            pass
+        finally:
+            responses.cancel()
+            self.connections.discard(task)
+            self.metrics.connections -= 1
+            writer.close()
+
+    """
+    @definition: This stops every open connection, see handleConnection()
+    """
+    async def closeConnections(self):
+        connections = list(self.connections)
+        for connection in connections:
+            connection.cancel()
+        await asyncio.gather(*connections, return_exceptions=True)
+
+    """
+    @definition: This listens on a Unix socket or on a TCP port until the task is cancelled
+    @params: socket_path - the path of the Unix socket, None to listen on TCP
+             host, port - the address to listen on over TCP
+             ready - function called once the server is listening, None to call nothing
+    """
+    async def serve(self, socket_path=None, host='127.0.0.1', port=8765, ready=None):
+        self.queue = asyncio.Queue(self.queue_size)
+        batches = asyncio.create_task(self.runBatches())
+        # SIGTERM stops the server like Ctrl+C, so the socket is removed and the stats are printed
+        try:
+            asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, asyncio.current_task().cancel)
+        except NotImplementedError:
+            pass
+        try:
+            if socket_path is not None:
+                # a socket left behind by a server that was killed is replaced, any other file is not
+                if os.path.exists(socket_path) and stat.S_ISSOCK(os.stat(socket_path).st_mode):
+                    os.remove(socket_path)
+                server = await asyncio.start_unix_server(self.handleConnection, path=socket_path, limit=LINE_LIMIT)
+            else:
+                server = await asyncio.start_server(self.handleConnection, host, port, limit=LINE_LIMIT)
+            async with server:
+                try:
+                    if ready is not None:
+                        ready(server)
+                    await server.serve_forever()
+                finally:
+                    # the connections are stopped before the server is closed, closing it waits for them
+                    await self.closeConnections()
+        finally:
+            batches.cancel()
+            await asyncio.gather(batches, return_exceptions=True)
+            self.executor.shutdown(wait=False)
+            if socket_path is not None and os.path.exists(socket_path):
+                os.remove(socket_path)
+
+"""
+@definition: This reads and validates the machine definitions the server runs, with readMachine() and
+             initializeMachine()
+@params: definitions - list of machine definition files, each one either a path or name=path. The name of a path
+                       alone is its file name without the extension.
+@returns: machines - dictionary from the name of every machine to its compiled transition table, None if a machine
+                     definition is invalid
+          paths - dictionary from the name of every machine to its definition file
+"""
+def loadMachines(definitions):
+    machines = {}
+    paths = {}
+    for definition in definitions:
+        name, separator, path = definition.partition('=')
+        if not separator:
+            path = definition
+            name = os.path.splitext(os.path.basename(definition))[0]
+        Q, sigma, start, accept, reject, delta = readMachine(path)
+        code, machine = initializeMachine(Q, sigma, delta, start, accept, reject)
+        if code != 0:
+            print(f'Invalid machine definition {path} (code {code})', file=sys.stderr)
+            return None, None
+        machines[name] = machine.getTable()
+        paths[name] = path
+    return machines, paths
+
+def parseArguments(argv):
+    parser = argparse.ArgumentParser(description='Serve 2-way dfa verdicts to local clients as newline-delimited JSON.')
+    parser.add_argument('machines', nargs='+', help='machine definition files, as path or name=path')
+    parser.add_argument('--socket', default=None, help='listen on this Unix socket instead of TCP')
+    parser.add_argument('--host', default='127.0.0.1', help='the address to listen on over TCP')
+    parser.add_argument('--port', type=int, default=8765, help='the port to listen on over TCP')
+    parser.add_argument('--engine', choices=ENGINES, default='compiled',
+                        help='the engine the micro-batches are run with, see batch.py')
+    parser.add_argument('--loop-check', choices=('bitset', 'bound'), default='bitset',
+                        help='detect loops with a visited-configuration bitset or with the |Q| * n step bound')
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help='the most words in a micro-batch')
+    parser.add_argument('--batch-delay', type=float, default=BATCH_DELAY,
+                        help='the most seconds a micro-batch waits for more words after its first one')
+    parser.add_argument('--queue-size', type=int, default=QUEUE_SIZE,
+                        help='the most words waiting to be run, the server stops reading requests past it')
+    parser.add_argument('--in-flight', type=int, default=IN_FLIGHT,
+                        help='the most requests of one connection waiting for their response')
+    parser.add_argument('--verdict-cache', action='store_true',
+                        help='answer the words that were already run from a cache of the most recently used words')
+    args = parser.parse_args(argv)
+    if args.batch_size < 1 or args.queue_size < 1 or args.in_flight < 1:
+        parser.error('--batch-size, --queue-size and --in-flight must be at least 1')
+    return args
+
+def main(argv=None):
+    args = parseArguments(argv)
+    if args.engine == 'numpy':
+        lockstep.requireNumpy()
+    machines, paths = loadMachines(args.machines)
+    if machines is None:
+        return 1
+    if args.engine == 'compiled':
+        # every machine stays compiled, the batches would compile them again in turn otherwise
+        codegen.COMPILED_MACHINES = max(codegen.COMPILED_MACHINES, len(machines))
+        for name, table in machines.items():
+            compiledFor(table, paths[name])
+    if args.engine in ('oneway', 'trie'):
+        # every machine keeps the one way states it has built
+        oneway.ONEWAY_MACHINES = max(oneway.ONEWAY_MACHINES, len(machines))
+
+    server = EvaluationServer(machines, args.engine, args.loop_check == 'bitset', args.batch_size, args.batch_delay,
+                              args.queue_size, args.in_flight, VerdictCache() if args.verdict_cache else None)
+    address = args.socket or f'{args.host}:{args.port}'
+    ready = lambda listening: print(f"serving {', '.join(machines)} on {address}", file=sys.stderr)
+    try:
+        asyncio.run(server.serve(args.socket, args.host, args.port, ready))
+    except (KeyboardInterrupt, asyncio.CancelledError):
+        pass
+    print(json.dumps(server.stats()), file=sys.stderr)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,127 @@
+"""
+Author: Ralph Dawson G. Pineda
+Section: STALGCM S13
+Description: This file decides words that are too long to hold in memory. The word is read in chunks from a file or
+             stdin and only the behavior of the prefix read so far is kept (see oneway.py), so the memory used does not
+             depend on the length of the word. After every chunk it can tell the verdict the machine would give if the
+             word ended there.
+
+Usage: python stream.py machine.txt [word_file] [--chunk-size N]
+"""
+import argparse
+import sys
+
+from controller import *
+from batch import loadMachineFile
+import oneway
+
+CHUNK_SIZE = 1 << 16
+
+"""
+@definition: This class follows one word as it is read in chunks
+@attributes: dfa - the one way dfa of the machine
+             cached - True to remember the behaviors in the one way dfa, False to keep only the current behavior.
+                      The cached behaviors are bounded by the machine and not by the word, but a machine with a large
+                      number of behaviors can use cached=False to keep a single behavior of |Q| + 1 entries instead.
+             state - the state of the one way dfa after the prefix read so far, when cached
+             behavior - the behavior of the prefix read so far, when not cached
+             length - the number of symbols read so far
+             invalid - True when a symbol not in the alphabet has been read
+"""
+class StreamEvaluator:
+    def __init__(self, table, cached=True):
+        self.dfa = oneway.compileOneWay(table)
+        self.cached = cached
+        self.state = self.dfa.start
+        self.behavior = self.dfa.behaviors[self.dfa.start]
+        self.length = 0
+        self.invalid = False
+
+    """
+    @definition: This reads the next chunk of the word
+    @param: chunk - the next symbols of the word
+    """
+    def feed(self, chunk):
+        self.length += len(chunk)
+        if self.invalid:
+            return
+        if self.cached:
+            state = self.dfa.read(self.state, chunk)
+            if state is None:
+                self.invalid = True
+            else:
+                self.state = state
+            return
+        symbol_index = self.dfa.table.symbol_index
+        behavior = self.behavior
+        for character in chunk:
+            symbol = symbol_index.get(character, -1)
+            if symbol <= self.dfa.table.RIGHT_END:
+                self.invalid = True
+                return
+            behavior = self.dfa.extend(behavior, symbol)
+        self.behavior = behavior
+
+    """
+    @definition: This gives the verdict of the prefix read so far, as if the right end marker came next
+    @return: verdict - ACCEPT, REJECT, LOOP, or INVALID if the prefix has a symbol not in the alphabet
+    """
+    def verdict(self):
+        if self.invalid:
+            return INVALID
+        if self.cached:
+            return self.dfa.verdict(self.state)
+        return self.dfa.finish(self.behavior)
+
+"""
+@definition: This reads a word from a file in chunks
+@params: table - the compiled transition table of the machine
+         f - the opened file holding the word, line breaks are skipped so a long word can be wrapped over lines
+         size - the number of characters per chunk
+         cached - see StreamEvaluator
+@returns: (length, verdict) - the number of symbols read and the verdict of that prefix, yielded after every chunk
+"""
+def evaluateStream(table, f, size=CHUNK_SIZE, cached=True):
+    evaluator = StreamEvaluator(table, cached)
+    line_breaks = str.maketrans('', '', '\r\n')
+    while True:
+        chunk = f.read(size)
+        if not chunk:
+            break
+        chunk = chunk.translate(line_breaks)
+        if not chunk:
+            continue
+        evaluator.feed(chunk)
+        yield evaluator.length, evaluator.verdict()
+
+def parseArguments(argv):
+    parser = argparse.ArgumentParser(description='Decide a word read in chunks from a file or stdin.')
+    parser.add_argument('machine', help='machine definition file, see README.md for the format')
+    parser.add_argument('word', nargs='?', default='-', help='file holding the word, - for stdin')
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help='number of characters read at a time')
+    parser.add_argument('--uncached', action='store_true',
+                        help='keep only the current prefix behavior instead of caching the one way dfa')
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parseArguments(argv)
+    code, machine = loadMachineFile(args.machine)
+    if code != 0:
+        print(f'Invalid machine definition {args.machine} (code {code})', file=sys.stderr)
+        return 1
+
+    f = sys.stdin if args.word == '-' else open(args.word, encoding='utf-8')
+    evaluated = False
+    try:
+        for length, verdict in evaluateStream(machine.getTable(), f, args.chunk_size, not args.uncached):
+            print(f'{length}\t{verdict}', flush=True)
+            evaluated = True
+    finally:
+        if f is not sys.stdin:
+            f.close()
+    if not evaluated:
+        print(f'0\t{StreamEvaluator(machine.getTable()).verdict()}')
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,138 @@
+"""
+Author: Ralph Dawson G. Pineda
+Section: STALGCM S13
+Description: This file runs the machine with macro-steps over sweeps. A lot of the steps of a 2-way dfa are spent in
+             a state that reads a symbol, stays in the same state and keeps moving the same way, like Q1 reading b's
+             or Q4 reading a's in tests/test.txt. Such a sweep only ends at the first symbol the state does not loop
+             on, so it can be taken in one step: the symbols every state loops on are found once per machine, and for
+             every word the tape is translated into a mask of the cells in that set (once per set, in C through
+             bytes.translate()). The end of the sweep is then a single bytes.find() on the mask. The verdicts and the
+             step counts are exactly the same as runTape(), the cells of a sweep are only counted instead of read one
+             by one.
+"""
+from controller import *
+
+"""
+@definition: This class holds the sweeps of a machine: the sets of symbols every state loops on, for each direction
+@attributes: table - the compiled transition table of the machine
+             masks - masks[key] translates a tape into 1 for every symbol of the set numbered key and 0 elsewhere
+             sweep_key - sweep_key[state * width + symbol] is the key of the set the next state loops on in the
+                         direction of that transition, -1 if it does not loop in that direction
+"""
+class Sweeps:
+    def __init__(self, table):
+        self.table = table
+        self.masks = []
+        width = table.width
+        next_state = table.next_state
+        direction = table.direction
+        self.sweep_key = [-1] * len(next_state)
+        # the masks are byte translation tables, so a machine with more than 256 symbols is not swept
+        if width > 256:
+            return
+
+        keys = {}
+        loops = {}
+        for state in range(len(table.states)):
+            for move in (-1, 1):
+                symbols = tuple(symbol for symbol in range(width)
+                                if next_state[state * width + symbol] == state
+                                and direction[state * width + symbol] == move)
+                if not symbols:
+                    continue
+                if symbols not in keys:
+                    keys[symbols] = len(self.masks)
+                    mask = bytearray(256)
+                    for symbol in symbols:
+                        mask[symbol] = 1
+                    self.masks.append(bytes(mask))
+                loops[state, move] = keys[symbols]
+        for index, state in enumerate(next_state):
+            if state >= 0:
+                self.sweep_key[index] = loops.get((state, direction[index]), -1)
+
+    """
+    @definition: This runs the machine on an encoded word like runTape(), taking every sweep in one macro-step
+    @params: tape - the encoded word, see encodeWord(), as a list of symbol ids or as bytes
+             bitset - True to detect loops with the bitset, False to detect them with the bound
+    @return: verdict - ACCEPT, REJECT or LOOP
+             steps - the number of transitions taken
+    """
+    def runTape(self, tape, bitset=True):
+        table = self.table
+        if not self.masks:
+            return runTape(table, tape, bitset)
+        tape = bytes(tape)
+        next_state = table.next_state
+        direction = table.direction
+        sweep_key = self.sweep_key
+        masks = self.masks
+        width = table.width
+        accept = table.accept
+        reject = table.reject
+        length = len(tape)
+        last = length - 1
+        bits = ConfigurationBitset(len(table.states), length).bits if bitset else None
+        limit = len(table.states) * length
+        # the mask of every set used on this word, translated the first time it is needed
+        marked = {}
+
+        state = table.start
+        head = 0
+        steps = 0
+        move = 0
+        while True:
+            if bits is None and steps >= limit:
+                return LOOP, steps
+            index = state * width + tape[head]
+            state = next_state[index]
+            if state < 0:
+                return STOP_VERDICTS[state], steps + (state != table.NO_TRANSITION)
+            head += direction[index]
+            steps += 1
+            if (head == 0 or head == last) and (state == accept or state == reject):
+                return (ACCEPT if state == accept else REJECT), steps
+            if direction[index] != move:
+                move = direction[index]
+                if bits is not None:
+                    config = state * length + head
+                    mask = 1 << (config & 7)
+                    byte = bits[config >> 3]
+                    if byte & mask:
+                        return LOOP, steps
+                    bits[config >> 3] = byte | mask
+
+            key = sweep_key[index]
+            if key < 0:
+                continue
+            # a sweep over one cell is cheaper to take as a normal step, the head is never on the end marker it
+            # moves towards when the state loops on the cell it reads
+            member = masks[key]
+            if not member[tape[head]] or not member[tape[head + move]]:
+                continue
+            cells = marked.get(key)
+            if cells is None:
+                cells = marked[key] = tape.translate(member)
+            # the sweep ends on the first cell the state does not loop on, an end marker at the latest since the
+            # machine cannot move right from '+' or left from '-'
+            end = cells.find(0, head) if move > 0 else cells.rfind(0, 0, head)
+            steps += (end - head) * move
+            head = end
+            if bits is None and steps > limit:
+                # a run with no loop check stops at the bound, in the middle of the sweep
+                return LOOP, limit
+            if (head == 0 or head == last) and (state == accept or state == reject):
+                return (ACCEPT if state == accept else REJECT), steps
+
+    """
+    @definition: This runs the machine on a word like runWord(), taking every sweep in one macro-step
+    @params: word - the word input without end markers
+             bitset - how loops are detected, see runTape()
+    @return: verdict - ACCEPT, REJECT, LOOP, or INVALID if the word has a symbol not in the alphabet
+             steps - the number of transitions taken
+    """
+    def runWord(self, word, bitset=True):
+        tape = encodeWord(self.table, word)
+        if tape is None:
+            return INVALID, 0
+        return self.runTape(tape, bitset)
@@ -0,0 +1,87 @@
+"""
+Author: Ralph Dawson G. Pineda
+Section: STALGCM S13
+Description: This file draws the tape of the machine for the view. The word is not put in a label: the TapeView only
+             paints the cells that fit in its width, centered on the head, so moving the head repaints a window of a
+             few dozen cells no matter how long the word is. The cell under the head is highlighted, and the position
+             of the first and last cell of the window is shown when the word does not fit.
+"""
+from PyQt5.QtWidgets import QWidget, QSizePolicy
+from PyQt5.QtGui import QPainter, QColor, QFont, QFontMetrics
+from PyQt5.QtCore import Qt, QRect
+
+CELL_WIDTH = 22
+CELL_HEIGHT = 26
+
+"""
+@definition: This class is the view of the tape, a row of cells with one symbol each
+@attributes: word - the word on the tape, with its end markers
+             head - the position of the head on the tape
+"""
+class TapeView(QWidget):
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.word = ""
+        self.head = 0
+        self.cell_font = QFont("Arial", 10)
+        self.small_font = QFont("Arial", 7)
+        self.setMinimumHeight(CELL_HEIGHT + QFontMetrics(self.small_font).height() + 4)
+        self.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Fixed)
+
+    """
+    @definition: This puts a new word on the tape with the head on its first cell
+    @param: word - the word with its end markers, empty if there is no word
+    """
+    def setWord(self, word):
+        self.word = word
+        self.head = 0
+        self.update()
+
+    """
+    @definition: This moves the head, the tape is only repainted if the head moved
+    @param: head - the new position of the head
+    """
+    def setHead(self, head):
+        if head != self.head:
+            self.head = head
+            self.update()
+
+    """
+    @definition: This gives the positions of the first cell and one past the last cell that fit in the view. The
+                 window is centered on the head, and stops at the ends of the word.
+    """
+    def window(self):
+        cells = max(1, self.width() // CELL_WIDTH)
+        first = max(0, min(self.head - cells // 2, len(self.word) - cells))
+        return first, min(len(self.word), first + cells)
+
+    """
+    @definition: This paints the cells of the window
+    @param: event - the event that triggers the paintEvent
+    """
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        first, last = self.window()
+        left = (self.width() - (last - first) * CELL_WIDTH) // 2
+        painter.setFont(self.cell_font)
+        for position in range(first, last):
+            cell = QRect(left + (position - first) * CELL_WIDTH, 0, CELL_WIDTH, CELL_HEIGHT)
+            if position == self.head:
+                painter.fillRect(cell, QColor("blue"))
+                painter.setPen(Qt.white)
+            else:
+                painter.fillRect(cell, QColor("white"))
+                painter.setPen(Qt.black)
+            painter.drawText(cell, Qt.AlignCenter, self.word[position])
+            painter.setPen(Qt.gray)
+            painter.drawRect(cell)
+
+        painter.setFont(self.small_font)
+        painter.setPen(Qt.black)
+        below = QRect(0, CELL_HEIGHT + 2, self.width(), self.height() - CELL_HEIGHT - 2)
+        if first > 0:
+            painter.drawText(below.adjusted(left, 0, 0, 0), Qt.AlignLeft, str(first))
+        if last < len(self.word):
+            painter.drawText(below.adjusted(0, 0, -left, 0), Qt.AlignRight, str(last - 1))
+        if self.word:
+            painter.drawText(below, Qt.AlignCenter, f'{self.head} / {len(self.word) - 1}')
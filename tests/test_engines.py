@@ -0,0 +1,213 @@
+"""
+Author: Ralph Dawson G. Pineda
+Section: STALGCM S13
+Description: This file checks every engine against runTape() on random valid machines and on every short word, and
+             the word counts of counting.py against the words counted one by one. The machines are drawn at random
+             with every kind of transition a valid machine may have, including missing ones ('NA'), accept and
+             reject states that wander over the tape and a single state that is both the accept and the reject
+             state, so the engines are checked on more than the sample machine.
+
+Usage: python -m pytest tests (or python -m unittest discover tests) from the root of the repository
+"""
+import itertools
+import os
+import random
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from controller import *
+from analysis import reduceMachine, earlyTable
+from codegen import compileMachine
+from counting import WordCounter
+from stream import StreamEvaluator
+from sweep import Sweeps
+import lockstep
+import oneway
+
+MACHINES = 150
+MAX_LENGTH = 6
+SIGMA = ('a', 'b', 'c')
+
+"""
+@definition: This draws a random valid machine definition
+@params: rng - the random.Random instance to draw from
+@returns: Q, sigma, start, accept, reject, delta - the machine definition in the same form as readMachine()
+"""
+def randomMachine(rng):
+    sigma = list(SIGMA[:rng.randint(1, len(SIGMA))])
+    states = rng.randint(1, 5)
+    # a valid machine may also accept and reject in the same state
+    halting = ['qA'] if rng.random() < 0.2 else ['qA', 'qR']
+    Q = ['q' + str(i) for i in range(states)] + halting
+    accept, reject = halting[0], halting[-1]
+    delta = []
+    for state in Q:
+        for symbol in ['-'] + sigma + ['+']:
+            if symbol == '-':
+                direction = 'right'
+            elif symbol == '+':
+                direction = 'left'
+            else:
+                direction = rng.choice(('left', 'right'))
+            if state in (accept, reject):
+                next_state = state
+            elif rng.random() < 0.1:
+                next_state = direction = 'NA'
+            else:
+                next_state = rng.choice(Q)
+            delta.append([state, symbol, next_state, direction])
+    return Q, sigma, rng.choice(Q[:states]), accept, reject, delta
+
+"""
+@definition: This gives every word over the alphabet up to the given length, the empty word first
+"""
+def allWords(sigma, length):
+    return [''.join(word) for n in range(length + 1) for word in itertools.product(sigma, repeat=n)]
+
+class EngineTest(unittest.TestCase):
+    """
+    @definition: This runs the check on every random machine with every short word and a word with a symbol that is
+                 not in the alphabet
+    @params: check - function of (machine, table, words, expected), expected is the list of (verdict, steps) of
+                     runWord() with the bitset
+    """
+    def forEveryMachine(self, check):
+        rng = random.Random(2023)
+        for seed in range(MACHINES):
+            Q, sigma, start, accept, reject, delta = randomMachine(rng)
+            code, machine = initializeMachine(Q, sigma, delta, start, accept, reject)
+            self.assertEqual(code, 0, delta)
+            table = machine.getTable()
+            words = allWords(sigma, MAX_LENGTH) + [sigma[0] + '#']
+            expected = [runWord(table, word) for word in words]
+            with self.subTest(machine=seed):
+                check(machine, table, words, expected)
+
+    def assertVerdicts(self, results, expected, words):
+        for word, (verdict, _), (other, _) in zip(words, results, expected):
+            self.assertEqual(verdict, other, word)
+
+    def assertResults(self, results, expected, words):
+        for word, result, other in zip(words, results, expected):
+            self.assertEqual(result, other, word)
+
+    """
+    @definition: This compares the steps of the words that halt, the engines that detect loops another way notice
+                 them after another number of steps
+    """
+    def assertHaltingSteps(self, results, expected, words):
+        for word, result, other in zip(words, results, expected):
+            if other[0] != LOOP:
+                self.assertEqual(result, other, word)
+
+    def testBound(self):
+        def check(machine, table, words, expected):
+            results = [runWord(table, word, False) for word in words]
+            self.assertVerdicts(results, expected, words)
+            self.assertHaltingSteps(results, expected, words)
+        self.forEveryMachine(check)
+
+    @unittest.skipIf(lockstep.np is None, 'NumPy is not installed')
+    def testNumpy(self):
+        def check(machine, table, words, expected):
+            results = lockstep.runWords(table, words)
+            self.assertVerdicts(results, expected, words)
+            self.assertHaltingSteps(results, expected, words)
+        self.forEveryMachine(check)
+
+    def testOneWay(self):
+        def check(machine, table, words, expected):
+            dfa = oneway.compileOneWay(table)
+            self.assertVerdicts([(dfa.runWord(word), None) for word in words], expected, words)
+        self.forEveryMachine(check)
+
+    def testMinimalOneWay(self):
+        def check(machine, table, words, expected):
+            dfa = oneway.compileOneWay(table, minimal=True)
+            self.assertVerdicts([(dfa.runWord(word), None) for word in words], expected, words)
+        self.forEveryMachine(check)
+
+    def testTrie(self):
+        def check(machine, table, words, expected):
+            shuffled = list(range(len(words)))
+            random.Random(len(words)).shuffle(shuffled)
+            verdicts = oneway.compileOneWay(table).runWords([words[i] for i in shuffled])
+            results = [None] * len(words)
+            for i, verdict in zip(shuffled, verdicts):
+                results[i] = (verdict, None)
+            self.assertVerdicts(results, expected, words)
+        self.forEveryMachine(check)
+
+    def testSweep(self):
+        def check(machine, table, words, expected):
+            sweeps = Sweeps(table)
+            self.assertResults([sweeps.runWord(word) for word in words], expected, words)
+            self.assertResults([sweeps.runWord(word, False) for word in words],
+                               [runWord(table, word, False) for word in words], words)
+        self.forEveryMachine(check)
+
+    def testCompiled(self):
+        def check(machine, table, words, expected):
+            compiled = compileMachine(table)
+            self.assertResults([compiled.runWord(word) for word in words], expected, words)
+            self.assertResults([compiled.runWord(word, False) for word in words],
+                               [runWord(table, word, False) for word in words], words)
+        self.forEveryMachine(check)
+
+    def testEarly(self):
+        def check(machine, table, words, expected):
+            early = earlyTable(table)
+            results = [runWord(early, word) for word in words]
+            self.assertVerdicts(results, expected, words)
+            for word, (verdict, steps), (_, other) in zip(words, results, expected):
+                if verdict != LOOP:
+                    self.assertLessEqual(steps, other, word)
+        self.forEveryMachine(check)
+
+    def testReduce(self):
+        def check(machine, table, words, expected):
+            reduced, _ = reduceMachine(machine)
+            results = [runWord(reduced.getTable(), word) for word in words]
+            self.assertVerdicts(results, expected, words)
+            self.assertHaltingSteps(results, expected, words)
+        self.forEveryMachine(check)
+
+    def testStream(self):
+        def check(machine, table, words, expected):
+            rng = random.Random(len(words))
+            for cached in (True, False):
+                for word, (verdict, _) in zip(words, expected):
+                    evaluator = StreamEvaluator(table, cached)
+                    read = 0
+                    while read < len(word):
+                        size = rng.randint(1, 3)
+                        evaluator.feed(word[read:read + size])
+                        read += size
+                    self.assertEqual(evaluator.verdict(), verdict, word)
+        self.forEveryMachine(check)
+
+class CountingTest(unittest.TestCase):
+    def testCountsMatchEveryWord(self):
+        rng = random.Random(2024)
+        for seed in range(MACHINES):
+            Q, sigma, start, accept, reject, delta = randomMachine(rng)
+            code, machine = initializeMachine(Q, sigma, delta, start, accept, reject)
+            table = machine.getTable()
+            verdicts = {verdict: [[] for _ in range(MAX_LENGTH + 1)] for verdict in (ACCEPT, REJECT, LOOP)}
+            for word in allWords(sigma, MAX_LENGTH):
+                verdicts[runWord(table, word)[0]][len(word)].append(word)
+            for verdict, by_length in verdicts.items():
+                with self.subTest(machine=seed, verdict=verdict):
+                    counter = WordCounter(table, verdict)
+                    for length, found in enumerate(by_length):
+                        self.assertEqual(counter.count(length), len(found), length)
+                        word = counter.sample(length, rng)
+                        if found:
+                            self.assertIn(word, found)
+                        else:
+                            self.assertIsNone(word)
+
+if __name__ == '__main__':
+    unittest.main()
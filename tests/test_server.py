@@ -0,0 +1,72 @@
+"""
+Author: Ralph Dawson G. Pineda
+Section: STALGCM S13
+Description: This file checks that the evaluation server answers every request line of a connection in order, and that
+             a request it cannot read gets an error response instead of closing the connection.
+
+Usage: python -m pytest tests (or python -m unittest discover tests) from the root of the repository
+"""
+import asyncio
+import json
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from controller import *
+from server import EvaluationServer, loadMachines
+
+SAMPLE_MACHINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'test.txt')
+
+"""
+@definition: This starts a server on a free local TCP port, sends the request lines on one connection and gives the
+             response of every line
+@params: server - the EvaluationServer
+         lines - list of request lines, without their line breaks
+@returns: responses - list of the responses as dictionaries, in the order of the lines
+"""
+async def exchange(server, lines):
+    listening = asyncio.get_running_loop().create_future()
+    serving = asyncio.create_task(server.serve(port=0, ready=listening.set_result))
+    try:
+        port = (await listening).sockets[0].getsockname()[1]
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        writer.write(b''.join(line.encode('utf-8') + b'\n' for line in lines))
+        await writer.drain()
+        responses = [json.loads(await asyncio.wait_for(reader.readline(), 10)) for _ in lines]
+        writer.close()
+        return responses
+    finally:
+        serving.cancel()
+        await asyncio.gather(serving, return_exceptions=True)
+
+class ServerTest(unittest.TestCase):
+    def setUp(self):
+        machines, _ = loadMachines([SAMPLE_MACHINE])
+        self.table = machines['test']
+        self.server = EvaluationServer(machines, engine='python')
+
+    def testMalformedLinesAfterValidOne(self):
+        lines = [
+            '{"id": 1, "machine": "test", "word": "abba"}',
+            '{"id": 2, "machine": [1], "word": "a"}',
+            '{"id": [3], "word": "a"}',
+            '{"id": 4, "word": 5}',
+            'not json',
+            '[' * 100000 + ']' * 100000,
+            '{"id": 6, "word": "baab"}',
+        ]
+        responses = asyncio.run(exchange(self.server, lines))
+
+        verdict, steps = runWord(self.table, 'abba')
+        self.assertEqual(responses[0], {'id': 1, 'verdict': verdict, 'steps': steps})
+        for response in responses[1:-1]:
+            self.assertIn('error', response)
+        self.assertEqual([response['id'] for response in responses[1:-1]], [2, None, 4, None, None])
+        verdict, steps = runWord(self.table, 'baab')
+        self.assertEqual(responses[-1], {'id': 6, 'verdict': verdict, 'steps': steps})
+        self.assertEqual(self.server.metrics.errors, 5)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,186 @@
+"""
+Author: Ralph Dawson G. Pineda
+Section: STALGCM S13
+Description: This file caches the verdicts of words that were already run. Real traffic repeats the same words a lot,
+             and a 2-way dfa always gives the same verdict and step count for the same word, so a repeated word can be
+             answered with one dictionary lookup instead of another run of the step loop. The cache is keyed by the
+             fingerprint of the machine (the hash of its packed transition table and of the options that change the
+             step counts) and the word, so one cache can hold the words of several machines. It keeps the most
+             recently used words: the least recently used ones are evicted once the number of entries or their
+             estimated memory goes over the limit. The cache can be saved to a file and loaded again in the next run.
+"""
+import hashlib
+import json
+import os
+import sys
+import tempfile
+from collections import OrderedDict
+
+from controller import *
+
+MAX_ENTRIES = 1 << 20
+MAX_BYTES = 256 << 20
+# the estimated memory of an entry besides its word: the key and result tuples, the step count and the dictionary entry
+ENTRY_BYTES = 200
+
+"""
+@definition: This gives the fingerprint of a machine for the cache. Two tables with the same transitions have the same
+             fingerprint, an early table (see analysis.earlyTable()) or another option that changes the step counts
+             gives another one.
+@params: table - the compiled transition table of the machine
+         options - anything else the results depend on, such as the engine and the loop check
+@returns: fingerprint - the SHA-256 hash as hex
+"""
+def machineFingerprint(table, *options):
+    fingerprint = hashlib.sha256(table.pack())
+    fingerprint.update(json.dumps(options).encode('utf-8'))
+    return fingerprint.hexdigest()
+
+"""
+@definition: This class is a bounded cache of the results of words, from the least to the most recently used
+@attributes: max_entries - the largest number of entries kept
+             max_bytes - the largest estimated memory of the entries kept
+             entries - OrderedDict from (fingerprint, word) to (verdict, steps)
+             size - the estimated memory of the entries, see entryBytes()
+             hits, misses, evictions - the counters since the cache was created
+"""
+class VerdictCache:
+    def __init__(self, max_entries=MAX_ENTRIES, max_bytes=MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    """
+    @definition: This gives the estimated memory of the entry of a word
+    """
+    @staticmethod
+    def entryBytes(word):
+        return ENTRY_BYTES + sys.getsizeof(word)
+
+    """
+    @definition: This looks up the result of a word and marks it as the most recently used
+    @params: fingerprint - the fingerprint of the machine, see machineFingerprint()
+             word - the word input without end markers
+    @returns: result - (verdict, steps) like runWord(), None if the word is not in the cache
+    """
+    def get(self, fingerprint, word):
+        key = (fingerprint, word)
+        result = self.entries.get(key)
+        if result is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.entries.move_to_end(key)
+        return result
+
+    """
+    @definition: This adds the result of a word as the most recently used entry, evicting the least recently used
+                 entries over the limits. A word that is larger than the whole memory limit is not kept.
+    @params: fingerprint - the fingerprint of the machine, see machineFingerprint()
+             word - the word input without end markers
+             result - (verdict, steps) like runWord()
+    """
+    def put(self, fingerprint, word, result):
+        key = (fingerprint, word)
+        size = self.entryBytes(word)
+        if size > self.max_bytes or self.max_entries <= 0:
+            return
+        if key in self.entries:
+            self.entries.move_to_end(key)
+            self.entries[key] = result
+            return
+        self.entries[key] = result
+        self.size += size
+        while len(self.entries) > self.max_entries or self.size > self.max_bytes:
+            (_, evicted), _ = self.entries.popitem(last=False)
+            self.size -= self.entryBytes(evicted)
+            self.evictions += 1
+
+    """
+    @definition: This gives the results of a list of words, only the words that are not in the cache are run. They are
+                 run together in one call, so an engine that runs a whole chunk at once still gets one, and a word that
+                 is repeated in the list is only run once.
+    @params: fingerprint - the fingerprint of the machine, see machineFingerprint()
+             words - list of words
+             run - function that gives the list of (verdict, steps) of a list of words, see batch.evaluateChunk()
+    @returns: results - list of (verdict, steps) in the same order as the words
+    """
+    def runWords(self, fingerprint, words, run):
+        results = [self.get(fingerprint, word) for word in words]
+        missing = list(dict.fromkeys(word for word, result in zip(words, results) if result is None))
+        if not missing:
+            return results
+        found = dict(zip(missing, run(missing)))
+        for word in missing:
+            self.put(fingerprint, word, found[word])
+        return [found[word] if result is None else result for word, result in zip(words, results)]
+
+    """
+    @definition: This gives the counters of the cache
+    """
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self.entries),
+            'bytes': self.size,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+        }
+
+    """
+    @definition: This gives the counters of the cache as one line of text
+    """
+    def describe(self):
+        stats = self.stats()
+        return (f"verdict cache: {stats['hits']} hits, {stats['misses']} misses ({stats['hit_rate']:.1%} hit rate), "
+                f"{stats['entries']} entries, {stats['bytes'] >> 10} KiB, {stats['evictions']} evictions")
+
+    """
+    @definition: This saves the entries to a file as one JSON array per line, from the least to the most recently used,
+                 so loading them back keeps their order. The file is replaced in one step, a run that is killed while
+                 saving leaves the previous file.
+    @params: filename - the cache file
+    """
+    def save(self, filename):
+        directory = os.path.dirname(os.path.abspath(filename))
+        descriptor, temporary = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        try:
+            with os.fdopen(descriptor, 'w', encoding='utf-8') as f:
+                for (fingerprint, word), (verdict, steps) in self.entries.items():
+                    f.write(json.dumps([fingerprint, word, verdict, steps]) + '\n')
+            os.replace(temporary, filename)
+        except OSError:
+            os.remove(temporary)
+            raise
+
+    """
+    @definition: This loads the entries saved with save(). A missing file is an empty cache, and the file stops being
+                 read at the first line that is not a valid entry. The counters are not changed.
+    @params: filename - the cache file
+    @returns: loaded - the number of entries read
+    """
+    def load(self, filename):
+        loaded = 0
+        try:
+            with open(filename, encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        fingerprint, word, verdict, steps = json.loads(line)
+                    except (ValueError, TypeError):
+                        break
+                    if verdict not in VERDICTS:
+                        break
+                    self.put(sys.intern(fingerprint), word, (verdict, steps))
+                    loaded += 1
+        except FileNotFoundError:
+            pass
+        return loaded
@@ -4,12 +4,26 @@ Section: STALGCM S13
 Date: July 2023
 Description: This file contains the view of the program. Make sure that the dependencies are installed in your device. Read the README.md for more information.
 """
-from PyQt5.QtWidgets import QMessageBox, QLabel, QFileDialog, QWidget, QGridLayout, QPushButton, QVBoxLayout, QHBoxLayout, QSizePolicy, QInputDialog
+from PyQt5.QtWidgets import QMessageBox, QLabel, QFileDialog, QWidget, QGridLayout, QPushButton, QVBoxLayout, QHBoxLayout, QSizePolicy, QInputDialog, QSlider
 from PyQt5.QtGui import QPainter, QColor, QBrush, QFont
-from PyQt5.QtCore import Qt
+from PyQt5.QtCore import Qt, QTimer
 
 from controller import *
 from model import *
+from artifact import loadMachineReport
+from instrument import Instrumentation
+from runner import TraceWorker, PROGRESS_RATE
+from diagram import DiagramView
+from tape import TapeView
+
+# runs that can take more steps than this keep only every TRACE_CHECKPOINT-th step, see replay.Trace
+TRACE_LIMIT = 1 << 22
+TRACE_CHECKPOINT = 1024
+# machines with more states than this are drawn as a state diagram instead of a grid of widgets, see diagram.py
+DIAGRAM_LIMIT = 256
+# an animated run shows at least ANIMATION_RATE steps per second and takes at most ANIMATION_SECONDS
+ANIMATION_RATE = 8
+ANIMATION_SECONDS = 10
 
 """
 @definition: This class is the view representation of a state in the machine. It is color coded to determine which type of state it is.
@@ -69,70 +83,127 @@ class Machine(QWidget):
     def __init__(self):
         super().__init__()
         self.setWindowTitle('2-Way Deterministic Finite Automata')
-        self.setFixedWidth(720)
-        self.setFixedHeight(720)
+        self.resize(720, 720)
         self.fileName = None
 
         self.machine = None
         self.size = None
+        self.states = {}
+        self.diagram = None
+        self.instrumentation = None
+        self.trace = None
+        self.position = 0
+        self.worker = None
+        self.stride = 1
+        self.animation = QTimer(self)
+        self.animation.timeout.connect(self.animateStep)
 
 
         hbox = QHBoxLayout()
         self.openTextFileButton = QPushButton('Open Text File')
         self.startButton = QPushButton('Start')
         self.stepButton = QPushButton('Step')
+        self.backButton = QPushButton('Back')
+        self.runButton = QPushButton('Run')
+        self.animateButton = QPushButton('Animate')
+        self.cancelButton = QPushButton('Cancel')
         self.inputWordButton = QPushButton('Input Word')
+        self.heatmapButton = QPushButton('Heatmap')
+        self.heatmapButton.setCheckable(True)
+        self.reduceButton = QPushButton('Reduce')
+        self.reduceButton.setCheckable(True)
+        self.reduceButton.setToolTip("Reduce the machine definition files opened while this is checked")
 
         hbox.addWidget(self.openTextFileButton)
+        hbox.addWidget(self.inputWordButton)
         hbox.addWidget(self.startButton)
+        hbox.addWidget(self.backButton)
         hbox.addWidget(self.stepButton)
-        hbox.addWidget(self.inputWordButton)
+        hbox.addWidget(self.heatmapButton)
+        hbox.addWidget(self.reduceButton)
+        # the run controls and the slider get a row of their own, so the slider is wide enough to seek with
+        runBox = QHBoxLayout()
+        runBox.addWidget(self.runButton)
+        runBox.addWidget(self.animateButton)
+        runBox.addWidget(self.cancelButton)
+        self.stepSlider = QSlider(Qt.Horizontal)
+        runBox.addWidget(self.stepSlider, 1)
+        # both rows are one item of the window layout, resetMachine() removes the items after it
+        toolbar = QVBoxLayout()
+        toolbar.addLayout(hbox)
+        toolbar.addLayout(runBox)
 
         self.openTextFileButton.clicked.connect(self.openFileNameDialog)
         self.startButton.clicked.connect(self.startFind)
         self.stepButton.clicked.connect(self.stepFind)
+        self.backButton.clicked.connect(self.backFind)
+        self.runButton.clicked.connect(self.runFind)
+        self.animateButton.clicked.connect(self.animateFind)
+        self.cancelButton.clicked.connect(self.cancelFind)
+        self.stepSlider.valueChanged.connect(self.seekStep)
         self.inputWordButton.clicked.connect(self.setInput)
+        self.heatmapButton.toggled.connect(self.toggleHeatmap)
 
+        self.heatmapButton.setEnabled(False)
         self.inputWordButton.setEnabled(False)
         self.stepButton.setEnabled(False)
+        self.backButton.setEnabled(False)
+        self.runButton.setEnabled(False)
+        self.animateButton.setEnabled(False)
+        self.cancelButton.setEnabled(False)
+        self.stepSlider.setEnabled(False)
         self.startButton.setEnabled(False)
 
         self.vbox = QVBoxLayout()
-        self.vbox.addLayout(hbox)
+        self.vbox.addLayout(toolbar)
         self.vbox.setAlignment(Qt.AlignTop)
         self.setLayout(self.vbox)
 
-        size = min(self.width(), self.height()) - 50
+        size = self.gridSide()
         for state in self.findChildren(State):
             state.setMinimumSize(size // self.size, size // self.size)
 
 
         self.curr_state_label = None
         self.head_label = None
-        self.word_label = None
+        self.tape = None
         self.transition_label =None
         self.direction_label = None
      
     """
+    @definition: This function gives the side of the square the grid of states can fill. The toolbar above it and the
+                 tape below it take their own height, so the states never make the window taller than it is.
+    """
+    def gridSide(self):
+        height = self.height() - self.vbox.itemAt(0).sizeHint().height()
+        if self.vbox.count() > 2:
+            height -= self.vbox.itemAt(2).sizeHint().height()
+        return min(self.width(), height) - 50
+    """
     @definition: This function makes the states size dynamic depending on the window size
     @param: event - the event that triggers the resizeEvent
     """
     def resizeEvent(self, event):
 
-        size = min(self.width(), self.height()) - 50
+        size = self.gridSide()
 
-        for state in self.findChildren(State):
-            state.setMinimumSize(size // self.size, size // self.size)
+        if self.diagram is None:
+            for state in self.states.values():
+                state.setMinimumSize(size // self.size, size // self.size)
 
         self.update()
     """
     @definition: This function creates a grid to hold views the states of the machine
     """
     def createGrid(self):
+        self.inputWordButton.setEnabled(True)
+        self.heatmapButton.setEnabled(True)
+        if len(self.machine.getQ()) > DIAGRAM_LIMIT:
+            self.createDiagram()
+            return
+
         grid = QGridLayout()
         grid.setSpacing(2)
-
-        self.inputWordButton.setEnabled(True)
         counter = 0
         for i in range (self.size):
             for j in range(self.size):
@@ -147,11 +218,24 @@ class Machine(QWidget):
                         state = State('white', self)
                     state.set_text(self.machine.getQ()[counter])
                     state.setObjectName(f'state{self.machine.getQ()[counter]}')
+                    # the widgets are looked up by state name on every step, see setStateColor()
+                    self.states[self.machine.getQ()[counter]] = state
                     grid.addWidget(state, i, j)
                 counter += 1
 
         self.vbox.addLayout(grid)
         self.createStatusBar()
+    """
+    @definition: This function draws the states of a large machine as a state diagram that can be panned and zoomed,
+                 in place of the grid. The diagram items take the place of the State widgets in self.states.
+    """
+    def createDiagram(self):
+        self.diagram = DiagramView(self.machine, self.stateColor, self)
+        self.states = self.diagram.states
+        box = QVBoxLayout()
+        box.addWidget(self.diagram)
+        self.vbox.addLayout(box)
+        self.createStatusBar()
 
     """
     @definition: This function creates a horizontal layout to display the status bar
@@ -160,7 +244,7 @@ class Machine(QWidget):
     def createStatusBar(self):
 
         self.head_label = QLabel("Head: 0 Character: -")
-        self.word_label = QLabel("Word: ")
+        self.tape = TapeView()
         self.transition_label = QLabel("Transition: ")
         self.direction_label = QLabel("Read Direction: right")
         self.curr_state_label = QLabel("Current State: " + self.machine.getCurrState())
@@ -168,11 +252,14 @@ class Machine(QWidget):
         statusBox = QHBoxLayout()
         statusBox.addWidget(self.curr_state_label)
         statusBox.addWidget(self.head_label)
-        statusBox.addWidget(self.word_label)
         statusBox.addWidget(self.transition_label)
         statusBox.addWidget(self.direction_label)
-        
-        self.vbox.addLayout(statusBox)
+
+        # the tape gets a row of its own so it can show as many cells as the window is wide
+        tapeBox = QVBoxLayout()
+        tapeBox.addWidget(self.tape)
+        tapeBox.addLayout(statusBox)
+        self.vbox.addLayout(tapeBox)
 
     """
     @definition: This function resets the attributes of the object instance of this 
@@ -181,6 +268,9 @@ class Machine(QWidget):
     def resetMachine(self):
         self.machine = None
         self.size = None
+        self.instrumentation = None
+        self.heatmapButton.setChecked(False)
+        self.heatmapButton.setEnabled(False)
         # Remove the old grid and status box
         if self.vbox.count() > 1:
             print(self.vbox.itemAt(2))
@@ -188,10 +278,18 @@ class Machine(QWidget):
             self.vbox.layout().removeItem(self.vbox.itemAt(1))
             self.curr_state_label.setParent(None)
             self.head_label.setParent(None)
-            self.word_label.setParent(None)
+            self.tape.setParent(None)
             self.transition_label.setParent(None)
             self.direction_label.setParent(None)
-        self.stepButton.setEnabled(False)
+        if self.diagram is not None:
+            self.diagram.setParent(None)
+            self.diagram = None
+        else:
+            for state in self.states.values():
+                state.setParent(None)
+        self.states = {}
+        self.setRunControls(False)
+        self.trace = None
         self.startButton.setEnabled(False)
         self.update()
     """
@@ -211,21 +309,27 @@ class Machine(QWidget):
         if fileName:
             # Reset the maze
             self.resetMachine()
-            Q, sigma, start,  accept, reject, delta =  readMachine(fileName)
-            code, machine = initializeMachine(Q, sigma, delta, start, accept, reject)
-            flag_create_machine = self.validateMachineDefinition(code)
+            report, machine = loadMachineReport(fileName)
+            report.printErrors()
+            flag_create_machine = self.validateMachineDefinition(report.getCode(), report.describe())
             if flag_create_machine:
+                if self.reduceButton.isChecked():
+                    # the states that can never matter are removed before the grid is drawn, see analysis.py
+                    machine, reduction = reduceMachine(machine)
+                    print('\n'.join(reduction.describe()))
+                    self.reduceButton.setToolTip('\n'.join(reduction.describe()))
                 self.machine = machine
-                self.size = determineGridSize(len(Q))
+                self.size = determineGridSize(len(machine.getQ()))
                 self.createGrid()
 
     """
     @definition: This function validates the machine definition file for errors
     @param: code - determines the status of the machine definition file. If it is invalid
                     then the code will determine which type of error was committed
+            details - the errors found in the machine definition file, one line each
     @return - flag_create_machine - determines if the machine definition file is valid
     """
-    def validateMachineDefinition(self, code):
+    def validateMachineDefinition(self, code, details=()):
         flag_create_machine = False
         if code == 0:
             self.inputWordButton.setEnabled(True)
@@ -235,6 +339,13 @@ class Machine(QWidget):
                 err = "Invalid transition function"
             elif code ==1:
                 err = "Machine is not deterministic"
+            else:
+                err = "Invalid states or alphabet"
+            if details:
+                # keep the message box a readable size, the full list is printed on the console
+                err += "\n\n" + "\n".join(details[:20])
+                if len(details) > 20:
+                    err += "\n... and " + str(len(details) - 20) + " more"
             self.showNoGoalMessage(err)
             self.startButton.setEnabled(False)
             self.stepButton.setEnabled(False)
@@ -245,6 +356,10 @@ class Machine(QWidget):
     def setInput(self):
          name, done1 = QInputDialog.getText(self, 'Input Word', 'Enter a word:')
          if done1:
+            invalid = invalidSymbols(self.machine.getTable(), name)
+            if invalid:
+                self.showNoGoalMessage("Symbol "+ ' '.join(invalid) +" does not exist in sigma")
+                return
             self.machine.setWord(attachEndMarker(name))
          self.startButton.setEnabled(True)
     """
@@ -258,73 +373,192 @@ class Machine(QWidget):
         self.openTextFileButton.setEnabled(False)
         self.inputWordButton.setEnabled(True)
         self.startButton.setEnabled(False)
-        self.stepButton.setEnabled(True)
         self.inputWordButton.setEnabled(False)
+        self.cancelButton.setEnabled(True)
+
+        # the symbols of the word were all checked against sigma in setInput, so the whole run is recorded
+        # once in a worker thread and every step, back step and seek after this only reads the trace
+        table = self.machine.getTable()
+        checkpoint = TRACE_CHECKPOINT if len(table.states) * len(self.machine.getWord()) > TRACE_LIMIT else 0
+        self.worker = TraceWorker(table, self.machine.getWord()[1:-1], checkpoint, self)
+        self.worker.progress.connect(self.showProgress)
+        self.worker.recorded.connect(self.traceRecorded)
+        self.worker.start()
 
         self.head_label.setText("Head: " + str(self.machine.getHead())+" Character: " + self.machine.getWord()[self.machine.getHead()])
-        if len(self.machine.getWord()) ==0:
-            self.word_label.setText("Word: ")
-        else:
-            self.word_label.setText("Word: " + self.machine.getWord()[:self.machine.getHead()]+"   " +self.machine.getWord()[self.machine.getHead()]+"   " +self.machine.getWord()[self.machine.getHead()+1:])
-        
+        self.tape.setWord(self.machine.getWord())
 
-        
         #show current state
     """
     @definition: This function is called when the user clicks the step button. It will follow the appropriate transition depending
-                 on the current state and the input character being read at the moment
+                 on the current state and the input character being read at the moment, by moving to the next step of the trace
     """
     def stepFind(self):
         
         """
         Step through the node traversal
         """
-        flag = False
-        if self.machine.getHead() == len(self.machine.getWord())-1 or self.machine.getHead()==0:
-            flag = True
-        if  validateSymbol(self.machine.getWord()[self.machine.getHead()], self.machine.getSigma()):
-            flag= True
-        if flag:
-            self.machine.setPrevState(self.machine.getCurrState())
-            self.resetColor()
-            curr_state, direction, transition_used = nextStep(self.machine.getDelta(), self.machine.getCurrState(), self.machine.getWord()[self.machine.getHead()])
-            self.machine.setCurrState(curr_state)
-            self.machine.setDirection(direction)
-            self.showCurrentState(transition_used)
-        else: #display error symbol does not exist in sigma
-            self.showNoGoalMessage("Symbol "+self.machine.getWord()[self.machine.getHead()]+" does not exist in sigma")
-            self.resetWord()
-            return 0
-        if self.machine.getDirection() =="left":
-            self.machine.setLeftHead()
+        state_id, head, _ = self.trace.seek(self.position)
+        if self.position == self.trace.steps:
+            # the run is over, show how it ended again instead of taking a transition: halt_transition is -1 unless
+            # it was stopped by a transition with no next state, and the verdict can be any of accept, reject or loop
+            self.finishRun()
+            return
+        if self.heatmapButton.isChecked():
+            direction = self.machine.getDirection()
+            self.showStep(self.position + 1)
+            self.instrumentation.recordStep(state_id, self.trace.tape[head], self.machine.getDirection() != direction)
+            q = self.machine.getTable().getStateName(state_id)
+            self.states[q].setToolTip(f'{q}: {self.instrumentation.state_dwell[state_id]} steps')
         else:
-            self.machine.setRightHead()
+            self.showStep(self.position + 1)
 
-        if isEnd(self.machine.getCurrState(), self.machine.getAccept(), self.machine.getReject(), self.machine.getWord()[self.machine.getHead()]):
-            if isAccepted(self.machine.getCurrState(), self.machine.getAccept()):
-                self.machine.setAccepted(True)
-                #show accept message
-            else:
-                #show reject message
-                self.machine.setAccepted(False)
+        if self.position == self.trace.steps and self.trace.halt_transition < 0:
+            self.finishRun()
+    """
+    @definition: This function shows how the run ended once its last step is shown: accepted, rejected, rejected by a
+                 transition with no next state, or stuck in a loop
+    """
+    def finishRun(self):
+        if self.trace.halt_transition >= 0:
+            self.transition_label.setText("Transition: " + ' '.join(self.machine.getTable().delta[self.trace.halt_transition]))
+        if self.trace.verdict == LOOP:
+            self.showLoopMessage()
+        else:
+            self.machine.setAccepted(self.trace.verdict == ACCEPT)
             self.showEndMessage(self.machine.getAccepted())
     """
-    @definition: This function updates the views of the status of the machine. it displays the current state, the head, 
+    @definition: This function is called while the worker thread records the run. It shows the state and head the run
+                 has reached, the worker sends them at most PROGRESS_RATE times per second.
+    @param: steps - the number of steps recorded so far
+            state_id - the id of the current state
+            head - the position of the head
+    """
+    def showProgress(self, steps, state_id, head):
+        self.machine.setPrevState(self.machine.getCurrState())
+        self.resetColor()
+        self.machine.setCurrState(self.machine.getTable().getStateName(state_id))
+        self.machine.setHead(head)
+        self.showCurrentState(["recording step", str(steps)])
+    """
+    @definition: This function is called when the worker thread has recorded the run, or was cancelled. The run
+                 starts from its first step and the step, run and animate controls become available.
+    @param: trace - the recorded run, see replay.Trace
+    """
+    def traceRecorded(self, trace):
+        self.worker.wait()
+        self.worker = None
+        self.cancelButton.setEnabled(False)
+        if trace.verdict is None:
+            self.resetWord()
+            return
+        self.trace = trace
+        self.stepSlider.blockSignals(True)
+        self.stepSlider.setRange(0, trace.steps)
+        self.stepSlider.blockSignals(False)
+        self.showStep(0)
+        self.setRunControls(True)
+    """
+    @definition: This function enables or disables the controls that move through the recorded run
+    @param: enabled - True to enable them
+    """
+    def setRunControls(self, enabled):
+        self.stepButton.setEnabled(enabled)
+        self.backButton.setEnabled(enabled and self.position > 0)
+        self.runButton.setEnabled(enabled)
+        self.animateButton.setEnabled(enabled)
+        self.stepSlider.setEnabled(enabled)
+    """
+    @definition: This function is called when the user clicks the run button. It jumps to the last step of the run
+                 and shows how it ended
+    """
+    def runFind(self):
+        self.showStep(self.trace.steps)
+        self.finishRun()
+    """
+    @definition: This function is called when the user clicks the animate button. It plays the run from the current
+                 step at no more than PROGRESS_RATE frames per second, skipping steps on long runs so the animation
+                 takes at most ANIMATION_SECONDS
+    """
+    def animateFind(self):
+        rate = max(ANIMATION_RATE, (self.trace.steps - self.position) / ANIMATION_SECONDS)
+        interval = max(1 / PROGRESS_RATE, 1 / rate)
+        self.stride = max(1, round(rate * interval))
+        self.setRunControls(False)
+        self.cancelButton.setEnabled(True)
+        self.animation.start(int(interval * 1000))
+    """
+    @definition: This function shows the next frame of an animated run
+    """
+    def animateStep(self):
+        position = min(self.position + self.stride, self.trace.steps)
+        self.showStep(position)
+        if position == self.trace.steps:
+            self.animation.stop()
+            self.cancelButton.setEnabled(False)
+            self.setRunControls(True)
+            self.finishRun()
+    """
+    @definition: This function is called when the user clicks the cancel button. It stops recording the run, which
+                 goes back to waiting for a word, or stops the animation at the step it has reached
+    """
+    def cancelFind(self):
+        if self.worker is not None:
+            self.worker.requestInterruption()
+        elif self.animation.isActive():
+            self.animation.stop()
+            self.cancelButton.setEnabled(False)
+            self.setRunControls(True)
+    """
+    @definition: This function is called when the user clicks the back button. It undoes the last step by moving to the
+                 step of the trace before the current one
+    """
+    def backFind(self):
+        if self.position > 0:
+            self.showStep(self.position - 1)
+    """
+    @definition: This function is called when the step slider is moved. It jumps to any step of the trace, the end
+                 message is only shown when the last step is reached with the step button
+    @param: position - the step to jump to
+    """
+    def seekStep(self, position):
+        if self.trace is not None and position != self.position:
+            self.showStep(position)
+    """
+    @definition: This function shows a step of the trace: it moves the machine to the state and head of that step and
+                 updates the colors and the status bar
+    @param: position - the number of steps taken from the start of the run
+    """
+    def showStep(self, position):
+        state_id, head, transition = self.trace.seek(position)
+        table = self.machine.getTable()
+        transition_used = table.delta[transition] if transition >= 0 else []
+        self.machine.setPrevState(self.machine.getCurrState())
+        self.resetColor()
+        self.machine.setCurrState(table.getStateName(state_id))
+        self.machine.setHead(head)
+        self.machine.setDirection(transition_used[3] if transition_used else "right")
+        self.showCurrentState(transition_used)
+
+        self.position = position
+        self.backButton.setEnabled(position > 0)
+        self.stepSlider.blockSignals(True)
+        self.stepSlider.setValue(position)
+        self.stepSlider.blockSignals(False)
+    """
+    @definition: This function updates the views of the status of the machine. it displays the current state, the head,
                     the word, the direction, and the transition used
     """
     def showCurrentState(self, transition_used):
         self.curr_state_label.setText("Current State: " + self.machine.getCurrState())
         self.head_label.setText("Head: " + str(self.machine.getHead()) + " Character: "+self.machine.getWord()[self.machine.getHead()])
-        if len(self.machine.getWord()) ==0:
-            self.word_label.setText("Word: ")
-        else:
-            self.word_label.setText("Word: " + self.machine.getWord()[:self.machine.getHead()]+"   "+ self.machine.getWord()[self.machine.getHead()]+ "   " +self.machine.getWord()[self.machine.getHead()+1:])
+        self.tape.setHead(self.machine.getHead())
         self.direction_label.setText("Direction: " + self.machine.getDirection())
         self.transition_label.setText("Transition: " + ' '.join(map(str,transition_used)))
         self.direction_label.setText("Direction: " + self.machine.getDirection())
-        state =self.findChild(State, f'state{self.machine.getCurrState()}')
-        state.color = "blue"
-        state.update()
+        self.setStateColor(self.machine.getCurrState(), "blue")
+        if self.diagram is not None:
+            self.diagram.follow(self.machine.getCurrState())
 
     """
 
@@ -333,38 +567,66 @@ class Machine(QWidget):
 
     """
     def resetColor(self):
-        state = self.findChild(State, f'state{self.machine.getPrevState()}')
-        if self.machine.getPrevState() == self.machine.getStart():
-            state.color = "yellow"
-        elif self.machine.getPrevState() == self.machine.getAccept():
-            state.color = "green"
-        elif self.machine.getPrevState() == self.machine.getReject():
-            state.color = "red"
-        else:
-            state.color = "white"
-        state.update()
-        state.update()
+        self.setStateColor(self.machine.getPrevState(), self.stateColor(self.machine.getPrevState()))
+    """
+    @definition: This function colors the view of a state. The state is only repainted if its color changed, so a step
+                 repaints at most the previous and the current state no matter how many states the machine has.
+    @param: q - the name of the state
+            color - the new color of the state
+    """
+    def setStateColor(self, q, color):
+        state = self.states[q]
+        if state.color != color:
+            state.color = color
+            state.update()
+    """
+    @definition: This function gives the color of a state that is not the current state: its type color, or a
+                 shade from white to red by the share of the steps read in it when the heatmap is shown
+    @param: q - the name of the state
+    """
+    def stateColor(self, q):
+        if self.heatmapButton.isChecked():
+            heat = self.instrumentation.stateHeat(self.machine.getTable().getStateId(q))
+            shade = int(255 * (1 - heat))
+            return QColor(255, shade, shade).name()
+        if q == self.machine.getStart():
+            return "yellow"
+        elif q == self.machine.getAccept():
+            return "green"
+        elif q == self.machine.getReject():
+            return "red"
+        return "white"
+    """
+    @definition: This function is called when the heatmap button is toggled. While it is checked every step is
+                 counted and the states are colored by the number of steps read in them, the dwell count is shown
+                 when hovering over a state. The counts are kept until another machine definition file is opened.
+    @param: checked - True if the heatmap is shown
+    """
+    def toggleHeatmap(self, checked):
+        if self.machine is None:
+            return
+        if checked and self.instrumentation is None:
+            self.instrumentation = Instrumentation(self.machine.getTable())
+        dwell = dict(zip(self.machine.getTable().getStates(), self.instrumentation.state_dwell)) if checked else {}
+        for q in self.machine.getQ():
+            state = self.states[q]
+            if state.color != "blue":
+                self.setStateColor(q, self.stateColor(q))
+            state.setToolTip(f'{q}: {dwell[q]} steps' if checked else "")
     """
     @definition: This function resets the word, the head, the current state, and the previous state to their initial values
                 This is called when the user wants to check another word
     """
     def resetWord(self):
         for q in self.machine.getQ():
-            state = self.findChild(State, f'state{q}')
-            if q == self.machine.getStart():
-                state.color = "yellow"
-            elif q == self.machine.getAccept():
-                state.color = "green"
-            elif q == self.machine.getReject():
-                state.color = "red"
-            else:
-                state.color = "white"
-            state.update()
-            self.machine.resetState()
-            self.startButton.setEnabled(False)
-            self.stepButton.setEnabled(False)
-            self.inputWordButton.setEnabled(True)
-            self.openTextFileButton.setEnabled(True)
+            self.setStateColor(q, self.stateColor(q))
+        self.machine.resetState()
+        self.trace = None
+        self.position = 0
+        self.setRunControls(False)
+        self.startButton.setEnabled(False)
+        self.inputWordButton.setEnabled(True)
+        self.openTextFileButton.setEnabled(True)
     """
     @definition: This function shows the message when the machine terminates. 
                  It will display whether the word was accepted or rejected
@@ -387,6 +649,19 @@ class Machine(QWidget):
         message.exec_()
         self.resetWord()
     """
+    @definition: This function shows the message when the machine comes back to a state and head position
+                 it has already been in. The machine would never terminate, so the word is neither accepted nor rejected
+    """
+    def showLoopMessage(self):
+        message = QMessageBox()
+        message.setIcon(QMessageBox.Information)
+        message.setWindowTitle("Loop")
+        message.setText(f'The machine is stuck in a loop on the word {self.machine.getWord()}!')
+        message.setStandardButtons(QMessageBox.Ok)
+
+        message.exec_()
+        self.resetWord()
+    """
     @definition: This function shows the message when the machine can't be instantiated because
                 the machine definition did not follow all restrictions. It will display the error
                 depenging on whatever caused it.